@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Glp2DataSchema.py
+#
+# This object describes the column layout of a test data file (*.csv) generated
+# by a Schleich tester: which (zero based) column holds which value, and the
+# decimal separator used for the numbers.  It is resolved once per file, from
+# the header row of the file, and then shared by all the Glp2TestData and
+# Glp2TestDataStep objects made from the file.
+#
+# The columns are found in one of these ways, in order of preference:
+#   1) By name. If the column map (normally the [TestData] section of the
+#      config file) has a <field>Name key (e.g. graphDataName), the column
+#      with that heading is looked up in the header row.
+#   2) By index. If the column map has a <field>Idx key (e.g. graphDataIdx),
+#      that index is used.
+#   3) The default index for the field (see FIELDS below).
+#
+# When the layout does not fit the file (a named column is missing, or the
+# header is too short for an index) a ValueError is raised, rather than
+# silently reading the wrong columns.  validateRow can be used to sanity check
+# a data row against the layout.
+#
+# The values for a row are retrieved with precompiled operator.itemgetter
+# accessors, so getting all the values a step needs is a single call.
+#
+# imports
+from operator import itemgetter
+from Glp2GraphData import Glp2GraphData
+
+class Glp2DataSchema(object):
+    # class constants
+    # Field names and default column indexes. The names are the keys used in
+    # the column map (config file).
+    # Fields used by the test (Glp2TestData), in the order getTestValues
+    # returns them.
+    TEST_FIELDS = (('testGuidIdx', 0),
+                   ('testProgramNameIdx', 25),
+                   ('testProgramGuidIdx', 49),
+                   ('operatorIdx', 27),
+                   ('deviceNumberIdx', 31))
+    # Fields used by the step (Glp2TestDataStep), in the order getStepValues
+    # returns them.
+    STEP_FIELDS = (('testStepGuidIdx', 1),
+                   ('commentsIdx', 20),
+                   ('operatorIdx', 27),
+                   ('deviceNumberIdx', 31),
+                   ('stepNumberIdx', 2),
+                   ('testMethodKeyIdx', 4),
+                   ('nomVoltIdx', 6),
+                   ('nomVoltUnitIdx', 7),
+                   ('actVoltIdx', 8),
+                   ('actVoltUnitIdx', 9),
+                   ('currentLimIdx', 10),
+                   ('currentLimUnitIdx', 11),
+                   ('actCurrIdx', 12),
+                   ('actCurrUnitIdx', 13),
+                   ('timestampIdx', 30),
+                   ('graphDataIdx', 76))
+    IDX_SUFFIX = 'Idx'
+    NAME_SUFFIX = 'Name'
+
+    def __init__(self, header=None, decimalSeparator=',', columnMap=None):
+        # header is the header row of the data file (or None if not known).
+        # columnMap is a dictionary like object (e.g. a config file section)
+        # with <field>Idx and/or <field>Name keys. Fields not in the map use
+        # the default index.
+        self._header = tuple(header) if header is not None else None
+        self._decimalSeparator = decimalSeparator
+        # The keys are not case sensitive, like in a config file section (which
+        # has them in lower case, e.g. once copied to a dict).
+        if columnMap is not None:
+            columnMap = {str(key).lower(): value for key, value in columnMap.items()}
+        self._columnMap = columnMap
+
+        # resolve the index for each field
+        self._indexes = {}
+        for fieldName, defaultIdx in self.TEST_FIELDS + self.STEP_FIELDS:
+            self._indexes[fieldName] = self._resolveIndex(fieldName, defaultIdx, columnMap)
+
+        # Make sure the header, if there is one, is wide enough for all the
+        # columns. A header that is too short usually means the file layout
+        # is not what is expected (e.g. the tester firmware changed it).
+        maxIdx = max(self._indexes.values())
+        if self._header is not None and maxIdx >= len(self._header):
+            raise ValueError('The data file header has ' + str(len(self._header)) +
+                             ' columns, but column ' + str(maxIdx) + ' is expected. ' +
+                             'Check the column indexes in the [TestData] config section.')
+
+        # precompile the accessors
+        self._testIdxs = tuple(self._indexes[name] for name, default in self.TEST_FIELDS)
+        self._stepIdxs = tuple(self._indexes[name] for name, default in self.STEP_FIELDS)
+        self._testGetter = itemgetter(*self._testIdxs)
+        self._stepGetter = itemgetter(*self._stepIdxs)
+        # the minimum row length for the accessors to be used directly
+        self._testRowLen = max(self._testIdxs) + 1
+        self._stepRowLen = max(self._stepIdxs) + 1
+
+    # Find the index to use for a field. See the description at the top of the
+    # file.
+    def _resolveIndex(self, fieldName, defaultIdx, columnMap):
+        if columnMap is None:
+            return defaultIdx
+
+        baseName = fieldName[:-len(self.IDX_SUFFIX)]
+        columnName = columnMap.get((baseName + self.NAME_SUFFIX).lower())
+        if columnName:
+            if self._header is None:
+                raise ValueError('The column for ' + fieldName + ' is given by name (\'' +
+                                 columnName + '\'), but there is no header to find it in.')
+            try:
+                return self._header.index(columnName)
+            except ValueError:
+                raise ValueError('The column \'' + columnName + '\' (' + baseName +
+                                 self.NAME_SUFFIX + ') was not found in the data file header.')
+
+        idxValue = columnMap.get(fieldName.lower())
+        if idxValue is None or idxValue == '':
+            return defaultIdx
+        try:
+            idx = int(idxValue)
+        except ValueError:
+            raise ValueError('The column index for ' + fieldName + ' must be an integer, not \'' +
+                             str(idxValue) + '\'.')
+        if idx < 0:
+            raise ValueError('The column index for ' + fieldName + ' must not be negative.')
+        return idx
+
+    def __repr__(self):
+        outputMsg=  '{:20} {}\n'.format('Decimal Separator: ', self._decimalSeparator)
+        outputMsg+= '{}\n'.format('Columns: ')
+        for fieldName, idx in self._indexes.items():
+            if self._header is not None:
+                outputMsg+= '  {:20} {:3d} {}\n'.format(fieldName, idx, self._header[idx])
+            else:
+                outputMsg+= '  {:20} {:3d}\n'.format(fieldName, idx)
+        return(outputMsg)
+
+    # properties
+    @property
+    def header(self):
+        return self._header
+
+    @property
+    def decimalSeparator(self):
+        return self._decimalSeparator
+
+    @property
+    def columnMap(self):
+        # a copy, with the keys in lower case (or None if there is no map)
+        return dict(self._columnMap) if self._columnMap is not None else None
+
+    @property
+    def testGuidIdx(self):
+        return self._indexes['testGuidIdx']
+
+    @property
+    def graphDataIdx(self):
+        return self._indexes['graphDataIdx']
+
+    # Return the column index of a field (e.g. 'graphDataIdx').
+    def getIndex(self, fieldName):
+        return self._indexes[fieldName]
+
+    # Return a tuple of the test values of a row, in TEST_FIELDS order. Values
+    # for columns beyond the end of the row are None.
+    def getTestValues(self, row):
+        if len(row) >= self._testRowLen:
+            return self._testGetter(row)
+        return tuple(row[idx] if idx < len(row) else None for idx in self._testIdxs)
+
+    # Return a tuple of the step values of a row, in STEP_FIELDS order. Values
+    # for columns beyond the end of the row are None.
+    def getStepValues(self, row):
+        if len(row) >= self._stepRowLen:
+            return self._stepGetter(row)
+        return tuple(row[idx] if idx < len(row) else None for idx in self._stepIdxs)
+
+    # Return the row as a tuple with the graph data column emptied. The graph
+    # data is by far the largest value in a row, so this is used when the graph
+    # data is not needed (or no longer needed) to let it be released.
+    def withoutGraphData(self, row):
+        graphDataIdx = self._indexes['graphDataIdx']
+        row = tuple(row)
+        if len(row) > graphDataIdx and row[graphDataIdx]:
+            row = row[:graphDataIdx] + ('',) + row[graphDataIdx + 1:]
+        return row
+
+    # Check that a data row looks like it fits the layout: it is long enough,
+    # the step number is an integer, and the graph column holds graph data (or
+    # is empty). Raise a ValueError if not.
+    def validateRow(self, row):
+        if len(row) < self._stepRowLen:
+            raise ValueError('A data row has ' + str(len(row)) + ' columns, but column ' +
+                             str(self._stepRowLen - 1) + ' is expected.')
+        stepNumber = row[self._indexes['stepNumberIdx']]
+        try:
+            int(stepNumber)
+        except ValueError:
+            raise ValueError('The step number column (' + str(self._indexes['stepNumberIdx']) +
+                             ') holds \'' + stepNumber + '\', which is not a step number. ' +
+                             'Check the column indexes in the [TestData] config section.')
+        graphData = row[self._indexes['graphDataIdx']]
+        if graphData and Glp2GraphData.SOG_TOKEN not in graphData:
+            raise ValueError('The graph data column (' + str(self._indexes['graphDataIdx']) +
+                             ') does not hold graph data. ' +
+                             'Check the column indexes in the [TestData] config section.')
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Glp2Decimate.py
+#
+# Reduce the number of samples of a graph line to about what can be seen at the
+# size it is drawn. Long (soak) tests have tens of thousands of samples, far
+# more than the width of the graph, and drawing them all is slow and makes the
+# pdf large.
+#
+# The samples are split into buckets, one per pixel (or point) of the width of
+# the plot, and the min and max sample of each bucket are kept, in sample
+# order, along with the first and last samples. This is a min/max envelope: the
+# line looks the same at that width, and a spike (e.g. in the current) is never
+# lost, however short it is. The buckets are by sample number, which is the
+# same as by time for evenly spaced samples, as the tester makes them.
+#
+# imports
+import numpy as np
+
+# Return the x and y data (numpy arrays) decimated to the min and max of y in
+# each of buckets buckets (see above). If there are no more than two samples per
+# bucket, the data is returned as is.
+def DecimateMinMax(xData, yData, buckets):
+    xData = np.asarray(xData)
+    yData = np.asarray(yData)
+    numOfSamples = len(yData)
+    if buckets < 1 or numOfSamples <= 2 * buckets:
+        return xData, yData
+    bucketSize = -(-numOfSamples // buckets) # ceiling
+    numOfBuckets = -(-numOfSamples // bucketSize)
+    # one bucket per row. The last bucket is filled out with its last sample,
+    # which does not change its min or max.
+    rows = np.pad(yData, (0, numOfBuckets * bucketSize - numOfSamples),
+                  mode='edge').reshape(numOfBuckets, bucketSize)
+    rowStart = np.arange(numOfBuckets) * bucketSize
+    keep = np.empty((numOfBuckets, 2), dtype=np.intp)
+    keep[:, 0] = rowStart + rows.argmin(axis=1)
+    keep[:, 1] = rowStart + rows.argmax(axis=1)
+    # min and max in sample order, and the padding back to the last sample
+    keep.sort(axis=1)
+    keep = np.minimum(keep.ravel(), numOfSamples - 1)
+    keep = np.unique(np.concatenate(([0], keep, [numOfSamples - 1])))
+    return xData[keep], yData[keep]
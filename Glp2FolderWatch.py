@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Glp2FolderWatch.py
+#
+# Watch a folder for new or changed files of a type (e.g. the data files, *.csv,
+# or the test definition files, *.TPR), by polling: each poll lists the folder
+# and compares the modification time and size of each file with the last poll.
+# Polling is used rather than file system events (e.g. inotify) because the
+# files are usually copied to a network share, where the events are not
+# reliable, and listing a folder is cheap.
+#
+# A file is only returned by poll once it has stopped changing: it must have the
+# same modification time and size as at the previous poll, so a file that is
+# still being copied is not read half written. After that, it is returned again
+# each time it changes (e.g. the tester added tests to it).
+#
+# imports
+import os
+
+class Glp2FolderWatch(object):
+    def __init__(self, path, fileExt):
+        self._path = path
+        self._fileExt = fileExt.lower()
+        self._seen = {}   # file name: (mtime, size) at the last poll
+        self._done = {}   # file name: (mtime, size) when it was last returned
+
+    def __str__(self):
+        outputMsg=  '{:20} {}\n'.format('Watched Path: ', self._path)
+        outputMsg+= '{:20} *{}\n'.format('Files: ', self._fileExt)
+        outputMsg+= '{:20} {}\n'.format('Files Found: ', len(self._seen))
+        return(outputMsg)
+
+    # Return the (mtime, size) stamp of the files in the folder with the file
+    # extension (any case), leaving out hidden files (starting with '.'). A
+    # folder that is not there (e.g. the share is not mounted) has no files.
+    def _scan(self):
+        stamps = {}
+        try:
+            with os.scandir(self._path) as entries:
+                for entry in entries:
+                    fileName = entry.name
+                    if fileName.startswith('.') or not fileName.lower().endswith(self._fileExt):
+                        continue
+                    try:
+                        if entry.is_file():
+                            stat = entry.stat()
+                            stamps[fileName] = (stat.st_mtime_ns, stat.st_size)
+                    except FileNotFoundError:
+                        pass # removed since it was listed
+        except (FileNotFoundError, NotADirectoryError):
+            pass
+        return stamps
+
+    # Return a sorted list of the names of the files that are new or changed
+    # since they were last returned, and have stopped changing. If waitStable
+    # is False, the files are returned without waiting for them to stop
+    # changing (e.g. a single pass over files that are known to be complete).
+    def poll(self, waitStable=True):
+        stamps = self._scan()
+        ready = [fileName for fileName, stamp in stamps.items()
+                 if stamp != self._done.get(fileName) and
+                 (not waitStable or stamp == self._seen.get(fileName))]
+        for fileName in ready:
+            self._done[fileName] = stamps[fileName]
+        # forget the files that are gone, so they are new if they come back
+        for fileName in [fileName for fileName in self._done if fileName not in stamps]:
+            del self._done[fileName]
+        self._seen = stamps
+        return sorted(ready)
+
+    # properties
+    @property
+    def path(self):
+        return self._path
+
+    # the names of the files found at the last poll
+    @property
+    def files(self):
+        return tuple(sorted(self._seen))
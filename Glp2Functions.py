@@ -9,18 +9,76 @@
 #
 # imports
 from sys import exc_info # error reporting
-from ordered_set import OrderedSet # test ids
+from sys import byteorder
+import codecs
+import csv
+import hashlib
+from collections import namedtuple
+from functools import partial
+from io import BytesIO, TextIOWrapper
+from os import cpu_count, fstat
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_all_start_methods, get_context
+from Glp2DataSchema import Glp2DataSchema
 from Glp2TestData import Glp2TestData
+from Glp2Profile import Phase, TimedIter, Count, RunProfiled, ProfiledResult
 from math import ceil
-# import numpy as np
-import matplotlib.pyplot as plt # for plotting
-import matplotlib.ticker as ticker
-# pdf manipulation
-from PyPDF2 import PdfFileMerger, PdfFileReader
-# user libraries
-# Note: May need PYTHONPATH (set in ~/.profile?) to be set depending
-# on the location of the imported files
-from bpsMath import oom
+import numpy as np
+# matplotlib (Glp2GraphFigure) and PyPDF2 take a long time to import, and are
+# not needed to read the data, so they are imported by the functions that use
+# them.
+
+# Return the content digest (hex SHA-1) of the rows of a test, as read from the
+# file (including the graph data). Any change to a test changes the digest.
+def TestRowsDigest(rows):
+    digest = hashlib.sha1()
+    for row in rows:
+        _UpdateRowsDigest(digest, row)
+    return digest.hexdigest()
+
+# Add a row to a digest (a hashlib.sha1) of the rows of a test (see
+# TestRowsDigest), so the digest can be worked out as the rows are read.
+def _UpdateRowsDigest(digest, row):
+    digest.update('\x1f'.join(row).encode('UTF-8'))
+    digest.update(b'\x1e')
+
+# Group the rows of a test data file by test GUID in a single pass.
+# Return a dictionary keyed by test GUID where each value is a list of the rows
+# (in file order) that have that GUID. Dictionaries keep insertion order, so the
+# keys are in the order each GUID was first seen in the file, which is what is
+# used to derive testInstanceId.
+# Rows too short to contain the GUID (e.g. blank rows) are skipped.
+# guidIdx is the zero based column that holds the test GUID.
+# If makeRow is given, each row is stored as makeRow(row) (e.g. a tuple, or
+# the row without the graph data, see Glp2DataSchema withoutGraphData), so
+# only what is kept is held while the rest of the file is read. If digests
+# is a dictionary, the digest (a hashlib.sha1, see TestRowsDigest) of the rows
+# of each test GUID, as read, is worked out in it.
+def GroupRowsByTestGuid(rows, guidIdx=0, makeRow=None, digests=None):
+    groups = {}
+    for row in rows:
+        if len(row) > guidIdx: # exclude blank rows
+            guid = row[guidIdx]
+            if digests is not None:
+                digest = digests.get(guid)
+                if digest is None:
+                    digest = digests[guid] = hashlib.sha1()
+                _UpdateRowsDigest(digest, row)
+            if makeRow is not None:
+                row = makeRow(row)
+            rowGroup = groups.get(guid)
+            if rowGroup is None:
+                # first time this test id is seen
+                groups[guid] = [row]
+            else:
+                rowGroup.append(row)
+    return groups
+
+# Raised by IterTestList when the rows of a test are not contiguous in a data
+# file (and outOfOrder is not set), so the caller can read the file again with
+# outOfOrder (see MakeTestList).
+class TestRowsOrderError(ValueError):
+    pass
 
 # Create a list of test data objects from a test data file.
 # The file may contain data for more than one test.
@@ -31,54 +89,417 @@ from bpsMath import oom
 # Return a list of test data objects (Glp2TestData objects), with each object
 # having a unique test GUID.
 #
-
-def MakeTestList(fileName, dataSet, decimalSeparator):
-    # The file data set must be a tuple, or something like a tuple.
-    # A tuple is used to guard against bugs changing the data
+# The rows of a test do not need to be contiguous in the file. The tests are
+# made as the rows are read (see IterTestList), so only the rows of the tests
+# are held. If the rows of a test are not contiguous, the data set is read again
+# with the rows grouped by test GUID first (outOfOrder), if it can be: a data
+# set that is an iterator (e.g. a csv.reader) can only be read once, and the
+# TestRowsOrderError is raised (see LoadTestDataFile for reading the file
+# again). Set outOfOrder to True to group the rows first.
+def MakeTestList(fileName, dataSet, decimalSeparator, columnMap=None, keepGraphData=True,
+                 skipTests=None, outOfOrder=False):
+    # The file data set must be iterable (e.g. a csv.reader, tuple, or list).
     # Assume the first row is the header row.
     # The decimalSeparator is used to tell the test object if a decimal point
     # or comma is used as a decimal separator.
-    try:
-        fileDataSet = tuple(dataSet)
-    except ValueError as ve:
-        print('Error: The data used to make a list of Glp2TestData objects is \
-expected to be a tuple or something that can be converted to a tuple.')
-        print(ve)
-        quit()
-
-    # If we get here, we have a tuple of the passed in file data set.
-    # fileDataSet may be one or more sets of test data (multiple tests saved in one file)
-    # each test may be (usually is) more than one step
-    testIds=OrderedSet()   # holding spot for set of unique ids. Use an ordered set to derrive testInstanceId
-    test=[]         # holding spot for the rows corresponding to one test id
-    tests=[]        # holding spot for test data objects created from the file data set.
-    # Make a list of tests (tests[]),  but seperate each test by Test GUID
-    # Get a list of unique test ids -- the set() container guarantees uniqueness
-    # TODO: replace index values, (e.g. 0 in row[0]) with index values originating from config file
-    for row in fileDataSet[1:]: # exclude the header (1st row)
-        if len(row) >= 1: # exclude blank rows
-            testIds.add(row[0])
-    # Get the rows from the file data set that match a unique test id.
-    # Have one list of rows for each unique id.
-    for id in testIds:
-        test.clear()
-        for row in fileDataSet[1:]:
-            # make a new list based on the filter.
-            # Skip blank rows
-            if len(row) >= 1 and id == row[0]:
-                test.append(row)
-        # At this point, all the rows for a given test id should be in test[]
-        # Create a test object from it, and append it to a list of tests.
-        # test[] contains the data, and the first row of the file data set
-        # is the header info.
-        tests.append(Glp2TestData(fileName=str(fileName),
-                    data=test,
-                    header=fileDataSet[0],
-                    testInstanceId=testIds.index(id),
-                    decimalSeparator=decimalSeparator))
+    # The columnMap (e.g. the [TestData] config section) tells which columns
+    # hold which values. See Glp2DataSchema.
+    # If keepGraphData is False, the graph data is dropped as the file is read.
+    # skipTests leaves out tests that have not changed (see IterTestList).
     # tests[] has a Glp2TestData object for each test contained in the file
+    try:
+        return list(IterTestList(fileName, dataSet, decimalSeparator, columnMap=columnMap,
+                                 outOfOrder=outOfOrder, keepGraphData=keepGraphData,
+                                 skipTests=skipTests))
+    except TestRowsOrderError:
+        if iter(dataSet) is dataSet:
+            raise
+    return list(IterTestList(fileName, dataSet, decimalSeparator, columnMap=columnMap,
+                             outOfOrder=True, keepGraphData=keepGraphData,
+                             skipTests=skipTests))
+
+# Yield test data objects (Glp2TestData) from a test data file one test at a
+# time, as soon as all the rows of a test have been read.
+# The dataSet is anything iterable that produces rows (e.g. a csv.reader), and
+# the first row is the header row.  Nothing is read ahead of the test being
+# built, so memory is bounded by the size of one test rather than the size of
+# the file.
+#
+# The tester writes the rows of a test run contiguously, so by default a test
+# is complete when a row with a different test GUID is read. If a test GUID
+# shows up again after another test, the file is not in this order and a
+# TestRowsOrderError (a ValueError) is raised. Set outOfOrder to True to handle files like this: all
+# the rows are grouped by test GUID first (the whole file is read), and then
+# the tests are yielded.
+#
+# The column schema (Glp2DataSchema) is resolved from the header row and the
+# columnMap (e.g. the [TestData] config section) once, and the first data row
+# is checked against it. A ValueError is raised if the file does not fit.
+#
+# In both cases each row is stored once, as a tuple, and the same schema (and
+# header tuple) is shared by all the tests and steps. testInstanceId is the
+# position of the test GUID in the file, in first seen order.
+#
+# The graph data column holds the whole sampled waveform, and is by far the
+# largest value in a row. When the graphs are not needed (e.g. no graph pdf
+# and no graph csv), set keepGraphData to False and the graph data is dropped
+# from each row as it is read, so it is never held by the tests.
+#
+# skipTests is for incremental runs (see Glp2ReportManifest): a dictionary of
+# (file name, test GUID): content digest (see TestRowsDigest) of tests that do
+# not need to be made again. When it is given, the digest of each test is worked out from
+# its rows as read, and a test with the same digest is skipped: only its rows
+# are read, no test or step objects are made from them. It still takes up its
+# testInstanceId. The tests that are made have their digest (contentDigest).
+#
+# seenTestGuids are the test GUIDs of the file before the rows of the data set,
+# in order, when only the end of the file is read (see LoadTestDataFileFrom).
+# The testInstanceIds follow them, and a test GUID among them is out of order.
+def IterTestList(fileName, dataSet, decimalSeparator, columnMap=None, outOfOrder=False,
+                 keepGraphData=True, skipTests=None, seenTestGuids=()):
+    fileName = str(fileName)
+    rows = iter(dataSet)
+    try:
+        header = tuple(next(rows))
+    except StopIteration:
+        # empty file. No header, no tests.
+        return
+    schema = Glp2DataSchema(header, decimalSeparator, columnMap)
+    guidIdx = schema.testGuidIdx
+    rowValidated = False
+    # how to store each row
+    if keepGraphData:
+        makeRow = tuple
+    else:
+        makeRow = schema.withoutGraphData
+
+    if outOfOrder:
+        # Bucket all the rows by test GUID, stored the way they are kept (and
+        # the digests worked out) as they are read, and then release each
+        # group as the test object is made from it.
+        digests = {} if skipTests is not None else None
+        testGroups = GroupRowsByTestGuid(rows, guidIdx, makeRow, digests)
+        for testInstanceId, testId in enumerate(list(testGroups)):
+            test = testGroups.pop(testId)
+            if not rowValidated:
+                schema.validateRow(test[0])
+                rowValidated = True
+            if skipTests is not None:
+                digest = digests.pop(testId).hexdigest()
+                if skipTests.get((fileName, testId)) == digest:
+                    continue
+            testData = Glp2TestData(fileName=fileName,
+                                    data=test,
+                                    testInstanceId=testInstanceId,
+                                    schema=schema)
+            if skipTests is not None:
+                testData.contentDigest = digest
+            yield testData
+        return
+
+    # Return the test made from the rows collected, or None if it is skipped.
+    def makeTest():
+        if skipTests is not None:
+            digest = testDigest.hexdigest()
+            if skipTests.get((fileName, testId)) == digest:
+                return None
+        testData = Glp2TestData(fileName=fileName,
+                                data=test,
+                                testInstanceId=len(seenIds) - 1,
+                                schema=schema)
+        if skipTests is not None:
+            testData.contentDigest = digest
+        return testData
+
+    seenIds = set(seenTestGuids) # test ids already yielded, to detect out of order files
+    testId = None   # test id of the rows being collected
+    test = []       # holding spot for the rows corresponding to one test id
+    testDigest = None # digest of the rows as read, when skipping tests
+    for row in rows:
+        if len(row) <= guidIdx: # skip blank rows
+            continue
+        if row[guidIdx] != testId:
+            # A new test starts, so the previous one is complete.
+            if test:
+                testData = makeTest()
+                if testData is not None:
+                    yield testData
+            elif not rowValidated:
+                schema.validateRow(row)
+                rowValidated = True
+            if row[guidIdx] in seenIds:
+                raise TestRowsOrderError('The rows for test ' + str(row[guidIdx]) + ' in ' +
+                                         fileName + ' are not contiguous. Use outOfOrder=True ' +
+                                         'to read this file.')
+            testId = row[guidIdx]
+            seenIds.add(testId)
+            test = []
+            if skipTests is not None:
+                testDigest = hashlib.sha1()
+        if skipTests is not None:
+            _UpdateRowsDigest(testDigest, row)
+        test.append(makeRow(row))
+    # The last test is complete at the end of the file.
+    if test:
+        testData = makeTest()
+        if testData is not None:
+            yield testData
+
+# Read a test data file (*.csv, ';' delimited, header in the first row) and
+# return the list of test data objects (see MakeTestList). fileName is the name
+# stored in the tests, and filePath is where to read it. The rows are streamed
+# from the file. If the rows of a test are not contiguous (the tester writes
+# them together, but a file may have been edited), the file is read again with
+# the rows grouped by test GUID. Exceptions from reading the file (e.g.
+# UnicodeDecodeError, ValueError) are passed on.
+def LoadTestDataFile(fileName, filePath, fileEncoding, decimalSeparator, columnMap=None,
+                     keepGraphData=True, skipTests=None):
+    # The time to read (decode) the rows is the csvDecode phase, in the
+    # makeTestList phase.
+    with open(filePath, mode='r', encoding=fileEncoding) as dataCsvFile, \
+         Phase('makeTestList'):
+        dataSet = TimedIter('csvDecode', csv.reader(dataCsvFile, delimiter = ';'))
+        try:
+            tests = MakeTestList(fileName, dataSet, decimalSeparator, columnMap,
+                                 keepGraphData, skipTests)
+        except TestRowsOrderError:
+            dataSet.close()
+            dataCsvFile.seek(0)
+            dataSet = TimedIter('csvDecode', csv.reader(dataCsvFile, delimiter = ';'))
+            tests = MakeTestList(fileName, dataSet, decimalSeparator, columnMap,
+                                 keepGraphData, skipTests, outOfOrder=True)
+    Count('dataFiles')
+    Count('tests', len(tests))
+    Count('steps', sum(len(test.steps) for test in tests))
     return tests
 
+# Where a test data file was read to (see LoadTestDataFileFrom), so the rows
+# added to the end of it can be read without reading all of it again. size is
+# the size of the file when it was read, and offset the byte offset of the
+# first row of the last test (more rows of it may not have been written yet).
+# encoding is the encoding of the rows without the byte order mark of the
+# file (e.g. utf-16-le for UTF-16), header the header row, and testGuids the
+# test GUIDs of the file in order (the last is the test at offset).
+TestDataFileMark = namedtuple('TestDataFileMark', ('size', 'offset', 'encoding', 'header',
+                                                   'testGuids'))
+
+# encoding: (byte order mark, encoding of the rows), for the encodings that
+# start a file with a byte order mark. The first is what is assumed if there
+# is none.
+_BYTE_ORDER_MARKS = {
+    'utf-8-sig': ((codecs.BOM_UTF8, 'utf-8'),),
+    'utf-16': ((codecs.BOM_UTF16_LE, 'utf-16-le'), (codecs.BOM_UTF16_BE, 'utf-16-be')),
+    'utf-32': ((codecs.BOM_UTF32_LE, 'utf-32-le'), (codecs.BOM_UTF32_BE, 'utf-32-be'))}
+if byteorder == 'big':
+    # the decoders assume the byte order of this computer
+    _BYTE_ORDER_MARKS['utf-16'] = _BYTE_ORDER_MARKS['utf-16'][::-1]
+    _BYTE_ORDER_MARKS['utf-32'] = _BYTE_ORDER_MARKS['utf-32'][::-1]
+
+# Return the encoding of the rows of a file of the encoding (without the byte
+# order mark) and the length of the byte order mark, from the first bytes of
+# the file (head), so the file can be read from the start of any row.
+def _RowsEncoding(encoding, head):
+    byteOrderMarks = _BYTE_ORDER_MARKS.get(codecs.lookup(encoding).name)
+    if byteOrderMarks is None:
+        return encoding, 0
+    for byteOrderMark, rowsEncoding in byteOrderMarks:
+        if head.startswith(byteOrderMark):
+            return rowsEncoding, len(byteOrderMark)
+    return byteOrderMarks[0][1], 0
+
+# Raised when a file does not start with the rows of its mark (see
+# LoadTestDataFileFrom), e.g. it was replaced rather than added to.
+class _StaleMarkError(Exception):
+    pass
+
+# Read a test data file from its mark (see TestDataFileMark) and return the
+# tests read and the new mark, for a file that is added to (e.g. as tests are
+# run, see glpWatch.py). Only the rows from the mark are read: the last test
+# read before (it may have more rows now) and the tests after it. The rows
+# are the same as those read by LoadTestDataFile, and so are the tests, their
+# testInstanceIds and digests (see skipTests).
+#
+# With no mark, or if the file is not bigger than when it was read, or does
+# not have the last test at the mark, all the file is read. If the rows of a
+# test are not contiguous, all the file is read with the rows grouped by test
+# GUID (see MakeTestList), and no mark is returned, so it is all read again
+# next time. No mark is returned for a file with no tests either.
+def LoadTestDataFileFrom(fileName, filePath, fileEncoding, decimalSeparator, columnMap=None,
+                         keepGraphData=True, skipTests=None, mark=None):
+    with open(filePath, mode='rb') as dataFile, Phase('makeTestList'):
+        size = fstat(dataFile.fileno()).st_size
+        if mark is not None and size <= mark.size:
+            mark = None
+        try:
+            try:
+                tests, newMark = _ReadTestDataFileFrom(fileName, dataFile, size, fileEncoding,
+                                                       decimalSeparator, columnMap,
+                                                       keepGraphData, skipTests, mark)
+            except _StaleMarkError:
+                tests, newMark = _ReadTestDataFileFrom(fileName, dataFile, size, fileEncoding,
+                                                       decimalSeparator, columnMap,
+                                                       keepGraphData, skipTests)
+        except TestRowsOrderError:
+            dataFile.seek(0)
+            dataCsvFile = TextIOWrapper(dataFile, encoding=fileEncoding)
+            try:
+                dataSet = TimedIter('csvDecode', csv.reader(dataCsvFile, delimiter = ';'))
+                tests = MakeTestList(fileName, dataSet, decimalSeparator, columnMap,
+                                     keepGraphData, skipTests, outOfOrder=True)
+            finally:
+                dataCsvFile.detach()
+            newMark = None
+    Count('dataFiles')
+    Count('tests', len(tests))
+    Count('steps', sum(len(test.steps) for test in tests))
+    return tests, newMark
+
+# Read the tests of an open (binary) test data file of the size from the mark,
+# or from the start, and return the tests and the new mark, for
+# LoadTestDataFileFrom.
+def _ReadTestDataFileFrom(fileName, dataFile, size, fileEncoding, decimalSeparator,
+                          columnMap=None, keepGraphData=True, skipTests=None, mark=None):
+    if mark is None:
+        dataFile.seek(0)
+        encoding, offset = _RowsEncoding(fileEncoding, dataFile.read(4))
+        dataRows = _MarkedRows(dataFile, encoding, offset, decimalSeparator, columnMap)
+    else:
+        dataRows = _MarkedRows(dataFile, mark.encoding, mark.offset, decimalSeparator,
+                               columnMap, mark.header, mark.testGuids)
+    try:
+        tests = list(IterTestList(fileName, dataRows, decimalSeparator, columnMap=columnMap,
+                                  keepGraphData=keepGraphData, skipTests=skipTests,
+                                  seenTestGuids=dataRows.testGuids[:-1]))
+    finally:
+        dataRows.close()
+    if dataRows.testOffset is None:
+        return tests, None
+    return tests, TestDataFileMark(size, dataRows.testOffset, dataRows.encoding,
+                                   dataRows.header, tuple(dataRows.testGuids))
+
+# The rows of an open (binary) test data file, read from a byte offset, for
+# LoadTestDataFileFrom. The lines are decoded and split like a file opened in
+# text mode, so the rows are the same, and the bytes of each line are counted
+# to know the offset of the first row of the last test (testOffset). The test
+# GUIDs are kept in order (testGuids). If the header is given, the offset is
+# the first row of the last of the testGuids (see TestDataFileMark), and the
+# header is yielded first, as if it had been read.
+class _MarkedRows(object):
+    def __init__(self, dataFile, encoding, offset, decimalSeparator, columnMap=None,
+                 header=None, testGuids=()):
+        dataFile.seek(offset)
+        self._textFile = TextIOWrapper(dataFile, encoding=encoding, newline='')
+        self._lineEnd = offset
+        self._decimalSeparator = decimalSeparator
+        self._columnMap = columnMap
+        self._fromMark = header is not None
+        self.encoding = encoding
+        self.header = header
+        self.testGuids = list(testGuids)
+        self.testOffset = None
+
+    # Stop reading, leaving the file open.
+    def close(self):
+        self._textFile.detach()
+
+    def _lines(self):
+        for line in self._textFile:
+            self._lineEnd += len(line.encode(self.encoding))
+            if line.endswith('\r\n'):
+                line = line[:-2] + '\n'
+            elif line.endswith('\r'):
+                line = line[:-1] + '\n'
+            yield line
+
+    def __iter__(self):
+        rows = TimedIter('csvDecode', csv.reader(self._lines(), delimiter = ';'))
+        try:
+            if self.header is None:
+                header = next(rows, None)
+                if header is None:
+                    return
+                self.header = tuple(header)
+            yield self.header
+            guidIdx = Glp2DataSchema(self.header, self._decimalSeparator,
+                                     self._columnMap).testGuidIdx
+            rowOffset = self._lineEnd
+            for row in rows:
+                if len(row) > guidIdx:
+                    if not self.testGuids or row[guidIdx] != self.testGuids[-1]:
+                        if self._fromMark and self.testOffset is None:
+                            # the file does not go on from the last test of the mark
+                            raise _StaleMarkError()
+                        self.testGuids.append(row[guidIdx])
+                        self.testOffset = rowOffset
+                    elif self.testOffset is None:
+                        self.testOffset = rowOffset
+                yield row
+                rowOffset = self._lineEnd
+        finally:
+            rows.close()
+
+# Load a number of test data files, in parallel when workers is more than one.
+# files is a list of (fileName, filePath) tuples (see LoadTestDataFile).
+# Yield a (fileName, getTests) tuple for each file, in the order of files,
+# where getTests() returns the list of tests from the file, or raises the
+# exception from reading it. This way the caller can report an error with the
+# name of the file, and the tests (and their testInstanceIds) are in the same
+# order no matter how many workers are used.
+#
+# Each file is read and parsed in a separate process, and the tests are
+# pickled back. The schema is pickled once per file and shared again by the
+# tests, like when the file is read in this process. The processes are
+# started with fork, since the report script runs its code at the module
+# level, and a process started with spawn would run it again. If fork is not
+# available (e.g. Windows), the files are read one after the other.
+# workers of None means one per cpu. No more workers than files are used.
+# skipTests leaves out tests that have not changed (see IterTestList).
+# If marks is a dictionary of data file name: TestDataFileMark, each file is
+# read from its mark (see LoadTestDataFileFrom), and its new mark is put in
+# marks when its tests are got (or the mark is removed if it has none).
+# The phases and counts of the workers are added to the run profile, if there
+# is one (see Glp2Profile).
+def LoadTestDataFiles(files, fileEncoding, decimalSeparator, columnMap=None,
+                      keepGraphData=True, workers=None, skipTests=None, marks=None):
+    files = list(files)
+    if columnMap is not None:
+        columnMap = dict(columnMap) # e.g. a config section can't be pickled
+    if workers is None:
+        workers = cpu_count() or 1
+    workers = min(workers, len(files))
+    if marks is None:
+        loadArgs = [(LoadTestDataFile, fileName, filePath, fileEncoding, decimalSeparator,
+                     columnMap, keepGraphData, skipTests)
+                    for fileName, filePath in files]
+    else:
+        loadArgs = [(LoadTestDataFileFrom, fileName, filePath, fileEncoding, decimalSeparator,
+                     columnMap, keepGraphData, skipTests, marks.get(fileName))
+                    for fileName, filePath in files]
+    if workers <= 1 or 'fork' not in get_all_start_methods():
+        for (fileName, filePath), args in zip(files, loadArgs):
+            yield fileName, _KeepMark(marks, fileName, partial(*args))
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context('fork')) as executor:
+        futures = [executor.submit(RunProfiled, *args) for args in loadArgs]
+        for (fileName, filePath), future in zip(files, futures):
+            yield fileName, _KeepMark(marks, fileName, partial(ProfiledResult, future))
+
+# Return getTests (see LoadTestDataFiles), or if there are marks, a function
+# that gets the tests and the mark with getTests, puts the mark in marks, and
+# returns the tests.
+def _KeepMark(marks, fileName, getTests):
+    if marks is None:
+        return getTests
+    def getMarkedTests():
+        tests, mark = getTests()
+        if mark is None:
+            marks.pop(fileName, None)
+        else:
+            marks[fileName] = mark
+        return tests
+    return getMarkedTests
+
 
 # This function is expecting an FPDF object and a Glp2TestDfnStep.  It assumes
 # the pdf format, font, font size, etc has been set up.
@@ -310,14 +731,18 @@ def MakePdfDataStepRow(pdf, dataStep):
 #   (axis 1 label, axis 1 units, axis 1 color, axis 1 min, axis 1 max, axis 1 formatting),
 #   ...
 # )
+# The string is made with joins, so the time is linear in the number of
+# samples, but it is all in memory. Use WriteGraphDataCsv to write a graph to a
+# file.
 def MakeGraphDataCsvFormat(axisDefs, axisData):
-    # Make the csv header
-    # Axis 0 label (axis 0 units), Axis 1 label (axis 1 units) ... \n
+    # add the row data to the header and return
+    return (MakeGraphDataCsvHeader(axisDefs) +
+            ''.join([','.join(row) + '\n' for row in axisData]))
 
-    # Make a temp holding spot, and loop thru the axis defs, and create the
-    # csv header row
-    hStr= ''
-    axisLabel = '';
+# Make the csv header row (see MakeGraphDataCsvFormat) of the axis definitions:
+# Axis 0 label (axis 0 units), Axis 1 label (axis 1 units) ... \n
+def MakeGraphDataCsvHeader(axisDefs):
+    labels = []
     for axis in axisDefs:
         # the label uses odd codes.  Make them user friendly where the
         # codes are known (emperically determined)
@@ -330,95 +755,52 @@ def MakeGraphDataCsvFormat(axisDefs, axisData):
         else:
             # no or unknown code. Use label directly.
             label= axis[0]
-
-        hStr += label + ' (' + axis[1] + '),'
-    # strip off last comma and add a new line
-    hStr= hStr[:-1] + '\n'
-
-    # Make a temp holding spot and loop thru the axis data appending
-    # the data for each row
-    rStr = ''
-    for row in axisData:
-        for value in row:
-            rStr += value + ','
-        # strip off last comma and add a new line
-        rStr= rStr[:-1] + '\n'
-    # add the row data to the header and return
-    return hStr + rStr
+        labels.append(label + ' (' + axis[1] + ')')
+    return ','.join(labels) + '\n'
+
+# Write the graph data (a Glp2GraphData) to outFile (a text file object) in csv
+# format, the same as MakeGraphDataCsvFormat makes, without making the whole
+# csv as a string. The header is written, then the rows a chunk at a time
+# straight from the raw graph data (see Glp2GraphData.writeCsvData).
+def WriteGraphDataCsv(outFile, graph):
+    outFile.write(MakeGraphDataCsvHeader(graph.axisDefinitions))
+    graph.writeCsvData(outFile)
+
+# Set the figure of the voltage and current versus time plot to the data, and
+# return it. The figure (see Glp2GraphFigure) is made once per process and
+# reused, so it is only good until the next call, and must not be closed. dpi
+# is the resolution the figure will be drawn at (see FigureToRgb), if known.
+def MakeTvsVandIFigure(tData, vData, iData, iThreshold, iMax, title='', dpi=None):
+    from Glp2GraphFigure import GetTvsVandIFigure
+    return GetTvsVandIFigure().update(tData, vData, iData, iThreshold, iMax, title, dpi)
+
+# Return the figure rendered (rasterized) at dpi as an RGB image: a numpy uint8
+# array of height x width x 3.
+def FigureToRgb(fig, dpi):
+    fig.set_dpi(dpi)
+    fig.canvas.draw()
+    return np.asarray(fig.canvas.buffer_rgba())[:, :, :3]
 
 # Create a plot and make a pdf using the specified file name, if specified.
+# The file name may also be a file like object (e.g. an io.BytesIO) to make
+# the pdf in memory.
 def PlotTvsVandI(tData, vData, iData, iThreshold, iMax, title='', showPlot=False, fileName=None):
-    # get a figure and a single sub-plot to allow better control
-    # than using no sub-plots
-    fig, vAxis = plt.subplots()
-
-    # set the titles
-    fig.suptitle('Current and Voltage versus Time', \
-                fontsize=14, fontweight='bold')
-    plt.title(title, fontsize=12, fontweight='bold')
-    tColor = 'black'
-    vColor = 'blue'
-    iColor = 'green'
-    mxColor = 'orange' # max measured color
-    thColor = 'red' # threshold color
-    vAxis.set_xlabel('time (s)', color=tColor)
-    vAxis.set_ylabel('voltage (V)', color=vColor)
-    vAxis.plot(tData, vData, color=vColor, linewidth=0.5, label='V Meas.') # voltage line
-    # make additional room for the labels
-    #plt.subplots_adjust(left=0.18, bottom=0.18)
-
-    # make a second y axis for current that shares the same x axis as voltage
-    iAxis = vAxis.twinx()
-    # plot horizontal line at the max measured current
-    iMx = [iMax] * len(tData)
-    iAxis.plot(tData, iMx, color=mxColor, linewidth=0.75, label='I Meas. Max')
-    # Plot the measured current -- do this after the horizontal line at the max
-    # os the current is on top.
-    iAxis.set_ylabel('current (uA)', color=iColor)
-    iAxis.plot(tData, iData, color=iColor, linewidth=0.75, label='I Meas.')
-    # If the measured current is near the threshold, plot the threshold. Make this
-    # conditional, so that when a test is successful and the measured currents are
-    # very small, the threshold value does not overwhelm and drive the axis range,
-    # leaveing the plotted measured current at the very bottom of the graph at low
-    # resolution.
-    if oom(iMax) >= oom(iThreshold):
-        # Current values are large enough to make the threshold be in the same ballpark.
-        # pPlt horizontal line at current threshold
-        iThs = [iThreshold] * len(tData)
-        iAxis.plot(tData, iThs, color=thColor, linewidth=1.0, linestyle='dotted', label='I Thresh.')
-
-    # show the grid
-    vAxis.grid(b=True, which='both', linewidth=0.5, linestyle='-.')
-    # show legend
-    # Need voltage from the earlier plot (different axis), so use get_legend_handles_labels() for
-    # each axis and append to create complete lists of lines and labels for the legend
-    linesVAxis, labelsVAxis = vAxis.get_legend_handles_labels()
-    linesIAxis, labelsIAxis = iAxis.get_legend_handles_labels()
-    iAxis.legend(linesVAxis + linesIAxis, labelsVAxis + labelsIAxis)
-
-    # Establish a relation between the two zxes scales using a funciton and
-    # set the ticks on the second (iAxis) to be in the same location as on the
-    # first (vAxis).
-    # For each vAxis tick, figure out the percentage up the vAxis and put the
-    # iAxis tick in the same spot
-    limsV = vAxis.get_ylim() # [0] axis min value, [1] axis max value
-    limsI = iAxis.get_ylim()
-    # IMin + ((x - VMin) / (VMax - VMin)) * (IMax - IMin)
-    f = lambda x: limsI[0] + ((x - limsV[0])/(limsV[1] - limsV[0])) * (limsI[1] - limsI[0])
-    # calculate the current ticks.
-    iTicks = f(vAxis.get_yticks())
-    iAxis.yaxis.set_major_locator(ticker.FixedLocator(iTicks))
-
-    # put page numbers (3 of 3) in the lower left
-    #txStyle = dict(fontsize=8, color='black', horizontalalignment='left')
-    #plt.text(0.05, 0, 'Page 3 of 3', transform=plt.gcf().transFigure, **txStyle)
+    if showPlot:
+        # Showing the plot needs pyplot, and a figure of its own. The user will
+        # need to close the plot.
+        import matplotlib.pyplot as plt
+        from Glp2GraphFigure import Glp2TvsVandIFigure
+        fig = Glp2TvsVandIFigure(plt.figure()).update(tData, vData, iData,
+                                                       iThreshold, iMax, title)
+    else:
+        fig = MakeTvsVandIFigure(tData, vData, iData, iThreshold, iMax, title)
 
     # Save the plot if fileName is specified.
     if fileName is not None:
         try:
             # not sure what the possible exceptions are. Take a guess, and raise
             # in the 'generic' case
-            plt.savefig(fileName, orientation='portrait',
+            fig.savefig(fileName, orientation='portrait',
                        format='pdf', transparent=False,
                        bbox_inches='tight', pad_inches=0.25)
         except IOError as ioe:
@@ -428,34 +810,39 @@ def PlotTvsVandI(tData, vData, iData, iThreshold, iMax, title='', showPlot=False
             print('Unexpcted error saving the plot: ', sys.exc_info()[0])
             raise
 
-    # Show the plot if specified. The user will need to close the plot.
-    # Otherwise close the plot so it no longer consumes memory
     if showPlot:
         plt.show()
-    else:
-        plt.close()
-
-# Merge (append) pdf source 2 to the end of pdf source 1, and save the result in the
-# destination file.
-def MergePdf(fileNameSrc1, fileNameSrc2, fileNameDest):
-
-    # Now merge the plot pdf onto the end of the cal data pdf
-    merger= PdfFileMerger()
-    try:
-       src1= open(fileNameSrc1, 'rb')
-       src2= open(fileNameSrc2, 'rb')
-       merger.append(PdfFileReader(src1))
-       merger.append(PdfFileReader(src2))
-       src1.close()
-       src2.close()
-       merger.write(fileNameDest)
-       merger.close()
-
-    except IOError as ioe:
-        print('I/O error when merging the data and plot files:')
-        print(ioe)
-    except:
-        print('Unexpcted error merging the data and plot files: ', exc_info()[0])
-        raise
-
 
+# Return the document of an FPDF object as bytes, without writing a file. This
+# closes the document, like writing it to a file does. (fpdf 1.7 returns the
+# document as a latin-1 string, and later versions return a bytearray.)
+def PdfBytes(pdf):
+    pdfData = pdf.output(dest='S')
+    if isinstance(pdfData, str):
+        pdfData = pdfData.encode('latin-1')
+    return bytes(pdfData)
+
+# Return the pdf documents in pdfDatas (a list of bytes, e.g. from PdfBytes, or
+# a plot saved to an io.BytesIO) one after the other, as one pdf document
+# (bytes). The documents are read from memory. A single document is returned
+# as is. Errors are passed on to the caller.
+def MergePdf(pdfDatas):
+    if len(pdfDatas) == 1:
+        return pdfDatas[0]
+    from PyPDF2 import PdfFileMerger, PdfFileReader
+    with Phase('mergePdf'):
+        merger = PdfFileMerger()
+        for pdfData in pdfDatas:
+            merger.append(PdfFileReader(BytesIO(pdfData)))
+        merged = BytesIO()
+        merger.write(merged)
+        merger.close()
+        return merged.getvalue()
+
+# Write the pdf documents in pdfDatas (see MergePdf) one after the other into
+# the destination file. The destination is written once.
+def WritePdf(fileNameDest, pdfDatas):
+    pdfData = MergePdf(pdfDatas)
+    with Phase('fileWrite'):
+        with open(fileNameDest, 'wb') as destFile:
+            destFile.write(pdfData)
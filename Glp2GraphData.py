@@ -11,7 +11,17 @@
 # defintions, so it is implied which value goes with which axis.  Tuples are used
 # so inadvertant change is an error.
 #
+# The sample values are also decoded once, when the object is made (or, if
+# decodeSamples is False, the first time they are used), into a 2-D NumPy
+# array (samples x axes) of floats. The csv rows (writeCsvData) are written
+# from the raw string, so they don't need the samples decoded. The array is stored column major
+# (Fortran order), so the values of one axis are contiguous, and getAxisData
+# returns a view of the column rather than a copy. The array and views are read
+# only, for the same reason tuples are used. The min and max of each axis are
+# calculated once, the first time one is asked for.
+#
 # imports
+import numpy as np
 #
 class Glp2GraphData(object):
     # class constants
@@ -23,6 +33,13 @@ class Glp2GraphData(object):
     DATA_AXIS_TOKEN = '|'   # Delimits axis values within a data sample set
     DATA_SAMPLE_TOKEN = '\\'# Delimits one sample set from the next is the data set
     EOD_TOKEN = '}'         # End of data token
+    # The sample values as csv rows: the axis token is a comma, and the sample
+    # token ends the line
+    CSV_TRANSLATION = str.maketrans({DATA_AXIS_TOKEN: ',', DATA_SAMPLE_TOKEN: '\n'})
+    CSV_CHUNK_SIZE = 1 << 16 # characters written at a time
+    # the tokens between the sample values, as bytes (see _getSamples)
+    _AXIS_BYTE = ord(DATA_AXIS_TOKEN)
+    _SAMPLE_BYTE = ord(DATA_SAMPLE_TOKEN)
 
 
     # find the position of the beginning of the graph data (i.e. return the
@@ -99,16 +116,102 @@ class Glp2GraphData(object):
         #return a list of sample lists
         return tuple(samples)
 
-    def __init__(self, rawDataStr):
-        # make sure you can convert the raw data to a string. If so, get it.
-        try:
-            self._rawDataStr = str(rawDataStr)
-            self._axisDfns = self._getAxisDfns()
-            self._axisData = self._getAxisData()
-        except ValueError as ve:
-            print('The raw data must be a string or convertible to a string.')
-            print(ve)
-            quit()
+    # Decode the sample values into a 2-D array of floats with one column per
+    # axis. Return None if the positions of the data are not believable (the
+    # same cases _getAxisData returns None).
+    def _getSamples(self):
+        posSog = self._rawDataStr.find(self.SOG_TOKEN)
+        posEoax = self._rawDataStr.find(self.EOAX_TOKEN)
+        posEod = self._rawDataStr.find(self.EOD_TOKEN)
+        if (posSog == -1 or posEoax == -1 or posEod == -1 or posSog >= posEoax or
+                posEoax >= posEod or posEod >= len(self._rawDataStr)):
+            return None
+
+        axisCount = len(self._axisDfns) if self._axisDfns is not None else 1
+        sampleStr = self._rawDataStr[posEoax + 1:posEod]
+        # The data is created with a data sample token after the last data
+        # sample. Remove it.
+        if sampleStr.endswith(self.DATA_SAMPLE_TOKEN):
+            sampleStr = sampleStr[:-len(self.DATA_SAMPLE_TOKEN)]
+        if not sampleStr:
+            return np.empty((0, axisCount), dtype=self._dtype, order='F')
+        sampleCount = sampleStr.count(self.DATA_SAMPLE_TOKEN) + 1
+        valueCount = sampleCount * axisCount
+        values = None
+        # If every sample set has one value per axis, make the sample token
+        # the same as the axis token, so the whole section is one flat list of
+        # values, and read it in one go. It does when there is one token less
+        # than values, and every axisCount-th token is a sample token.
+        tokens = np.frombuffer(sampleStr.encode('latin-1', 'replace'), dtype=np.uint8)
+        tokens = tokens[(tokens == self._AXIS_BYTE) | (tokens == self._SAMPLE_BYTE)]
+        if (tokens.size == valueCount - 1 and
+                np.all(tokens[axisCount - 1::axisCount] == self._SAMPLE_BYTE)):
+            try:
+                values = np.fromstring(sampleStr.replace(self.DATA_SAMPLE_TOKEN,
+                                                         self.DATA_AXIS_TOKEN),
+                                       dtype=self._dtype, sep=self.DATA_AXIS_TOKEN)
+            except ValueError:
+                values = None # newer NumPy raises at a value it can't read
+            # fromstring stops at the first value it can't read (or skips an
+            # empty one), so the count tells if all of them were read
+            if values is not None and values.size != valueCount:
+                values = None
+
+        if values is not None:
+            samples = values.reshape((-1, axisCount))
+        else:
+            # Not every sample set has a value for every axis, or a value is
+            # empty or not a number. Go sample by sample: the empty values are
+            # skipped, the extra values are left out, the missing values are
+            # NaN, and a value that is not a number raises a ValueError.
+            samples = np.full((sampleCount, axisCount), np.nan, dtype=self._dtype)
+            for row, sample in enumerate(sampleStr.split(self.DATA_SAMPLE_TOKEN)):
+                rowValues = [float(value) for value in sample.split(self.DATA_AXIS_TOKEN)
+                             if value][:axisCount]
+                samples[row, :len(rowValues)] = rowValues
+        # make the columns contiguous
+        samples = np.asfortranarray(samples)
+        samples.flags.writeable = False
+        return samples
+
+    # Decode the sample values (see _getSamples), once, and return them.
+    def _decodeSamples(self):
+        if not self._samplesDecoded:
+            try:
+                self._samples = self._getSamples()
+            except ValueError as ve:
+                raise ValueError('The graph values must be numbers. ' + str(ve))
+            self._samplesDecoded = True
+        return self._samples
+
+    # Calculate the min and max of each axis (once).
+    def _calcLimits(self):
+        self._decodeSamples()
+        if self._samples is None or self._samples.shape[0] == 0:
+            self._axisMins = ()
+            self._axisMaxs = ()
+        else:
+            self._axisMins = tuple(self._samples.min(axis=0).tolist())
+            self._axisMaxs = tuple(self._samples.max(axis=0).tolist())
+
+    # rawDataStr is the raw data string, or something convertable to one. dtype
+    # is the NumPy type used for the sample values (e.g. np.float64 or
+    # np.float32 to use half the memory). A graph value that is not a number
+    # raises a ValueError when the samples are decoded, so the caller can
+    # report the test it is in and go on with the next one. If decodeSamples is
+    # False, the samples are decoded the first time they are used, e.g. not at
+    # all if only the csv rows are written.
+    def __init__(self, rawDataStr, dtype=np.float64, decodeSamples=True):
+        self._rawDataStr = str(rawDataStr)
+        self._dtype = dtype
+        self._axisDfns = self._getAxisDfns()
+        self._axisData = None # string values, made when asked for
+        self._samples = None
+        self._samplesDecoded = False
+        if decodeSamples:
+            self._decodeSamples()
+        self._axisMins = None # calculated when asked for
+        self._axisMaxs = None
 
     def __repr__(self):
         # __repr__ should create a 'representation that
@@ -134,29 +237,67 @@ class Glp2GraphData(object):
     def axisDefinitions(self):
         return self._axisDfns
 
-    # return a tuple of tuples containing the data for all axes
+    # return a tuple of tuples containing the data (as strings, the way they
+    # are in the file) for all axes
     @property
     def axesData(self):
+        if self._axisData is None:
+            self._axisData = self._getAxisData()
         return self._axisData
 
-    # return a tuple containing the data for the specified axis (zero based).
+    # return the sample values as a read only 2-D NumPy array, with one row per
+    # sample and one column per axis. None if there is no data.
+    @property
+    def samples(self):
+        return self._decodeSamples()
+
+    # return the number of samples
+    @property
+    def sampleCount(self):
+        samples = self._decodeSamples()
+        return 0 if samples is None else samples.shape[0]
+
+    # return a read only NumPy array (a view, not a copy) containing the data
+    # for the specified axis (zero based).
     def getAxisData(self, axis=0):
-        try:
-            return tuple([float(samples[axis]) for samples in self._axisData])
-        except IndexError:
+        samples = self._decodeSamples()
+        if samples is None or axis < 0 or axis >= samples.shape[1]:
             return None
+        return samples[:, axis]
+
+    # Write the sample values to outFile (a text file object) as csv rows: a
+    # line per sample with the values comma separated, as strings the way they
+    # are in the raw data (the same values as axesData). The rows are written
+    # straight from the raw data string, a chunk at a time, so the memory used
+    # does not grow with the number of samples. Nothing is written if the
+    # positions of the data are not believable (see _getAxisData).
+    def writeCsvData(self, outFile, chunkSize=CSV_CHUNK_SIZE):
+        posSog = self._rawDataStr.find(self.SOG_TOKEN)
+        posEoax = self._rawDataStr.find(self.EOAX_TOKEN)
+        posEod = self._rawDataStr.find(self.EOD_TOKEN)
+        if (posSog == -1 or posEoax == -1 or posEod == -1 or posSog >= posEoax or
+                posEoax >= posEod or posEod >= len(self._rawDataStr)):
+            return
+        # Each sample ends with a data sample token. Anything after the last one
+        # is not a sample (_getAxisData leaves it out too).
+        posEnd = self._rawDataStr.rfind(self.DATA_SAMPLE_TOKEN, posEoax + 1, posEod) + 1
+        for start in range(posEoax + 1, posEnd, chunkSize):
+            outFile.write(self._rawDataStr[start:min(start + chunkSize, posEnd)]
+                          .translate(self.CSV_TRANSLATION))
 
     # return the minimum value found in the data for the specified axis (zero based).
     def getAxisDataMin(self, axis=0):
-        try:
-            return min([float(samples[axis]) for samples in self._axisData])
-        except IndexError:
+        if self._axisMins is None:
+            self._calcLimits()
+        if axis < 0 or axis >= len(self._axisMins):
             return None
+        return self._axisMins[axis]
 
     # return the maximum value found in the data for the specified axis (zero based).
     def getAxisDataMax(self, axis=0):
-        try:
-            return max([float(samples[axis]) for samples in self._axisData])
-        except IndexError:
+        if self._axisMaxs is None:
+            self._calcLimits()
+        if axis < 0 or axis >= len(self._axisMaxs):
             return None
+        return self._axisMaxs[axis]
 
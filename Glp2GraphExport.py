@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Glp2GraphExport.py
+#
+# Export the graph samples of a batch of tests to one file in a columnar binary
+# format, for analysis, instead of a text csv file per step. The format is by
+# the file name extension:
+#   .npz        NumPy (numpy.load). Always available.
+#   .parquet    Apache Parquet. Needs pyarrow.
+#   .feather    Feather (Arrow IPC, lz4 compressed). Needs pyarrow.
+#
+# There is a row per graph sample, with the sample values, and the information
+# about the step the sample is from:
+#   t, i, v             time, current and voltage, in the units of the graph
+#                       (see tUnit, iUnit and vUnit), the same as the graph csv
+#   step                index of the step in the export (0 based)
+#   fileName, testGuid, testInstanceId, deviceNumber, operator, stepNumber,
+#   testTimestamp, nominalVoltage, measuredVoltage, currentLimit,
+#   currentLimitUnit, measuredCurrent, measuredCurrentUnit, tUnit, iUnit, vUnit
+#                       the step information (see Glp2TestDataStep)
+# A missing number is NaN, or -1 for the whole numbers.
+#
+# The step information repeats for every sample of a step, so it is not
+# repeated in the file. In Parquet and Feather, the step columns are dictionary
+# encoded (they read as a flat table, e.g. with pandas.read_parquet). In npz,
+# the sample columns (step, t, i, v) have an entry per sample, and the step
+# columns have an entry per step; index a step column with the step column to
+# get it per sample:  data['testGuid'][data['step']]
+#
+# Only steps with graph data are exported, so the graph data must be kept when
+# the tests are loaded (see LoadTestDataFiles keepGraphData).
+#
+# imports
+from os.path import splitext
+import numpy as np
+
+GRAPH_EXPORT_FORMATS = ('.npz', '.parquet', '.feather')
+
+# The step columns: (column name, NumPy type, value of the step). The units of
+# the graph axes are from the graph.
+_STEP_COLUMNS = (
+    ('fileName', str, lambda test, step, graph: test.fileName),
+    ('testGuid', str, lambda test, step, graph: test.getTestGuid),
+    ('testInstanceId', np.int32, lambda test, step, graph: test.testInstanceId),
+    ('deviceNumber', str, lambda test, step, graph: step.deviceNumber),
+    ('operator', str, lambda test, step, graph: step.operator),
+    ('stepNumber', np.int32, lambda test, step, graph: step.stepNumber),
+    ('testTimestamp', str, lambda test, step, graph: step.testTimestamp),
+    ('nominalVoltage', np.float64, lambda test, step, graph: step.nominalVoltage),
+    ('measuredVoltage', np.float64, lambda test, step, graph: step.measuredVoltage),
+    ('currentLimit', np.float64, lambda test, step, graph: step.currentLimit),
+    ('currentLimitUnit', str, lambda test, step, graph: step.currentLimitUnit),
+    ('measuredCurrent', np.float64, lambda test, step, graph: step.measuredCurrent),
+    ('measuredCurrentUnit', str, lambda test, step, graph: step.measuredCurrentUnit),
+    ('tUnit', str, lambda test, step, graph: _AxisUnit(graph, 0)),
+    ('iUnit', str, lambda test, step, graph: _AxisUnit(graph, 1)),
+    ('vUnit', str, lambda test, step, graph: _AxisUnit(graph, 2)),
+)
+# The sample columns: (column name, graph axis)
+_SAMPLE_COLUMNS = (('t', 0), ('i', 1), ('v', 2))
+
+# Return the units of a graph axis, or '' if there are none.
+def _AxisUnit(graph, axis):
+    axisDfns = graph.axisDefinitions
+    if axisDfns is None or axis >= len(axisDfns) or len(axisDfns[axis]) < 2:
+        return ''
+    return axisDfns[axis][1]
+
+# Return the value for a step column: None is NaN, -1 or ''.
+def _ColumnValue(value, dtype):
+    if value is not None:
+        return value
+    if dtype is str:
+        return ''
+    return np.nan if dtype is np.float64 else -1
+
+# Return the columns of the graph data of the tests, as two dictionaries of
+# NumPy arrays: the step columns (an entry per step) and the sample columns (an
+# entry per sample, with the step column the index of the step).
+def CollectGraphColumns(tests):
+    stepValues = {name: [] for name, dtype, getValue in _STEP_COLUMNS}
+    sampleParts = {name: [] for name, axis in _SAMPLE_COLUMNS}
+    sampleParts['step'] = []
+    for test in tests:
+        for step in test.steps:
+            graph = step.graph
+            if graph is None or graph.sampleCount == 0:
+                continue
+            stepIdx = len(sampleParts['step'])
+            for name, dtype, getValue in _STEP_COLUMNS:
+                stepValues[name].append(_ColumnValue(getValue(test, step, graph), dtype))
+            for name, axis in _SAMPLE_COLUMNS:
+                axisData = graph.getAxisData(axis)
+                if axisData is None:
+                    axisData = np.full(graph.sampleCount, np.nan)
+                sampleParts[name].append(axisData)
+            sampleParts['step'].append(np.full(graph.sampleCount, stepIdx, dtype=np.int32))
+
+    stepColumns = {name: np.array(stepValues[name], dtype=dtype)
+                   for name, dtype, getValue in _STEP_COLUMNS}
+    sampleColumns = {}
+    for name in ('step',) + tuple(name for name, axis in _SAMPLE_COLUMNS):
+        parts = sampleParts[name]
+        dtype = np.int32 if name == 'step' else np.float64
+        sampleColumns[name] = (np.concatenate(parts).astype(dtype, copy=False) if parts
+                               else np.empty(0, dtype=dtype))
+    return stepColumns, sampleColumns
+
+# Return an Arrow table (pyarrow) of the columns, with a row per sample. The
+# step columns are dictionary encoded: the dictionary is the unique values of
+# the column (readers like pandas need them to be unique), with the smallest
+# index type that fits.
+def _MakeArrowTable(stepColumns, sampleColumns):
+    import pyarrow as pa
+    arrays = {name: pa.array(values) for name, values in sampleColumns.items()}
+    stepIdx = sampleColumns['step']
+    for name, values in stepColumns.items():
+        uniqueValues, stepCodes = np.unique(values, return_inverse=True)
+        for indexType in (np.int8, np.int16, np.int32):
+            if len(uniqueValues) <= np.iinfo(indexType).max + 1:
+                break
+        arrays[name] = pa.DictionaryArray.from_arrays(
+            pa.array(stepCodes.astype(indexType)[stepIdx]), pa.array(uniqueValues))
+    return pa.table(arrays)
+
+# Write the graph data of the tests to fileName, in the format of the file name
+# extension (see GRAPH_EXPORT_FORMATS). Return the number of steps and samples
+# written. A ValueError is raised for an unknown extension, and an ImportError
+# if pyarrow is needed and not installed. File errors are passed on.
+def ExportGraphData(fileName, tests):
+    fileExt = splitext(fileName)[1].lower()
+    if fileExt not in GRAPH_EXPORT_FORMATS:
+        raise ValueError('The graph export file must end with one of: ' +
+                         ', '.join(GRAPH_EXPORT_FORMATS))
+    if fileExt != '.npz':
+        # check before collecting the data
+        try:
+            import pyarrow
+        except ImportError:
+            raise ImportError('pyarrow is needed to write ' + fileExt + ' files. Install '
+                              'it (pip install pyarrow) or use an .npz file.')
+
+    stepColumns, sampleColumns = CollectGraphColumns(tests)
+    if fileExt == '.npz':
+        # not compressed, so it is quick to write and load
+        np.savez(fileName, **sampleColumns, **stepColumns)
+    elif fileExt == '.parquet':
+        import pyarrow.parquet as pq
+        pq.write_table(_MakeArrowTable(stepColumns, sampleColumns), fileName)
+    else:
+        import pyarrow.feather as feather
+        feather.write_feather(_MakeArrowTable(stepColumns, sampleColumns), fileName)
+    return len(stepColumns['testGuid']), len(sampleColumns['step'])
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Glp2GraphFigure.py
+#
+# The matplotlib figure of the voltage and current versus time graph of a test
+# step, made once and reused for every step.
+#
+# Making the figure (figure, axes, twin axes, titles, labels, grid) costs more
+# than drawing the lines, and used to be done, and torn down again, for every
+# step through the pyplot global state. Glp2TvsVandIFigure makes the figure and
+# styling once, on an Agg canvas, without pyplot. For each step, update() only
+# sets the line data, the axis limits, the current ticks, the legend and the
+# title. Then the figure can be saved (savefig) or rendered (see FigureToRgb).
+#
+# The voltage and current lines are decimated to a min/max envelope (see
+# Glp2Decimate) with one bucket per pixel of the width of the plot, at the dpi
+# the figure is drawn at, so long tests draw quickly and spikes are kept. The
+# max measured current and threshold are constant lines across the plot.
+#
+# One object is used at a time: update, then save or render, then the next
+# update. It is not meant to be shared between threads. Worker processes each
+# get their own with GetTvsVandIFigure(), which makes one per process (a forked
+# worker does not reuse the one it inherits from its parent).
+#
+# imports
+from os import getpid
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+import matplotlib.ticker as ticker
+# user libraries
+# Note: May need PYTHONPATH (set in ~/.profile?) to be set depending
+# on the location of the imported files
+from bpsMath import oom
+from Glp2Decimate import DecimateMinMax
+
+class Glp2TvsVandIFigure(object):
+    # class constants
+    T_COLOR = 'black'
+    V_COLOR = 'blue'
+    I_COLOR = 'green'
+    MX_COLOR = 'orange' # max measured color
+    TH_COLOR = 'red' # threshold color
+
+    # Make the figure. fig is a matplotlib Figure to use, e.g. a pyplot figure
+    # to show on the screen. By default a new figure with an Agg canvas is made.
+    def __init__(self, fig=None):
+        if fig is None:
+            fig = Figure()
+            FigureCanvasAgg(fig)
+        self._fig = fig
+        # a single sub-plot to allow better control than using no sub-plots
+        self._vAxis = fig.add_subplot(1, 1, 1)
+        # set the titles
+        fig.suptitle('Current and Voltage versus Time', fontsize=14, fontweight='bold')
+        self._vAxis.set_xlabel('time (s)', color=self.T_COLOR)
+        self._vAxis.set_ylabel('voltage (V)', color=self.V_COLOR)
+        self._vLine, = self._vAxis.plot([], [], color=self.V_COLOR, linewidth=0.5,
+                                        label='V Meas.') # voltage line
+        # a second y axis for current that shares the same x axis as voltage
+        self._iAxis = self._vAxis.twinx()
+        self._iAxis.set_ylabel('current (uA)', color=self.I_COLOR)
+        # horizontal line at the max measured current
+        self._mxLine = self._iAxis.axhline(0.0, color=self.MX_COLOR, linewidth=0.75,
+                                           label='I Meas. Max')
+        # The measured current -- after the horizontal line at the max so the
+        # current is on top.
+        self._iLine, = self._iAxis.plot([], [], color=self.I_COLOR, linewidth=0.75,
+                                        label='I Meas.')
+        # horizontal line at the current threshold (see update for when it is shown)
+        self._thLine = self._iAxis.axhline(0.0, color=self.TH_COLOR, linewidth=1.0,
+                                           linestyle='dotted', label='I Thresh.')
+        # show the grid
+        self._vAxis.grid(True, which='both', linewidth=0.5, linestyle='-.')
+
+    @property
+    def figure(self):
+        return self._fig
+
+    # Return the width of the plot in pixels at the dpi of the figure.
+    @property
+    def plotWidth(self):
+        return int(self._vAxis.get_position().width * self._fig.get_figwidth() * self._fig.dpi)
+
+    # Set the graph to the data of a step, and return the figure. dpi is the
+    # resolution the figure will be drawn at (it is set on the figure), which
+    # sets how far the lines are decimated. By default the dpi of the figure is
+    # used.
+    def update(self, tData, vData, iData, iThreshold, iMax, title='', dpi=None):
+        if dpi is not None:
+            self._fig.set_dpi(dpi)
+        buckets = self.plotWidth
+        self._vAxis.set_title(title, fontsize=12, fontweight='bold')
+        self._vLine.set_data(*DecimateMinMax(tData, vData, buckets))
+        self._mxLine.set_ydata([iMax, iMax])
+        self._iLine.set_data(*DecimateMinMax(tData, iData, buckets))
+        # If the measured current is near the threshold, show the threshold. Make
+        # this conditional, so that when a test is successful and the measured
+        # currents are very small, the threshold value does not overwhelm and
+        # drive the axis range, leaveing the plotted measured current at the very
+        # bottom of the graph at low resolution.
+        showThreshold = oom(iMax) >= oom(iThreshold)
+        self._thLine.set_ydata([iThreshold, iThreshold])
+        self._thLine.set_visible(showThreshold)
+
+        # Autoscale to the new data. The hidden threshold line does not count.
+        self._vAxis.relim()
+        self._iAxis.relim(visible_only=True)
+        self._vAxis.autoscale_view()
+        self._iAxis.autoscale_view()
+
+        # Show legend. Need voltage from the other axis, so list the lines.
+        lines = [self._vLine, self._mxLine, self._iLine]
+        if showThreshold:
+            lines.append(self._thLine)
+        self._iAxis.legend(lines, [line.get_label() for line in lines])
+
+        # Establish a relation between the two axes scales using a function and
+        # set the ticks on the second (iAxis) to be in the same location as on
+        # the first (vAxis).
+        # For each vAxis tick, figure out the percentage up the vAxis and put
+        # the iAxis tick in the same spot
+        limsV = self._vAxis.get_ylim() # [0] axis min value, [1] axis max value
+        limsI = self._iAxis.get_ylim()
+        # IMin + ((x - VMin) / (VMax - VMin)) * (IMax - IMin)
+        f = lambda x: limsI[0] + ((x - limsV[0])/(limsV[1] - limsV[0])) * (limsI[1] - limsI[0])
+        # calculate the current ticks.
+        iTicks = f(self._vAxis.get_yticks())
+        self._iAxis.yaxis.set_major_locator(ticker.FixedLocator(iTicks))
+        return self._fig
+
+# The figure of this process, made the first time it is asked for.
+_tvsVandIFigure = None
+_tvsVandIFigurePid = None
+
+# Return the Glp2TvsVandIFigure of this process.
+def GetTvsVandIFigure():
+    global _tvsVandIFigure, _tvsVandIFigurePid
+    if _tvsVandIFigure is None or _tvsVandIFigurePid != getpid():
+        _tvsVandIFigure = Glp2TvsVandIFigure()
+        _tvsVandIFigurePid = getpid()
+    return _tvsVandIFigure
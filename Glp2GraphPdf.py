@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Glp2GraphPdf.py
+#
+# Put the voltage and current versus time graph of a test step straight onto a
+# page of the report pdf (an FPDF object, e.g. cPdf), rather than making a
+# separate pdf of the graph with matplotlib and appending it.
+#
+# There are two ways to do it:
+#   AddGraphImage   The matplotlib figure (see MakeTvsVandIFigure) is rendered
+#                   to an RGB image at a given dpi, in memory, and the image is
+#                   put on the page. It looks like the matplotlib pdf graph.
+#   DrawTvsVandI    The graph is drawn with pdf path operators straight from
+#                   the data, without matplotlib. This is the fastest, and is
+#                   meant for large batches. The layout is simpler: the same
+#                   lines, colors, axes, grid and legend, but the current ticks
+#                   are not lined up with the voltage ticks.
+#
+# Both start a new page. DrawTvsVandI puts the font back as it was, and leaves
+# the text color black.
+#
+# Neither can be done (fast enough) with the public API of fpdf 1.7, so they
+# use its internals, and only through the fpdf adapter below (see
+# _UseFpdfInternals), which checks the fpdf version and the internals first.
+# With any other version (e.g. fpdf2), or if the internals are not there,
+# only the public API is used.
+#
+# imports
+import zlib
+import numpy as np
+from math import ceil, floor, log10
+import fpdf
+# user libraries
+# Note: May need PYTHONPATH (set in ~/.profile?) to be set depending
+# on the location of the imported files
+from bpsMath import oom
+from Glp2Decimate import DecimateMinMax
+
+# Graph colors (rgb), the same as the matplotlib graph
+T_COLOR = (0, 0, 0)         # black
+V_COLOR = (0, 0, 255)       # blue
+I_COLOR = (0, 128, 0)       # green
+MX_COLOR = (255, 165, 0)    # orange, max measured current
+TH_COLOR = (255, 0, 0)      # red, current threshold
+GRID_COLOR = (176, 176, 176)
+
+# Put an RGB image (numpy uint8 array, height x width x 3) on the page at x, y
+# with width w (the height keeps the aspect ratio). The image does not need to
+# be in a file. name is the key the image is kept by in the pdf, and must be
+# unique within the pdf.
+def AddRgbImage(pdf, name, rgb, x, y, w):
+    height, width = rgb.shape[:2]
+    if _UseFpdfInternals(pdf):
+        _PutRgbImage(pdf, name, rgb)
+        pdf.image(name, x, y, w, w * height / width)
+    else:
+        # later versions take an image object (Pillow is required by fpdf2)
+        from PIL import Image
+        pdf.image(Image.fromarray(np.ascontiguousarray(rgb)), x, y, w, w * height / width)
+
+# Add a page with the rendered figure on it, the width of the page between the
+# margins. name is unique key for the image in the pdf (see AddRgbImage).
+def AddGraphImage(pdf, name, rgb):
+    pdf.add_page()
+    epw = pdf.w - (pdf.l_margin + pdf.r_margin)
+    AddRgbImage(pdf, name, rgb, pdf.l_margin, pdf.get_y(), epw)
+
+# **** fpdf adapter
+# The graph is drawn (see DrawTvsVandI) as a list of commands, in pdf units
+# (points, origin at the bottom left of the page):
+#   ('style', color, width, dash)   stroke color (rgb), line width and dash
+#                                   ('' for solid, or e.g. '1 2')
+#   ('line', x0, y0, x1, y1)
+#   ('polyline', xs, ys)            numpy arrays, non finite points left out
+#   ('rect', x, y, w, h)
+#   ('clip', x, y, w, h)            clip what is drawn after it to the rect,
+#   ('unclip',)                     until this
+# With fpdf 1.7.x (the version this was written for) the commands are written
+# to the page as pdf path operators, in one go, with its _out method, and an
+# image from memory is put where it keeps the images it has read (images).
+# With any other version only the public API is used: the lines are drawn
+# with line (or polyline, fpdf2), which is slower, the dash is only set if
+# there is set_dash_pattern (fpdf2), and nothing is clipped (the data are in
+# the plot area anyway).
+
+# Return True if the internals of fpdf 1.7 can be used with the pdf.
+def _UseFpdfInternals(pdf):
+    return (fpdf.FPDF_VERSION.startswith('1.7.') and
+            isinstance(getattr(pdf, 'images', None), dict) and
+            callable(getattr(pdf, '_out', None)))
+
+# Put an RGB image in the images of the pdf (fpdf 1.7 internals), as if it was
+# read from a file, so it can be put on the page with image(name). The pixels
+# are the image data, Flate compressed, like a png without the png encoding.
+def _PutRgbImage(pdf, name, rgb):
+    height, width = rgb.shape[:2]
+    if name not in pdf.images:
+        pdf.images[name] = {'w': width, 'h': height, 'cs': 'DeviceRGB',
+                            'bpc': 8, 'f': 'FlateDecode',
+                            'data': zlib.compress(np.ascontiguousarray(rgb).tobytes(), 6),
+                            'i': len(pdf.images) + 1}
+
+# Draw the commands (see above) on the current page of the pdf.
+def _DrawCommands(pdf, commands):
+    if _UseFpdfInternals(pdf):
+        pdf._out('\n'.join(_CommandOps(commands)))
+    else:
+        _DrawCommandsPublic(pdf, commands)
+
+# Return the pdf operators (strings) of the commands.
+def _CommandOps(commands):
+    ops = ['q']
+    for command in commands:
+        kind = command[0]
+        if kind == 'style':
+            ops.append(_StrokeOps(*command[1:]))
+        elif kind == 'line':
+            ops.append('{:.2f} {:.2f} m {:.2f} {:.2f} l S'.format(*command[1:]))
+        elif kind == 'polyline':
+            ops.append(_PolylineOps(*command[1:]))
+        elif kind == 'rect':
+            ops.append('{:.2f} {:.2f} {:.2f} {:.2f} re S'.format(*command[1:]))
+        elif kind == 'clip':
+            ops.append('q {:.2f} {:.2f} {:.2f} {:.2f} re W n'.format(*command[1:]))
+        elif kind == 'unclip':
+            ops.append('Q')
+    ops.append('Q')
+    return ops
+
+# Draw the commands with the public API of fpdf (user units, origin at the top
+# left of the page). The draw color and line width are put back after.
+def _DrawCommandsPublic(pdf, commands):
+    k = pdf.k
+    pageH = pdf.h
+    lineWidth = pdf.line_width
+    setDash = getattr(pdf, 'set_dash_pattern', None)
+    polyline = getattr(pdf, 'polyline', None)
+    for command in commands:
+        kind = command[0]
+        if kind == 'style':
+            color, width, dash = command[1:]
+            pdf.set_draw_color(*color)
+            pdf.set_line_width(width / k)
+            if setDash is not None:
+                dashes = [float(value) / k for value in dash.split()]
+                setDash(*dashes[:2])
+        elif kind == 'line':
+            x0, y0, x1, y1 = command[1:]
+            pdf.line(x0 / k, pageH - y0 / k, x1 / k, pageH - y1 / k)
+        elif kind == 'polyline':
+            xs, ys = command[1:]
+            keep = np.isfinite(xs) & np.isfinite(ys)
+            xs = (xs[keep] / k).tolist()
+            ys = (pageH - ys[keep] / k).tolist()
+            if polyline is not None:
+                if len(xs) > 1:
+                    polyline(list(zip(xs, ys)))
+            else:
+                for pointIdx in range(len(xs) - 1):
+                    pdf.line(xs[pointIdx], ys[pointIdx], xs[pointIdx + 1], ys[pointIdx + 1])
+        elif kind == 'rect':
+            x, y, w, h = command[1:]
+            pdf.rect(x / k, pageH - (y + h) / k, w / k, h / k)
+    if setDash is not None:
+        setDash()
+    pdf.set_draw_color(0, 0, 0)
+    pdf.set_line_width(lineWidth)
+
+# Return 'nice' tick values (1, 2, 2.5 or 5 x 10^n apart) from lo to hi, about
+# count of them, and the range from the first to the last tick, which covers
+# lo to hi.
+def _NiceTicks(lo, hi, count=6):
+    if not (np.isfinite(lo) and np.isfinite(hi)):
+        lo, hi = 0.0, 1.0
+    if hi <= lo:
+        pad = abs(lo) * 0.05 if lo else 1.0
+        lo, hi = lo - pad, hi + pad
+    rawStep = (hi - lo) / max(count - 1, 1)
+    magnitude = 10.0 ** floor(log10(rawStep))
+    for mult in (1.0, 2.0, 2.5, 5.0, 10.0):
+        step = mult * magnitude
+        if step >= rawStep:
+            break
+    first = floor(lo / step) * step
+    last = ceil(hi / step) * step
+    ticks = np.arange(round((last - first) / step) + 1) * step + first
+    return ticks, first, last
+
+# Return a tick label: no trailing zeros, and no '-0'.
+def _TickLabel(value):
+    label = '{:.6g}'.format(value)
+    return '0' if label == '-0' else label
+
+# Return the pdf operators (a string) to set the stroke color, width and dash.
+def _StrokeOps(color, width, dash=''):
+    return '{:.3f} {:.3f} {:.3f} RG {:.2f} w [{}] 0 d'.format(
+        color[0] / 255.0, color[1] / 255.0, color[2] / 255.0, width, dash)
+
+# Return the pdf operators (a string) to stroke a line through the points.
+# The points are already in pdf units (points, origin at the bottom left).
+# Non finite points are left out.
+def _PolylineOps(xs, ys):
+    keep = np.isfinite(xs) & np.isfinite(ys)
+    if not keep.all():
+        xs, ys = xs[keep], ys[keep]
+    if len(xs) == 0:
+        return ''
+    coords = np.empty(2 * len(xs))
+    coords[0::2] = xs
+    coords[1::2] = ys
+    coords = coords.tolist()
+    return (('{:.2f} {:.2f} m\n' + '{:.2f} {:.2f} l\n' * (len(xs) - 1)).format(*coords)
+            + 'S')
+
+# Add a page with the voltage and current versus time graph drawn on it with
+# pdf path operators (no matplotlib). The arguments are the same as for
+# PlotTvsVandI: the data are numpy arrays, and the currents are in uA.
+def DrawTvsVandI(pdf, tData, vData, iData, iThreshold, iMax, title=''):
+    pdf.add_page()
+    k = pdf.k
+    pageH = pdf.h
+    # save the state that is changed here, to put it back at the end
+    fontFamily, fontStyle, fontSize = pdf.font_family, pdf.font_style, pdf.font_size_pt
+
+    # plot area (user units), leaving room for the titles, labels and legend
+    epw = pdf.w - (pdf.l_margin + pdf.r_margin)
+    left = pdf.l_margin + 48.0 / k
+    right = pdf.l_margin + epw - 48.0 / k
+    top = pdf.get_y() + 48.0 / k
+    bottom = top + (right - left) * 0.65
+
+    # titles
+    pdf.set_text_color(*T_COLOR)
+    pdf.set_font('helvetica', 'B', 14)
+    pdf.set_xy(pdf.l_margin, top - 46.0 / k)
+    pdf.cell(epw, 16.0 / k, 'Current and Voltage versus Time', border=0, align='C')
+    pdf.set_font('helvetica', 'B', 12)
+    pdf.set_xy(pdf.l_margin, top - 26.0 / k)
+    pdf.cell(epw, 14.0 / k, title, border=0, align='C')
+
+    # axis ranges. The current range includes the max, and the threshold if it
+    # is drawn (the same rule as the matplotlib graph).
+    showThreshold = oom(iMax) >= oom(iThreshold)
+    iRange = [np.nanmin(iData) if len(iData) else 0.0, np.nanmax(iData) if len(iData) else 1.0]
+    iRange = [min(iRange[0], iMax), max(iRange[1], iMax)]
+    if showThreshold:
+        iRange = [min(iRange[0], iThreshold), max(iRange[1], iThreshold)]
+    tMin, tMax = (np.nanmin(tData), np.nanmax(tData)) if len(tData) else (0.0, 1.0)
+    if not tMax > tMin:
+        tMax = tMin + 1.0
+    vTicks, vMin, vMax = _NiceTicks(np.nanmin(vData) if len(vData) else 0.0,
+                                    np.nanmax(vData) if len(vData) else 1.0)
+    iTicks, iLo, iHi = _NiceTicks(iRange[0], iRange[1])
+    tTicks = _NiceTicks(tMin, tMax)[0]
+    tTicks = tTicks[(tTicks >= tMin) & (tTicks <= tMax)]
+
+    # data to pdf coordinates (points, origin at the bottom left of the page)
+    xScale = (right - left) * k / (tMax - tMin)
+    xOffset = left * k - tMin * xScale
+    vScale = (bottom - top) * k / (vMax - vMin)
+    vOffset = (pageH - bottom) * k - vMin * vScale
+    iScale = (bottom - top) * k / (iHi - iLo)
+    iOffset = (pageH - bottom) * k - iLo * iScale
+    x0, x1 = left * k, right * k
+    y0, y1 = (pageH - bottom) * k, (pageH - top) * k
+
+    commands = []
+    # grid at the time and voltage ticks
+    commands.append(('style', GRID_COLOR, 0.5, '3 2 1 2'))
+    for t in tTicks:
+        commands.append(('line', t * xScale + xOffset, y0, t * xScale + xOffset, y1))
+    for v in vTicks:
+        commands.append(('line', x0, v * vScale + vOffset, x1, v * vScale + vOffset))
+    # the data, clipped to the plot area, decimated to a bucket per point of
+    # the width of the plot (see Glp2Decimate)
+    buckets = int(x1 - x0)
+    commands.append(('clip', x0, y0, x1 - x0, y1 - y0))
+    commands.append(('style', V_COLOR, 0.5, ''))
+    tLine, vLine = DecimateMinMax(tData, vData, buckets)
+    commands.append(('polyline', tLine * xScale + xOffset, vLine * vScale + vOffset))
+    # reference lines are constant, so they are just a line across the plot
+    commands.append(('style', MX_COLOR, 0.75, ''))
+    commands.append(('line', x0, iMax * iScale + iOffset, x1, iMax * iScale + iOffset))
+    commands.append(('style', I_COLOR, 0.75, ''))
+    tLine, iLine = DecimateMinMax(tData, iData, buckets)
+    commands.append(('polyline', tLine * xScale + xOffset, iLine * iScale + iOffset))
+    if showThreshold:
+        commands.append(('style', TH_COLOR, 1.0, '1 2'))
+        commands.append(('line', x0, iThreshold * iScale + iOffset,
+                         x1, iThreshold * iScale + iOffset))
+    commands.append(('unclip',))
+    # frame and ticks
+    commands.append(('style', T_COLOR, 0.8, ''))
+    commands.append(('rect', x0, y0, x1 - x0, y1 - y0))
+    for t in tTicks:
+        commands.append(('line', t * xScale + xOffset, y0, t * xScale + xOffset, y0 - 3.5))
+    for v in vTicks:
+        commands.append(('line', x0, v * vScale + vOffset, x0 - 3.5, v * vScale + vOffset))
+    for i in iTicks:
+        commands.append(('line', x1, i * iScale + iOffset, x1 + 3.5, i * iScale + iOffset))
+    # legend lines
+    legend = (('V Meas.', V_COLOR, ''), ('I Meas. Max', MX_COLOR, ''),
+              ('I Meas.', I_COLOR, ''))
+    if showThreshold:
+        legend += (('I Thresh.', TH_COLOR, '1 2'),)
+    legendX = x1 - 80.0
+    for row, (label, color, dash) in enumerate(legend):
+        legendY = y1 - 10.0 - row * 11.0
+        commands.append(('style', color, 1.0, dash))
+        commands.append(('line', legendX, legendY, legendX + 16.0, legendY))
+    _DrawCommands(pdf, commands)
+
+    # tick labels, axis labels and legend labels
+    pdf.set_font('helvetica', '', 8)
+    for t in tTicks:
+        label = _TickLabel(t)
+        pdf.text((t * xScale + xOffset) / k - pdf.get_string_width(label) / 2.0,
+                 bottom + 12.0 / k, label)
+    for v in vTicks:
+        label = _TickLabel(v)
+        pdf.text(left - 5.0 / k - pdf.get_string_width(label),
+                 pageH - (v * vScale + vOffset) / k + 3.0 / k, label)
+    for i in iTicks:
+        pdf.text(right + 5.0 / k, pageH - (i * iScale + iOffset) / k + 3.0 / k, _TickLabel(i))
+    for row, (label, color, dash) in enumerate(legend):
+        pdf.text(legendX / k + 20.0 / k, pageH - (y1 - 10.0 - row * 11.0) / k + 3.0 / k, label)
+    # axis labels: time below the plot, voltage and current above their axes
+    pdf.set_font('helvetica', '', 10)
+    label = 'time (s)'
+    pdf.text((left + right) / 2.0 - pdf.get_string_width(label) / 2.0, bottom + 26.0 / k, label)
+    pdf.set_text_color(*V_COLOR)
+    pdf.text(left - 40.0 / k, top - 6.0 / k, 'voltage (V)')
+    pdf.set_text_color(*I_COLOR)
+    label = 'current (uA)'
+    pdf.text(right + 40.0 / k - pdf.get_string_width(label), top - 6.0 / k, label)
+
+    # put the font back, and the text color back to black
+    pdf.set_text_color(0, 0, 0)
+    pdf.set_font(fontFamily, fontStyle, fontSize)
+    pdf.set_y(bottom + 40.0 / k)
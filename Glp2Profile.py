@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Glp2Profile.py
+#
+# Timing of the phases of a run (a run profile), to see where the time goes,
+# e.g. on a real archive: the wall (elapsed) and cpu (process) time and the
+# number of calls of each phase, and counts of what was done (files, tests,
+# steps, graph samples, etc.). See glpCreateReport.py --profile.
+#
+# The code marks its phases with Phase:
+#   with Phase('pdfOutput'):
+#       pdfData = PdfBytes(pdf)
+# or a function with Timed (each call is a phase), or the time to get the
+# items of an iterator as they are used with TimedIter (e.g. the rows of a
+# csv.reader, without reading them all first), and counts with
+# Count('tests', len(tests)). Unless a profile was started (StartProfile),
+# these do nothing, so they can stay in the code for good. The phases are
+# timed where they happen, so they can be nested: the stages of the
+# pipeline (e.g. loadTests) hold the phases of the work they do (e.g.
+# csvDecode and makeTestList). The times of a phase are the total of all its
+# calls.
+#
+# The phases done by worker processes (see LoadTestDataFiles and
+# MakeTestReports) are timed in the worker, and sent back with the result (see
+# RunProfiled and ProfiledResult), so they are in the profile too. Their times
+# are the total over all the workers, so with more than one worker they can
+# add up to more than the time of the stage they are in. The cpu time of a
+# stage is the time of this process only.
+#
+# The profile can also run cProfile for each outer phase (one that is not in
+# another phase), and write the statistics of each one to a file
+# (<phase>.prof, see pstats) in a directory. Only the outer phases are
+# profiled, as only one cProfile can run at a time. cProfile does not see into
+# the worker processes; use one worker (-lw 1 -j 1) to profile all the work.
+#
+# imports
+import json
+import os
+import sys
+from datetime import datetime
+from functools import wraps
+from time import perf_counter, process_time
+
+class Glp2RunProfile(object):
+    # class constants
+    PROFILE_VERSION = 1   # change when the JSON format changes
+
+    # If cProfileDir is given, each outer phase is run with cProfile, and the
+    # statistics are written to the directory when the profile is saved.
+    def __init__(self, cProfileDir=None):
+        self._cProfileDir = cProfileDir
+        self._startTime = datetime.now()
+        self._wallStart = perf_counter()
+        self._cpuStart = process_time()
+        self._wall = None
+        self._cpu = None
+        self._phases = {}    # phase name: [calls, wall, cpu], in first called order
+        self._counts = {}    # count name: count
+        self._depth = 0      # how many phases the current phase is in
+        self._cProfiles = {} # outer phase name: cProfile.Profile
+
+    def __str__(self):
+        outputMsg=  '{:24} {:>8} {:>10} {:>10}\n'.format('Phase', 'Calls', 'Wall (s)', 'Cpu (s)')
+        for name, (calls, wall, cpu) in self._phases.items():
+            outputMsg+= '{:24} {:8} {:10.3f} {:10.3f}\n'.format(name, calls, wall, cpu)
+        outputMsg+= '\n{:24} {:>8}\n'.format('Count', 'Total')
+        for name, count in self._counts.items():
+            outputMsg+= '{:24} {:8}\n'.format(name, count)
+        return(outputMsg)
+
+    # Time the code in a with block as a phase of the name.
+    def phase(self, name):
+        return _ProfilePhase(self, name)
+
+    def _startPhase(self, name):
+        self._depth += 1
+        if self._depth == 1 and self._cProfileDir:
+            cProfile = self._cProfiles.get(name)
+            if cProfile is None:
+                import cProfile as cProfileModule
+                cProfile = self._cProfiles[name] = cProfileModule.Profile()
+            cProfile.enable()
+
+    def _endPhase(self, name, wall, cpu):
+        if self._depth == 1 and name in self._cProfiles:
+            self._cProfiles[name].disable()
+        self._depth -= 1
+        self._addPhase(name, 1, wall, cpu)
+
+    def _addPhase(self, name, calls, wall, cpu):
+        phase = self._phases.get(name)
+        if phase is None:
+            self._phases[name] = [calls, wall, cpu]
+        else:
+            phase[0] += calls
+            phase[1] += wall
+            phase[2] += cpu
+
+    # Add n to the count of the name.
+    def count(self, name, n=1):
+        self._counts[name] = self._counts.get(name, 0) + n
+
+    # Forget the phases and counts so far, and stop any cProfile, e.g. in a
+    # worker process, which starts with a copy of the profile of the process
+    # that started it.
+    def reset(self):
+        for cProfile in self._cProfiles.values():
+            cProfile.disable()
+        self._cProfiles = {}
+        self._cProfileDir = None
+        self._phases = {}
+        self._counts = {}
+        self._depth = 0
+
+    # Return the phases and counts so far, and reset (see merge).
+    def take(self):
+        data = (self._phases, self._counts)
+        self._phases = {}
+        self._counts = {}
+        return data
+
+    # Add the phases and counts taken from another profile (see take), e.g. of
+    # a worker process.
+    def merge(self, data):
+        phases, counts = data
+        for name, (calls, wall, cpu) in phases.items():
+            self._addPhase(name, calls, wall, cpu)
+        for name, count in counts.items():
+            self.count(name, count)
+
+    # Stop the run time (wall and cpu) of the profile.
+    def stop(self):
+        if self._wall is None:
+            self._wall = perf_counter() - self._wallStart
+            self._cpu = process_time() - self._cpuStart
+
+    # Return the profile as a dictionary (e.g. for JSON).
+    def asDict(self):
+        self.stop()
+        return {'version': self.PROFILE_VERSION,
+                'program': os.path.basename(sys.argv[0]),
+                'arguments': sys.argv[1:],
+                'start': self._startTime.isoformat(timespec='seconds'),
+                'wall': round(self._wall, 6),
+                'cpu': round(self._cpu, 6),
+                'phases': [{'name': name, 'calls': calls, 'wall': round(wall, 6),
+                            'cpu': round(cpu, 6)}
+                           for name, (calls, wall, cpu) in self._phases.items()],
+                'counts': dict(self._counts)}
+
+    # Write the profile to a JSON file, and the cProfile statistics of the
+    # phases to the cProfile directory, if there is one. Return the names of
+    # the cProfile files written.
+    def save(self, fileName):
+        with open(fileName, 'w', encoding='UTF-8') as profileFile:
+            json.dump(self.asDict(), profileFile, indent=2)
+        statsFiles = []
+        if self._cProfileDir and self._cProfiles:
+            os.makedirs(self._cProfileDir, exist_ok=True)
+            for name, cProfile in self._cProfiles.items():
+                statsFile = os.path.join(self._cProfileDir, name + '.prof')
+                cProfile.dump_stats(statsFile)
+                statsFiles.append(statsFile)
+        return statsFiles
+
+    # properties
+    @property
+    def phases(self):
+        return {name: tuple(phase) for name, phase in self._phases.items()}
+
+    @property
+    def counts(self):
+        return dict(self._counts)
+
+# A phase being timed (see Glp2RunProfile phase).
+class _ProfilePhase(object):
+    def __init__(self, profile, name):
+        self._profile = profile
+        self._name = name
+
+    def __enter__(self):
+        self._profile._startPhase(self._name)
+        self._wallStart = perf_counter()
+        self._cpuStart = process_time()
+        return self
+
+    def __exit__(self, excType, excValue, tb):
+        self._profile._endPhase(self._name, perf_counter() - self._wallStart,
+                                process_time() - self._cpuStart)
+        return False
+
+# The phase used when there is no profile: does nothing.
+class _NoPhase(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, tb):
+        return False
+
+_NO_PHASE = _NoPhase()
+# The profile of this process, or None if there is none.
+_profile = None
+
+# Start a profile (Glp2RunProfile) for this process, and return it. See
+# Glp2RunProfile for cProfileDir.
+def StartProfile(cProfileDir=None):
+    global _profile
+    _profile = Glp2RunProfile(cProfileDir)
+    return _profile
+
+# Stop the profile of this process, and return it (None if there was none).
+def StopProfile():
+    global _profile
+    profile, _profile = _profile, None
+    if profile is not None:
+        profile.stop()
+    return profile
+
+# Return the profile of this process, or None.
+def GetProfile():
+    return _profile
+
+# Time the code in a with block as a phase of the profile, if there is one.
+def Phase(name):
+    if _profile is None:
+        return _NO_PHASE
+    return _profile.phase(name)
+
+# Decorator: time each call of the function as a phase of the name (see Phase).
+def Timed(name):
+    def decorator(func):
+        @wraps(func)
+        def timedFunc(*args, **kwargs):
+            with Phase(name):
+                return func(*args, **kwargs)
+        return timedFunc
+    return decorator
+
+# Yield the items of an iterable, timing how long it takes to get them (e.g.
+# to read and decode the rows of a csv.reader as they are used) as one call of
+# a phase of the profile, if there is one. The time of the code using the
+# items is not in the phase.
+def TimedIter(name, iterable):
+    if _profile is None:
+        yield from iterable
+        return
+    profile = _profile
+    items = iter(iterable)
+    wall = 0.0
+    cpu = 0.0
+    try:
+        while True:
+            wallStart = perf_counter()
+            cpuStart = process_time()
+            try:
+                item = next(items)
+            except StopIteration:
+                return
+            finally:
+                wall += perf_counter() - wallStart
+                cpu += process_time() - cpuStart
+            yield item
+    finally:
+        profile._addPhase(name, 1, wall, cpu)
+
+# Add n to a count of the profile, if there is one.
+def Count(name, n=1):
+    if _profile is not None:
+        _profile.count(name, n)
+
+# Run func(*args) in a worker process, and return the result and the phases
+# and counts of the profile of the worker while it ran (None if there is no
+# profile). See ProfiledResult.
+def RunProfiled(func, *args):
+    if _profile is None:
+        return func(*args), None
+    _profile.reset()
+    result = func(*args)
+    return result, _profile.take()
+
+# Return the result of a future of RunProfiled, and add the phases and counts
+# of the worker to the profile of this process.
+def ProfiledResult(future):
+    result, data = future.result()
+    if data is not None and _profile is not None:
+        _profile.merge(data)
+    return result
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Glp2ReportManifest.py
+#
+# A record (manifest) of the tests that reports have been made for, used for
+# incremental runs. The tester keeps adding tests to the same data files, so
+# making the reports for every test in every file each time costs more and
+# more. The manifest keeps, for each test (by data file name and test GUID, as
+# a test can be in more than one data file), the content digest of the test
+# rows (see TestRowsDigest), the name the report files were made with, and the
+# report files. On the next run, a test with the same digest whose report files
+# are all still there is skipped when the data files are read (see
+# IterTestList skipTests), so only new or changed tests are made into objects
+# and reports.
+#
+# The report names normally come from the position of a test in the whole run
+# (fname_Test_N), which changes as tests are added. For incremental runs they
+# come from the position of the test in its data file instead (see
+# reportName), and a test in the manifest keeps the name it was first reported
+# with, so a changed test replaces its own report files.
+#
+# A report also has the test definition in it, so the manifest keeps the stamp
+# (modification time and size, see DfnFileStamp) of the definition file each
+# test was reported with, or None if it had no definition. When the stamp of
+# the definition of a test has changed since it was reported (the definition
+# was added, changed or removed), the test is forgotten (see
+# forgetChangedDfns), so it is reported again.
+#
+# The settings that change the report files (e.g. the suppress options and the
+# graph mode) are kept with the manifest. If they are different, the manifest
+# is started over, and every test is reported again.
+#
+# The manifest is a JSON file, written to a temporary name and then renamed,
+# like the test definition cache. If it can not be read, or was written by a
+# different version, it is started over.
+#
+# imports
+import json
+import os
+from Glp2TestDfnCache import DfnFileStamp
+
+# Return the settings that change the report files (see Glp2ReportManifest),
+# from the options (see MakeTestReport, and the outputFilePrefix) and the
+# decimal separator of the data files.
+def ManifestSettings(options, decimalSeparator):
+    return {'outputFilePrefix': options.outputFilePrefix,
+            'outputFileEncoding': options.outputFileEncoding,
+            'supressDfnPdf': options.supressDfnPdf,
+            'supressDataPdf': options.supressDataPdf,
+            'supressGraphPdf': options.supressGraphPdf,
+            'supressGraphCsv': options.supressGraphCsv,
+            'graphMode': options.graphMode,
+            'graphDpi': options.graphDpi,
+            'decimalSeparator': decimalSeparator}
+
+class Glp2ReportManifest(object):
+    # class constants
+    MANIFEST_VERSION = 2   # change when the entry format changes
+    DEFAULT_FILE_NAME = 'reportManifest.json'
+
+    def __init__(self, manifestDir, settings, manifestFileName=DEFAULT_FILE_NAME):
+        self._manifestDir = manifestDir
+        self._manifestFile = os.path.join(manifestDir, manifestFileName)
+        self._settings = dict(settings)
+        # file name: {test GUID: {'digest', 'programGuid', 'dfnStamp', 'name',
+        #                         'outputs'}}
+        self._entries = {}
+        self._changed = False
+        self._settingsChanged = False
+        try:
+            with open(self._manifestFile, 'r', encoding='UTF-8') as manifestFile:
+                manifest = json.load(manifestFile)
+            if manifest.get('version') == self.MANIFEST_VERSION:
+                if manifest.get('settings') == self._settings:
+                    self._entries = manifest['tests']
+                else:
+                    self._settingsChanged = True
+                    self._changed = True
+        except FileNotFoundError:
+            pass # no manifest yet
+        except Exception as e:
+            print('Warning: The report manifest ' + self._manifestFile +
+                  ' could not be read and will be started over.')
+            print(e)
+
+    def __str__(self):
+        outputMsg=  '{:20} {}\n'.format('Manifest File: ', self._manifestFile)
+        outputMsg+= '{:20} {}\n'.format('Tests: ', self.testCount)
+        return(outputMsg)
+
+    # Return a dictionary of (file name, test GUID): content digest of the
+    # tests that do not need to be reported again (see IterTestList
+    # skipTests): those with all their report files still there.
+    def reportedTests(self):
+        return {(fileName, testGuid): entry['digest']
+                for fileName, fileEntries in self._entries.items()
+                for testGuid, entry in fileEntries.items()
+                if all(os.path.exists(output) for output in entry['outputs'])}
+
+    # Return the report name (no extension) for a test (Glp2TestData): the
+    # name it was reported with, or if it is not in the manifest, a name from
+    # the prefix, the data file name and the position of the test in the file,
+    # which does not change as tests are added to the file.
+    def reportName(self, test, outputFilePrefix=None):
+        entry = self._entries.get(test.fileName, {}).get(test.getTestGuid)
+        if entry is not None:
+            return entry['name']
+        return ((outputFilePrefix or '') + os.path.splitext(test.fileName)[0] + '_Test_' +
+                str(test.testInstanceId + 1))
+
+    # Record that the report of a test (Glp2TestData, with its contentDigest)
+    # was made with the report name, and the test definition (Glp2TestDfn, or
+    # None if there was none). The report files are the pdf, and if withCsv,
+    # the graph csv files of the steps that were made.
+    def record(self, test, name, withCsv=True, testDfn=None):
+        outputs = [name + '.pdf']
+        if withCsv:
+            outputs.extend(csvName for csvName in
+                           (name + '_Step_' + str(step.stepNumber) + '.csv'
+                            for step in test.steps)
+                           if os.path.exists(csvName))
+        self._entries.setdefault(test.fileName, {})[test.getTestGuid] = {
+            'digest': test.contentDigest,
+            'programGuid': test.getTestProgramGuid,
+            'dfnStamp': self._dfnStamp(testDfn),
+            'name': name,
+            'outputs': [os.path.abspath(output) for output in outputs]}
+        self._changed = True
+
+    # Return the stamp of the file of a test definition (a list, as it is kept
+    # in JSON), or None if there is no definition or file.
+    @staticmethod
+    def _dfnStamp(testDfn):
+        if testDfn is None or testDfn.fileName is None:
+            return None
+        stamp = DfnFileStamp(testDfn.fileName)
+        return list(stamp) if stamp is not None else None
+
+    # Forget the reports of the tests whose test definition is not the one
+    # they were reported with: the definition of their program in testDfns
+    # (Glp2TestDfn objects, the last one if more than one has the GUID, like
+    # Glp2TestDfnCatalog) was added, changed or removed since. They are
+    # reported again, with the same names.
+    def forgetChangedDfns(self, testDfns):
+        dfnStamps = {testDfn.dfnGuid: self._dfnStamp(testDfn) for testDfn in testDfns
+                     if testDfn.dfnGuid is not None}
+        for fileEntries in self._entries.values():
+            for entry in fileEntries.values():
+                if (entry['digest'] is not None and
+                        entry.get('dfnStamp') != dfnStamps.get(entry.get('programGuid'))):
+                    entry['digest'] = None
+                    self._changed = True
+
+    # Write the manifest to disk if anything changed.
+    def save(self):
+        if not self._changed:
+            return
+        try:
+            os.makedirs(self._manifestDir, exist_ok=True)
+            tmpFile = self._manifestFile + '.tmp'
+            with open(tmpFile, 'w', encoding='UTF-8') as manifestFile:
+                json.dump({'version': self.MANIFEST_VERSION, 'settings': self._settings,
+                           'tests': self._entries}, manifestFile)
+            os.replace(tmpFile, self._manifestFile)
+            self._changed = False
+        except OSError as ose:
+            print('Warning: The report manifest ' + self._manifestFile +
+                  ' could not be written.')
+            print(ose)
+
+    # properties
+    @property
+    def manifestFile(self):
+        return self._manifestFile
+
+    # True if the manifest was started over because the settings changed
+    @property
+    def settingsChanged(self):
+        return self._settingsChanged
+
+    @property
+    def testCount(self):
+        return sum(len(fileEntries) for fileEntries in self._entries.values())
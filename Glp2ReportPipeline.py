@@ -0,0 +1,490 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Glp2ReportPipeline.py
+#
+# The steps (stages) of making the reports, as an API, so the reports can be
+# made from another program, or many times over by one process that has
+# numpy, matplotlib, the test definitions, etc. already loaded, without going
+# through glpCreateReport.py (which is now a command line wrapper around this).
+# Each stage can also be timed on its own.
+#
+# The stages, in order, and what they return:
+#   loadConfig      read the config file(s)                  Glp2ReportConfig
+#   discover        find the data and definition files       Glp2ReportSources
+#   loadDfns        load the test definitions                tuple of Glp2TestDfn
+#   loadTests       load the tests from the data files       tuple of Glp2TestData
+#                   (or loadStoreTests, from the results store)
+#   ingest          loadDfns and loadTests together          Glp2ReportInputs
+#   associate       match the tests with their definitions   Glp2TestDfnCatalog
+#   makeReportJobs  name the report of each test             list of jobs
+#   render          make the report files                    list of failed jobs
+#   export          write the graph data to one file         (steps, samples)
+# run does them all.
+#
+# The stage results are named tuples, so they can not be changed by mistake
+# between stages. A problem that stops a stage (e.g. a file that was asked for
+# is not there, or can not be read) raises a ValueError with a message for the
+# user. Problems that do not stop the stage (e.g. one of many definition files
+# can not be read) are passed to log.
+#
+# The options are the same as the glpCreateReport.py arguments (see
+# ReportOptions for the ones used here), so the parsed arguments can be used.
+#
+# imports
+from collections import namedtuple
+from os.path import join, splitext
+from types import SimpleNamespace
+import configparser
+
+# user libraries
+# Note: May need PYTHONPATH (set in ~/.profile?) to be set depending
+# on the location of the imported files
+from bpsFile import listFiles
+from bpsCPdf import cPdf # pdf creation
+
+# specialized libraries unlikely to be used elsewhere. These should
+# travel with this file.
+from Glp2TestDfn import Glp2TestDfn
+from Glp2TestDfnCatalog import Glp2TestDfnCatalog
+from Glp2TestDfnCache import Glp2TestDfnCache
+from Glp2Functions import LoadTestDataFiles
+from Glp2TestReport import MakeTestReports, GRAPH_MODE_PDF
+from Glp2GraphExport import ExportGraphData
+from Glp2ResultsStore import Glp2ResultsStore, ResultsDbFile
+from Glp2ReportManifest import Glp2ReportManifest, ManifestSettings
+from Glp2Profile import Timed, Count
+
+# The config: the config files read and the parser (configparser), the data
+# and definition paths, the cache directory, and how to read the data files.
+Glp2ReportConfig = namedtuple('Glp2ReportConfig',
+                              ('configFiles', 'config', 'testDataPath', 'testDfnPath',
+                               'cacheDir', 'decimalSeparator', 'columnMap'))
+# The files found: the names of all the files in the data and definition
+# paths, and the (name, path) of the files to load. lazyDfns is True if the
+# definitions are only loaded when used (all of them are considered).
+Glp2ReportSources = namedtuple('Glp2ReportSources',
+                               ('dataNames', 'dfnNames', 'dataFiles', 'dfnFiles', 'lazyDfns'))
+# The test definitions and tests loaded
+Glp2ReportInputs = namedtuple('Glp2ReportInputs', ('testDfns', 'tests'))
+# What run did: the catalog (see associate), the report jobs and the indexes of
+# the jobs that failed.
+Glp2ReportResult = namedtuple('Glp2ReportResult', ('catalog', 'jobs', 'failedJobs'))
+
+# Return the options used by the pipeline, with the defaults of the
+# glpCreateReport.py arguments, changed by any given as keyword arguments.
+def ReportOptions(**options):
+    reportOptions = SimpleNamespace(configEncoding='UTF-8', dataFileEncoding='UTF-16',
+                                    testDfnEncoding='UTF-16', outputFilePrefix=None,
+                                    outputFileEncoding='UTF-8', supressDfnPdf=False,
+                                    supressDataPdf=False, supressGraphPdf=False,
+                                    supressGraphCsv=False, noDfnCache=False,
+                                    graphMode=GRAPH_MODE_PDF, graphDpi=150)
+    for name, value in options.items():
+        if not hasattr(reportOptions, name):
+            raise ValueError('Unknown report option: ' + name)
+        setattr(reportOptions, name, value)
+    return reportOptions
+
+# Return the messages about the test and definition associations of the
+# catalog (see associate), for the association pdf: the associations found,
+# the tests without a definition, and the definitions without tests.
+def MakeAssociationMessages(catalog):
+    tests = catalog.tests
+    testDfns = catalog.dfns
+    dataDfnAssocMsg = '\nEach data file may contain test data for multiple tests. Each \
+test is associated with a particular test definition. For the data files processed \
+(see above), there is test data for ' + str(len(tests)) + ' test'
+    # account for plural tests
+    if len(tests) > 1:
+        dataDfnAssocMsg += 's.'
+    else:
+        dataDfnAssocMsg += '.'
+
+    dataDfnAssocMsg += '\n\nIn the test data, the following associations were found \
+between data file names and test definitions:'
+    # the file vs dfn associations
+    for fn, dfns in catalog.getProgramNamesByFile().items():
+        dataDfnAssocMsg += '\n\n' + fn
+        if dfns:
+            # if there are definitions associated with the file
+            for dfn in dfns:
+                dataDfnAssocMsg += '\n    ' + dfn
+        else:
+            # no definitions associated with the file
+            # I don't think it is possible to get here, but just for safety
+            dataDfnAssocMsg += '    (no definitions associated with this file)'
+
+    # Message if there is any test data without a found definition
+    tNoDef = catalog.getTestsWithoutDfn()
+    if tNoDef:
+        # TODO: Insert PDF Bold 'section' heading
+        tNoDefMsg = '\n\nThere is test data that is associated with one or more test \
+definitions that are not found. This is usually because the definition was \
+deleted after it was used to run a test.\n\nNote that internal identification \
+numbers are used, rather than names, to uniquely identify test definitions. \
+This means that this condition can occur, for example, when a (new) test \
+definition is given the same name as a previously deleted test definition \
+that was used to run a test. In this case, the data will still contain the \
+identification number of the old test definition, and even though the new test \
+definition has the same name, the new test definition will not be associated \
+with the previously run test.\n\nThere is no test definition found for the following '
+        # accommodate singular or plural in the message
+        if len(tNoDef) == 1:
+            tNoDefMsg += 'test:'
+        else:
+            tNoDefMsg += str(len(tNoDef)) + ' tests:'
+
+        for testIdx in tNoDef:
+            tNoDefMsg += '\n\nFile Name: ' + tests[testIdx].fileName
+            tNoDefMsg += '\n    Program Name: ' + tests[testIdx].getTestProgramName
+            tNoDefMsg += '\n    Test number: ' + str(tests[testIdx].testInstanceId)
+    else:
+        # There is no test data that is not associated with a definition.
+        tNoDefMsg = '\n\nAll the test data is associated with a test definition.'
+
+    # Message if there are any unused test definitions.
+    defNoT = catalog.getDfnsWithoutTests()
+    if defNoT:
+        # TODO: Insert PDF Bold 'section' heading
+        defNoTMsg = '\n\nThere are test definitions found that were not used for any \
+of the test data. This is not an indication of a problem. It simply means that \
+a test is defined that was not used when running any of the test for which there \
+is test data.  It is being reported for information only.\n\nThe following test \
+definitions are not used in any of the test data:'
+        for defIdx in defNoT:
+            defNoTMsg += '\n\nFile Name: ' + testDfns[defIdx].fileName
+            defNoTMsg += '\n    Definition Name: ' + testDfns[defIdx].name
+            defNoTMsg += '\n    Programmer: ' + str(testDfns[defIdx].nameOfProgrammer)
+    else:
+        # All the test definitions are used by the test data.
+        defNoTMsg = '\n\nAll the test definitions are used by the test data.'
+    return dataDfnAssocMsg, tNoDefMsg, defNoTMsg
+
+# Write the test definition and test data associations text (e.g. from
+# MakeAssociationMessages) to a pdf file.
+@Timed('associationPdf')
+def WriteAssociationPdf(fileName, text):
+    # Units are in points (pt)
+    # Override default footer to not show page numbers
+    dataAssocPdf = cPdf(orientation = 'P', unit = 'pt', format='Letter',
+                        headerText='Test Definition and Test Data Associations')
+    # define the nb alias for total page numbers used in footer
+    dataAssocPdf.alias_nb_pages() # Enable {nb} magic: total number of pages used in the footer
+    dataAssocPdf.set_margins(54, 72, 54) # left, top, right margins (in points)
+
+    # Set the font for the main content
+    # use the bold proportional font
+    if dataAssocPdf.fontNames[0] != dataAssocPdf.defaultFontNames[0]:
+        # non-default
+        dataAssocPdf.set_font("regularMono", '', 10)
+    else:
+        # default
+        dataAssocPdf.set_font(dataAssocPdf.defaultFontNames[0], '', 10)
+
+    dataAssocPdf.add_page() # use ctor params
+    dataAssocPdf.multi_cell(w=0, h=13, txt=text, border=0, align='L', fill=False)
+    dataAssocPdf.output(name = fileName, dest='F')
+
+class Glp2ReportPipeline(object):
+    def __init__(self, options=None, log=print):
+        self._options = options if options is not None else ReportOptions()
+        self._log = log
+        # The test definition cache of the cache directory last used, kept so
+        # it is not read again for each run.
+        self._dfnCache = None
+
+    # **** load config
+    # Read the config file (or a list of them, see configparser) and return
+    # the config (Glp2ReportConfig). dirPrefix is put in front of the data and
+    # definition paths of the config.
+    @Timed('loadConfig')
+    def loadConfig(self, configFile='config.ini', dirPrefix=''):
+        config = configparser.ConfigParser()
+        configFiles = config.read(configFile, encoding=self._options.configEncoding)
+        if not configFiles:
+            raise ValueError('The configuration file: ' + str(configFile) + ' was not found.')
+        try:
+            testDataPath = join(dirPrefix or '', config['Paths']['common_dir'],
+                                config['Paths']['data_dir'])
+            testDfnPath = join(dirPrefix or '', config['Paths']['common_dir'],
+                               config['Paths']['test_dfn_dir'])
+        except KeyError as ke:
+            raise ValueError('The configuration file: ' + str(configFile) +
+                             ' does not have the ' + str(ke) + ' path.')
+        # the decimal separator of the data files, or the default of a ',' (the
+        # euro way)
+        if config.has_option('TestData', 'decimalSeparator'):
+            decimalSeparator = config['TestData']['decimalSeparator']
+        else:
+            decimalSeparator = ','
+        # the column layout of the data files from the [TestData] section, if
+        # there is one. Missing columns use the default index (see
+        # Glp2DataSchema).
+        columnMap = dict(config['TestData']) if config.has_section('TestData') else None
+        return Glp2ReportConfig(tuple(configFiles), config, testDataPath, testDfnPath,
+                                config.get('Paths', 'cache_dir', fallback='.glp2cache'),
+                                decimalSeparator, columnMap)
+
+    # **** discover
+    # Find the data files (*.csv) and test definition files (*.TPR) of the
+    # config, and return them (Glp2ReportSources). If a data file or test
+    # definition file is given, only it is used, and it must be there. If not,
+    # all the files are used. File names starting with a '.' (hidden or
+    # locked files), or of another type, are left out.
+    @Timed('discover')
+    def discover(self, reportConfig, dataFile='', testDfnFile=''):
+        dfnNames = tuple(self._listFiles(reportConfig.testDfnPath, 'test definition'))
+        if testDfnFile:
+            if testDfnFile not in dfnNames:
+                raise ValueError('The test definition file \'' + testDfnFile +
+                                 '\' was specified, but was not found.')
+            dfnFiles = ((testDfnFile, join(reportConfig.testDfnPath, testDfnFile)),)
+        else:
+            dfnFiles = tuple((dfnName, join(reportConfig.testDfnPath, dfnName))
+                             for dfnName in dfnNames
+                             if not dfnName.startswith('.') and dfnName.lower().endswith('.tpr'))
+
+        dataNames = tuple(self._listFiles(reportConfig.testDataPath, 'test data'))
+        if dataFile:
+            if dataFile not in dataNames:
+                raise ValueError('The test data file \'' + dataFile +
+                                 '\' was specified, but was not found.')
+            dataFiles = ((dataFile, join(reportConfig.testDataPath, dataFile)),)
+        else:
+            dataFiles = tuple((dataName, join(reportConfig.testDataPath, dataName))
+                              for dataName in dataNames
+                              if not dataName.startswith('.') and
+                              dataName.lower().endswith('.csv'))
+        return Glp2ReportSources(dataNames, dfnNames, dataFiles, dfnFiles, not testDfnFile)
+
+    # Return the names of the files in a path, or raise a ValueError if the
+    # path is not there.
+    @staticmethod
+    def _listFiles(path, what):
+        try:
+            return listFiles(path)
+        except (FileNotFoundError, NotADirectoryError):
+            raise ValueError('The ' + what + ' path \'' + path + '\' was not found.')
+
+    # **** ingest
+    # Return the test definition cache (Glp2TestDfnCache) for the config, or
+    # None if it is not used (noDfnCache option).
+    def getDfnCache(self, reportConfig):
+        if self._options.noDfnCache:
+            return None
+        if self._dfnCache is None or self._dfnCacheDir != reportConfig.cacheDir:
+            self._dfnCache = Glp2TestDfnCache(reportConfig.cacheDir)
+            self._dfnCacheDir = reportConfig.cacheDir
+        return self._dfnCache
+
+    # Save the definitions loaded (e.g. while making the reports) in the test
+    # definition cache, if it is used.
+    def saveDfnCache(self):
+        if self._dfnCache is not None and not self._options.noDfnCache:
+            self._dfnCache.save()
+
+    # Load the test definitions of the sources, and return them as a tuple.
+    # Unless the definition file was given, the definitions are lazy: only the
+    # general section (GUID, programmer, etc.) is read now, and the rest of the
+    # file is read if the definition is used. A definition file that was given
+    # and can not be read raises a ValueError; any other is logged and left out.
+    # The test definition cache is used unless the noDfnCache option is set.
+    @Timed('loadDfns')
+    def loadDfns(self, reportConfig, sources):
+        dfnCache = self.getDfnCache(reportConfig)
+        loadDfn = dfnCache.loadDfn if dfnCache is not None else Glp2TestDfn
+        encoding = self._options.testDfnEncoding
+        testDfns = []
+        for dfnName, dfnPath in sources.dfnFiles:
+            try:
+                # split off the extension from the file name to use as the dfn name.
+                testDfns.append(loadDfn(dfnName.rsplit('.', 1)[0], dfnPath, encoding,
+                                        lazy=sources.lazyDfns))
+            except UnicodeError as ue:
+                message = ('Unicode Error: Unable to load test definition file: ' + dfnName +
+                           '. Check encoding. ' + encoding + ' was expected.')
+                if not sources.lazyDfns:
+                    raise ValueError(message + '\n' + str(ue))
+                self._log(message)
+                self._log(ue)
+        Count('dfnFiles', len(testDfns))
+        # Save any new or changed definitions in the cache for next time.
+        if dfnCache is not None:
+            dfnCache.prune()
+            dfnCache.save()
+        return tuple(testDfns)
+
+    # Return True if the graph data of the tests is needed: for the graph pdf,
+    # the graph csv files, or a graph export (if withExport). The graph data
+    # is by far the largest part of the data, so it is only kept if it is used.
+    def needsGraphData(self, withExport=False):
+        return (not (self._options.supressGraphPdf and self._options.supressGraphCsv) or
+                bool(withExport))
+
+    # Load the tests of the data files of the sources, in file order, and
+    # return them as a tuple. The files are loaded by workers processes (see
+    # LoadTestDataFiles, None is one per cpu). skipTests leaves out the tests
+    # already reported (see openManifest). A file that can not be read raises a
+    # ValueError, or if skipBadFiles, is logged and left out (e.g. a file that
+    # is still being copied, see glpWatch.py). If marks is a dictionary, each
+    # file is only read from where it was read to before, and marks is updated
+    # (see LoadTestDataFiles), for files that are added to.
+    @Timed('loadTests')
+    def loadTests(self, reportConfig, sources, keepGraphData=True, skipTests=None, workers=1,
+                  skipBadFiles=False, marks=None):
+        encoding = self._options.dataFileEncoding
+        tests = []
+        for fileName, getTests in LoadTestDataFiles(sources.dataFiles, encoding,
+                                                    reportConfig.decimalSeparator,
+                                                    reportConfig.columnMap, keepGraphData,
+                                                    workers, skipTests, marks):
+            try:
+                tests.extend(getTests())
+            except (ValueError, OSError) as err:
+                if isinstance(err, UnicodeDecodeError):
+                    message = ('Unicode Error: Unable to load test data file: ' + fileName +
+                               '. Check encoding. ' + encoding + ' was expected.\n' + str(err))
+                elif isinstance(err, ValueError):
+                    message = ('Error: Unable to load test data file: ' + fileName +
+                               '. The file does not match the expected column layout.\n' +
+                               str(err))
+                elif skipBadFiles:
+                    message = ('Error: Unable to read test data file: ' + fileName + '.\n' +
+                               str(err))
+                else:
+                    raise
+                if not skipBadFiles:
+                    raise ValueError(message)
+                self._log(message)
+        return tuple(tests)
+
+    # Load the tests from the results store (see Glp2ResultsStore, the store
+    # file is resultsDb, or the one of the config), all of them or those of a
+    # device, and return them as a tuple. A store that can not be opened
+    # raises a ValueError.
+    @Timed('loadStoreTests')
+    def loadStoreTests(self, reportConfig, resultsDb='', deviceNumber=None, keepGraphData=True):
+        try:
+            store = Glp2ResultsStore(ResultsDbFile(reportConfig.config, resultsDb))
+        except (ValueError, OSError) as err:
+            raise ValueError('Unable to open the results store. ' + str(err))
+        with store:
+            tests = tuple(store.loadTests(deviceNumber=deviceNumber, keepGraphData=keepGraphData))
+        Count('tests', len(tests))
+        Count('steps', sum(len(test.steps) for test in tests))
+        return tests
+
+    # Load the test definitions and the tests of the sources (see loadDfns and
+    # loadTests) and return them (Glp2ReportInputs).
+    def ingest(self, reportConfig, sources, keepGraphData=True, skipTests=None, workers=1):
+        testDfns = self.loadDfns(reportConfig, sources)
+        tests = self.loadTests(reportConfig, sources, keepGraphData, skipTests, workers)
+        return Glp2ReportInputs(testDfns, tests)
+
+    # **** associate
+    # Match the tests with their definitions, and return the catalog
+    # (Glp2TestDfnCatalog). The catalog indexes the test definitions by GUID,
+    # and the tests by test dfn (program) GUID, so each test is matched with its
+    # definition with a lookup rather than by comparing it with every
+    # definition. See MakeAssociationMessages for a report of the matches.
+    @Timed('associate')
+    def associate(self, inputs):
+        return Glp2TestDfnCatalog(inputs.testDfns, inputs.tests)
+
+    # **** render
+    # Return the report manifest (Glp2ReportManifest) of the config, for
+    # incremental runs: pass its reportedTests() to loadTests as skipTests, and
+    # it to makeReportJobs and render. The tests whose test definition was
+    # added, changed or removed since they were reported (by the definitions
+    # loaded, testDfns, see loadDfns) are forgotten, so they are reported again.
+    def openManifest(self, reportConfig, testDfns=None):
+        manifest = Glp2ReportManifest(reportConfig.cacheDir,
+                                      ManifestSettings(self._options,
+                                                       reportConfig.decimalSeparator))
+        if testDfns is not None:
+            manifest.forgetChangedDfns(testDfns)
+        return manifest
+
+    # Return the report jobs (see MakeTestReports) for the tests of the
+    # catalog: the test, its definition, the report file name (no extension)
+    # and the plot title. The reports are named by the position of the test in
+    # the catalog, or with a manifest, by the position of the test in its data
+    # file (see Glp2ReportManifest reportName).
+    @Timed('makeReportJobs')
+    def makeReportJobs(self, catalog, manifest=None):
+        prefix = self._options.outputFilePrefix
+        reportJobs = []
+        for tIdx, test in enumerate(catalog.tests):
+            # Exclude the extension so the same file name will accomodate the
+            # pdf and csv.
+            if manifest is not None:
+                plotTitle = splitext(test.fileName)[0] + ' Test ' + str(test.testInstanceId + 1)
+                fname = manifest.reportName(test, prefix)
+            else:
+                plotTitle = splitext(test.fileName)[0] + ' Test ' + str(tIdx + 1)
+                fname = (prefix or '') + splitext(test.fileName)[0] + '_Test_' + str(tIdx + 1)
+            # A definition is loaded here if it is lazy, so it is only loaded
+            # once, not in each worker.
+            testDfn = catalog.getDfnForTest(test)
+            if testDfn is not None and not self._options.supressDfnPdf:
+                testDfn.steps
+            reportJobs.append((test, testDfn, fname, plotTitle))
+        return reportJobs
+
+    # Make the report files of the jobs, by workers processes (see
+    # MakeTestReports, None is one per cpu), and return the indexes of the jobs
+    # that failed. Nothing is made if all the pdf sections are suppressed. With
+    # a manifest, the tests reported are recorded in it and it is saved.
+    @Timed('render')
+    def render(self, jobs, workers=1, manifest=None):
+        options = self._options
+        if options.supressDfnPdf and options.supressDataPdf and options.supressGraphPdf:
+            return []
+        failedJobs = MakeTestReports(jobs, options, workers, log=self._log)
+        if failedJobs:
+            self._log('\nERROR: ' + str(len(failedJobs)) + ' of ' + str(len(jobs)) +
+                      ' test reports could not be made. See the errors above.')
+        # A test that failed is left out of the manifest, so it is tried again
+        # next time.
+        if manifest is not None:
+            for jobIdx, (test, testDfn, fname, plotTitle) in enumerate(jobs):
+                if jobIdx not in failedJobs:
+                    manifest.record(test, fname, not options.supressGraphCsv, testDfn)
+            manifest.save()
+        return failedJobs
+
+    # **** export
+    # Write the graph data of the tests to one file (see ExportGraphData), and
+    # return the number of (steps, samples) written. Do this before render,
+    # which lets the graph data go as each report is made.
+    @Timed('export')
+    def export(self, fileName, tests):
+        return ExportGraphData(fileName, tests)
+
+    # Do all the stages, for the files of the config (or the data file and/or
+    # test definition file given), and return what was done
+    # (Glp2ReportResult). The graph data is also exported to graphExport, if
+    # given. Reports are only made for new or changed tests if incremental.
+    def run(self, configFile='config.ini', dirPrefix='', dataFile='', testDfnFile='',
+            graphExport='', incremental=False, loadWorkers=1, workers=1):
+        reportConfig = self.loadConfig(configFile, dirPrefix)
+        sources = self.discover(reportConfig, dataFile, testDfnFile)
+        testDfns = self.loadDfns(reportConfig, sources)
+        manifest = self.openManifest(reportConfig, testDfns) if incremental else None
+        tests = self.loadTests(reportConfig, sources, self.needsGraphData(graphExport),
+                               manifest.reportedTests() if manifest is not None else None,
+                               loadWorkers)
+        inputs = Glp2ReportInputs(testDfns, tests)
+        catalog = self.associate(inputs)
+        if graphExport:
+            self.export(graphExport, inputs.tests)
+        jobs = self.makeReportJobs(catalog, manifest)
+        failedJobs = self.render(jobs, workers, manifest)
+        self.saveDfnCache()
+        return Glp2ReportResult(catalog, jobs, failedJobs)
+
+    # properties
+    @property
+    def options(self):
+        return self._options
@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Glp2ReportService.py
+#
+# A local report service: the report pdf, or the graph csv of a step, of one
+# test, on request (e.g. from a MES script), without starting a program (and
+# loading python, numpy, matplotlib, the definitions and the data files) for
+# each one. See glpServe.py.
+#
+# The tests of all the data files, with their graph data, and the test
+# definitions are kept in memory (see Glp2ReportPipeline for the loading). The
+# data and definition paths are watched (see Glp2FolderWatch), and the files
+# that are new or changed are loaded again, so a request gets the latest data.
+#
+# The pdfs are made by a pool of renderer processes (see MakeTestPdf), started
+# with fork when the service starts, each with matplotlib and its graph figure
+# already made, so several requests are made at the same time and none waits
+# for the start up of a process. The test and its definition are sent to the
+# renderer with the request. The graph csv files are quick to make, and are
+# made by the service itself.
+#
+# The requests are HTTP GET requests, on a TCP port of this computer or a Unix
+# socket (see MakeReportServer):
+#   /status                                 the service status (JSON)
+#   /tests                                  the tests (JSON), ?device=S/N for
+#                                           the tests of one device
+#   /tests/<test GUID>.pdf                  the report pdf of a test
+#   /tests/<test GUID>/steps/<step>.csv     the graph csv of a step of a test
+# A test GUID can be in more than one data file. If it is, the data file must be
+# given, e.g. /tests/<test GUID>.pdf?file=P1.csv, or 409 (conflict) is returned
+# with the files. A test or step that is not found is 404, and a test that
+# could not be made is 500. Errors are JSON: {"error": message}.
+#
+# imports
+import json
+import os
+import signal
+import socket
+import stat
+import threading
+import traceback
+from io import StringIO
+from os.path import join, splitext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_all_start_methods, get_context
+from urllib.parse import urlsplit, parse_qs, unquote
+import socketserver
+
+# specialized libraries unlikely to be used elsewhere. These should
+# travel with this file.
+from Glp2FolderWatch import Glp2FolderWatch
+from Glp2TestReport import MakeTestPdf, WriteStepCsv, GRAPH_MODE_FAST
+from Glp2ReportPipeline import Glp2ReportSources, Glp2ReportInputs
+
+# The barrier the renderer processes wait at when they start (see
+# _RendererReady), in the renderer processes.
+_rendererBarrier = None
+
+# Make matplotlib and the graph figure ready, unless the graphs are not drawn
+# with matplotlib.
+def _InitGraphFigure(options):
+    if not options.supressGraphPdf and options.graphMode != GRAPH_MODE_FAST:
+        from Glp2GraphFigure import GetTvsVandIFigure
+        GetTvsVandIFigure()
+
+# Make a renderer process ready.
+def _InitRenderer(options, barrier=None):
+    global _rendererBarrier
+    _rendererBarrier = barrier
+    # Ctrl-C stops the service, which stops the renderers.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _InitGraphFigure(options)
+
+# Wait for all the renderer processes to be ready, and return the process id.
+# A process is only started when a job is waiting and no process is free, so
+# each renderer is kept busy here until all of them are started.
+def _RendererReady():
+    try:
+        _rendererBarrier.wait(timeout=60)
+    except (AttributeError, threading.BrokenBarrierError):
+        pass
+    return os.getpid()
+
+# Return the report pdf of a test, as bytes (see MakeTestPdf).
+def _RenderPdf(test, testDfn, plotTitle, options):
+    return MakeTestPdf(test, testDfn, plotTitle, options, log=lambda message: None)
+
+class Glp2ReportService(object):
+    # pipeline is the Glp2ReportPipeline used to load the files (its options
+    # are the report options), and reportConfig its config (see loadConfig).
+    # workers is the number of renderer processes. With 0 (or if fork is not
+    # available), the pdfs are made by this process, one at a time.
+    def __init__(self, pipeline, reportConfig, workers=2, log=print):
+        self._pipeline = pipeline
+        self._reportConfig = reportConfig
+        self._options = pipeline.options
+        self._log = log
+        self._dfnWatch = Glp2FolderWatch(reportConfig.testDfnPath, '.tpr')
+        self._dataWatch = Glp2FolderWatch(reportConfig.testDataPath, '.csv')
+        self._fileTests = {}  # data file name: tuple of tests (Glp2TestData)
+        self._dfnFiles = ()   # the definition file names loaded
+        self._testDfns = ()
+        # The catalog and the tests by GUID, replaced together (as a tuple)
+        # when the files change, so a request always sees a matching pair.
+        self._tests = (pipeline.associate(Glp2ReportInputs((), ())), {})
+        self._refreshLock = threading.Lock()
+        self._renderLock = threading.Lock()
+        self._stopWatch = threading.Event()
+        self._watchThread = None
+        self._requests = 0
+
+        # The files there now are loaded right away.
+        self.refresh(waitStable=False)
+
+        # Start the renderers now, rather than on the first requests.
+        if workers > 0 and 'fork' in get_all_start_methods():
+            context = get_context('fork')
+            self._renderers = ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                                  initializer=_InitRenderer,
+                                                  initargs=(self._options,
+                                                            context.Barrier(workers)))
+            self._workers = len(set(future.result() for future in
+                                    [self._renderers.submit(_RendererReady)
+                                     for worker in range(workers)]))
+        else:
+            self._renderers = None
+            self._workers = 0
+            _InitGraphFigure(self._options)
+
+    def __str__(self):
+        catalog = self._tests[0]
+        outputMsg=  '{:20} {}\n'.format('Test Data Path: ', self._reportConfig.testDataPath)
+        outputMsg+= '{:20} {}\n'.format('Test Dfn Path: ', self._reportConfig.testDfnPath)
+        outputMsg+= '{:20} {}\n'.format('Tests: ', len(catalog.tests))
+        outputMsg+= '{:20} {}\n'.format('Definitions: ', len(catalog.dfns))
+        outputMsg+= '{:20} {}\n'.format('Renderers: ', self._workers)
+        return(outputMsg)
+
+    # Load the data and test definition files that are new or changed, and
+    # forget the ones that are gone. Return True if anything changed. If
+    # waitStable is False, the files are loaded without waiting for them to
+    # stop changing (see Glp2FolderWatch). A data file that can not be read
+    # (e.g. not all of it was there yet) is logged, and the tests it had are
+    # kept until it changes again.
+    def refresh(self, waitStable=True):
+        with self._refreshLock:
+            dfnNames = self._dfnWatch.poll(waitStable)
+            dataNames = self._dataWatch.poll(waitStable)
+            # the definition files that have stopped changing
+            dfnFiles = tuple(dfnName for dfnName in self._dfnWatch.files
+                             if dfnName in dfnNames or dfnName in self._dfnFiles)
+            dataFiles = self._dataWatch.files
+            dfnsChanged = bool(dfnNames) or len(dfnFiles) != len(self._dfnFiles)
+            goneNames = [dataName for dataName in self._fileTests if dataName not in dataFiles]
+            if not (dfnsChanged or dataNames or goneNames):
+                return False
+
+            if dfnsChanged:
+                # All the definitions are loaded again, from the test
+                # definition cache but for the ones that changed.
+                self._testDfns = self._pipeline.loadDfns(self._reportConfig,
+                    self._makeSources(dfnFiles=[(dfnName, join(self._reportConfig.testDfnPath,
+                                                               dfnName))
+                                                for dfnName in dfnFiles]))
+                self._dfnFiles = dfnFiles
+            for dataName in dataNames:
+                try:
+                    self._fileTests[dataName] = self._pipeline.loadTests(self._reportConfig,
+                        self._makeSources(dataFiles=[(dataName,
+                                                      join(self._reportConfig.testDataPath,
+                                                           dataName))]))
+                except (ValueError, OSError) as err:
+                    self._log(str(err))
+            for dataName in goneNames:
+                del self._fileTests[dataName]
+
+            tests = tuple(test for dataName in sorted(self._fileTests)
+                          for test in self._fileTests[dataName])
+            catalog = self._pipeline.associate(Glp2ReportInputs(self._testDfns, tests))
+            testsByGuid = {}
+            for test in tests:
+                testsByGuid.setdefault(test.getTestGuid, []).append(test)
+                # Load the lazy definitions used now, rather than by a request.
+                testDfn = catalog.getDfnForTest(test)
+                if testDfn is not None and not self._options.supressDfnPdf:
+                    testDfn.steps
+            self._pipeline.saveDfnCache()
+            self._tests = (catalog, testsByGuid)
+            return True
+
+    def _makeSources(self, dataFiles=(), dfnFiles=()):
+        return Glp2ReportSources((), (), tuple(dataFiles), tuple(dfnFiles), True)
+
+    # Watch the files in a thread, and load the ones that are new or changed
+    # (see refresh) every pollInterval seconds, until close.
+    def startWatch(self, pollInterval=2.0):
+        def watch():
+            while not self._stopWatch.wait(pollInterval):
+                try:
+                    if self.refresh():
+                        self._log('The data or test definition files changed. ' +
+                                  str(len(self._tests[0].tests)) + ' tests.')
+                except Exception:
+                    self._log(traceback.format_exc())
+        self._watchThread = threading.Thread(target=watch, name='Glp2ReportServiceWatch',
+                                             daemon=True)
+        self._watchThread.start()
+
+    # Stop watching the files and stop the renderers.
+    def close(self):
+        self._stopWatch.set()
+        if self._watchThread is not None:
+            self._watchThread.join()
+        if self._renderers is not None:
+            self._renderers.shutdown()
+
+    # Return a tuple of the tests (Glp2TestData) with the test GUID, in the data
+    # file, if given, or in any data file.
+    def findTests(self, testGuid, fileName=None):
+        return tuple(test for test in self._tests[1].get(testGuid, ())
+                     if fileName is None or test.fileName == fileName)
+
+    # Return a list of a dictionary about each test (e.g. for JSON): GUID, data
+    # file, test number in the file, program (definition) name, device, step
+    # numbers and if the definition was found. Only the tests of the device, if
+    # given.
+    def testList(self, deviceNumber=None):
+        catalog = self._tests[0]
+        return [{'guid': test.getTestGuid, 'file': test.fileName,
+                 'testNumber': test.testInstanceId + 1,
+                 'program': test.getTestProgramName, 'device': test.getDeviceNumber,
+                 'steps': [step.stepNumber for step in test.steps],
+                 'definition': catalog.getDfnForTest(test) is not None}
+                for test in catalog.tests
+                if deviceNumber is None or test.getDeviceNumber == deviceNumber]
+
+    # Return the report pdf of a test (Glp2TestData), as bytes. It is made by a
+    # renderer (see MakeTestPdf).
+    def reportPdf(self, test):
+        self._requests += 1
+        testDfn = self._tests[0].getDfnForTest(test)
+        plotTitle = splitext(test.fileName)[0] + ' Test ' + str(test.testInstanceId + 1)
+        if self._renderers is not None:
+            return self._renderers.submit(_RenderPdf, test, testDfn, plotTitle,
+                                          self._options).result()
+        # There is one graph figure in this process.
+        with self._renderLock:
+            return _RenderPdf(test, testDfn, plotTitle, self._options)
+
+    # Return the graph csv of the step (by step number) of a test, as bytes
+    # in the output file encoding (see WriteStepCsv). Raise a ValueError if the
+    # test does not have the step.
+    def stepCsv(self, test, stepNumber):
+        self._requests += 1
+        for step in test.steps:
+            if str(step.stepNumber) == str(stepNumber):
+                outFile = StringIO()
+                WriteStepCsv(outFile, test, step)
+                return outFile.getvalue().encode(self._options.outputFileEncoding)
+        raise ValueError('Test ' + test.getTestGuid + ' does not have a step ' +
+                         str(stepNumber) + '.')
+
+    # Return the service status (e.g. for JSON).
+    def status(self):
+        catalog = self._tests[0]
+        return {'tests': len(catalog.tests), 'dataFiles': len(self._fileTests),
+                'definitions': len(catalog.dfns), 'renderers': self._workers,
+                'requests': self._requests}
+
+    # properties
+    @property
+    def options(self):
+        return self._options
+
+    @property
+    def testCount(self):
+        return len(self._tests[0].tests)
+
+    @property
+    def workers(self):
+        return self._workers
+
+# The requests of the report service (see the top of the file).
+class _ReportRequestHandler(BaseHTTPRequestHandler):
+    # keep the connection open for more requests
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        # Send each response right away, rather than wait (for up to 40 ms) to
+        # send the headers and data together. Only for TCP.
+        self.disable_nagle_algorithm = self.request.family != getattr(socket, 'AF_UNIX', None)
+        BaseHTTPRequestHandler.setup(self)
+
+    def do_GET(self):
+        service = self.server.service
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        parts = [unquote(part) for part in url.path.split('/') if part]
+        try:
+            if parts == ['status']:
+                self._sendJson(200, service.status())
+            elif parts == ['tests']:
+                self._sendJson(200, service.testList(query.get('device', [None])[0]))
+            elif len(parts) == 2 and parts[0] == 'tests' and parts[1].endswith('.pdf'):
+                test = self._findTest(parts[1][:-len('.pdf')], query)
+                if test is not None:
+                    self._send(200, 'application/pdf', service.reportPdf(test))
+            elif (len(parts) == 4 and parts[0] == 'tests' and parts[2] == 'steps' and
+                  parts[3].endswith('.csv')):
+                test = self._findTest(parts[1], query)
+                if test is not None:
+                    try:
+                        csvData = service.stepCsv(test, parts[3][:-len('.csv')])
+                    except ValueError as ve:
+                        self._sendJson(404, {'error': str(ve)})
+                    else:
+                        self._send(200, 'text/csv; charset=' +
+                                   service.options.outputFileEncoding, csvData)
+            else:
+                self._sendJson(404, {'error': 'Unknown request: ' + url.path})
+        except Exception as err:
+            # the traceback is for the service log, not the client
+            self.server.log(traceback.format_exc())
+            self._sendJson(500, {'error': str(err) or err.__class__.__name__})
+
+    # Return the test of the GUID (and file=, if given) or send the error and
+    # return None.
+    def _findTest(self, testGuid, query):
+        tests = self.server.service.findTests(testGuid, query.get('file', [None])[0])
+        if not tests:
+            self._sendJson(404, {'error': 'Test ' + testGuid + ' was not found.'})
+            return None
+        if len(tests) > 1:
+            self._sendJson(409, {'error': 'Test ' + testGuid + ' is in more than one data \
+file. Give the data file, e.g. ?file=' + tests[0].fileName,
+                                 'files': [test.fileName for test in tests]})
+            return None
+        return tests[0]
+
+    def _sendJson(self, code, data):
+        self._send(code, 'application/json', json.dumps(data).encode('UTF-8'))
+
+    def _send(self, code, contentType, data):
+        self.send_response(code)
+        self.send_header('Content-Type', contentType)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    # the client address of a Unix socket is not a (host, port)
+    def address_string(self):
+        if isinstance(self.client_address, tuple):
+            return self.client_address[0]
+        return 'local'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            self.server.log(self.address_string() + ' ' + (format % args))
+
+if hasattr(socketserver, 'ThreadingUnixStreamServer'):
+    class _ReportUnixServer(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+
+# Return a server (see socketserver) for the requests of the report service
+# (Glp2ReportService), on the host and port, or on the Unix socket (a file
+# path) if given. Call its serve_forever to serve the requests, and
+# server_close when done. The requests are logged if verbose.
+def MakeReportServer(service, host='127.0.0.1', port=8765, unixSocket=None, verbose=False,
+                     log=print):
+    if unixSocket:
+        if not hasattr(socketserver, 'ThreadingUnixStreamServer'):
+            raise ValueError('Unix sockets are not available on this computer.')
+        # A socket file left by a service that was stopped is in the way.
+        if os.path.exists(unixSocket) and stat.S_ISSOCK(os.stat(unixSocket).st_mode):
+            os.remove(unixSocket)
+        server = _ReportUnixServer(unixSocket, _ReportRequestHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), _ReportRequestHandler)
+    server.service = service
+    server.verbose = verbose
+    server.log = log
+    return server
@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Glp2ResultsStore.py
+#
+# A local store (SQLite database) of the test results from the test data files
+# (*.csv), so the results can be looked up (e.g. all the tests of a device)
+# without reading and parsing all the data files again. The data files are put
+# in the store (ingested) with ingestFile, and the tests are made from the
+# store with loadTests, the same as if they were loaded from the files.
+#
+# The database has these tables:
+#   files   a row per data file: the name, the modification time and size when
+#           it was ingested, and what is needed to read its rows again (the
+#           header row, decimal separator and column map, see Glp2DataSchema)
+#   tests   a row per test (Glp2TestData), keyed by test GUID
+#   steps   a row per step (Glp2TestDataStep), keyed by test GUID and row in
+#           the test (step GUIDs are not always unique across data files), with
+#           the step values, the data row (without the graph data) and the
+#           graph data, zlib compressed
+# The tests and steps are indexed by test GUID, device number, program GUID
+# and timestamp. The tester writes the timestamps as dd.mm.yyyy hh:mm:ss, which
+# do not sort, so they are also kept as yyyy-mm-dd hh:mm:ss (the timestamp
+# columns) for sorting and searching.
+#
+# Ingesting is idempotent. A file that has not changed since it was ingested
+# is skipped, and a changed file replaces everything that came from it. A test
+# is only in the store once: if a test GUID is ingested again from another
+# file, it is replaced.
+#
+# imports
+import json
+import os
+import sqlite3
+import zlib
+from datetime import datetime
+from functools import partial
+from Glp2DataSchema import Glp2DataSchema
+from Glp2TestData import Glp2TestData
+
+# Return the results store file to use: resultsDb if given, or results_db in
+# the [Paths] section of the config (a ConfigParser), or results.sqlite in the
+# cache_dir. Like the cache directory, a relative path is relative to the
+# current directory.
+def ResultsDbFile(config, resultsDb=''):
+    if resultsDb:
+        return resultsDb
+    resultsDb = config.get('Paths', 'results_db', fallback='')
+    if resultsDb:
+        return resultsDb
+    return os.path.join(config.get('Paths', 'cache_dir', fallback='.glp2cache'), 'results.sqlite')
+
+class Glp2ResultsStore(object):
+    # class constants
+    STORE_VERSION = 1   # change when the tables change
+    TIMESTAMP_FORMAT = '%d.%m.%Y %H:%M:%S' # as written by the tester
+    GRAPH_COMPRESS_LEVEL = 6
+    _SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS files (
+            fileId INTEGER PRIMARY KEY,
+            path TEXT NOT NULL UNIQUE,
+            fileName TEXT NOT NULL,
+            mtimeNs INTEGER NOT NULL,
+            size INTEGER NOT NULL,
+            fileEncoding TEXT NOT NULL,
+            decimalSeparator TEXT NOT NULL,
+            columnMap TEXT,
+            header TEXT);
+        CREATE TABLE IF NOT EXISTS tests (
+            testGuid TEXT PRIMARY KEY,
+            fileId INTEGER NOT NULL REFERENCES files(fileId),
+            testInstanceId INTEGER,
+            programName TEXT,
+            programGuid TEXT,
+            operator TEXT,
+            deviceNumber TEXT,
+            timestamp TEXT);
+        CREATE TABLE IF NOT EXISTS steps (
+            stepGuid TEXT,
+            testGuid TEXT NOT NULL REFERENCES tests(testGuid),
+            rowNumber INTEGER NOT NULL,
+            stepNumber INTEGER,
+            testMethodKey INTEGER,
+            comments TEXT,
+            operator TEXT,
+            deviceNumber TEXT,
+            nominalVoltage REAL,
+            nominalVoltageUnit TEXT,
+            measuredVoltage REAL,
+            measuredVoltageUnit TEXT,
+            currentLimit REAL,
+            currentLimitUnit TEXT,
+            measuredCurrent REAL,
+            measuredCurrentUnit TEXT,
+            testTimestamp TEXT,
+            timestamp TEXT,
+            dataRow TEXT NOT NULL,
+            graphData BLOB,
+            PRIMARY KEY (testGuid, rowNumber));
+        CREATE INDEX IF NOT EXISTS testsFileIdx ON tests(fileId);
+        CREATE INDEX IF NOT EXISTS testsDeviceIdx ON tests(deviceNumber);
+        CREATE INDEX IF NOT EXISTS testsProgramIdx ON tests(programGuid);
+        CREATE INDEX IF NOT EXISTS testsTimestampIdx ON tests(timestamp);
+        CREATE INDEX IF NOT EXISTS stepsGuidIdx ON steps(stepGuid);
+        CREATE INDEX IF NOT EXISTS stepsDeviceIdx ON steps(deviceNumber);
+        CREATE INDEX IF NOT EXISTS stepsTimestampIdx ON steps(timestamp);
+        '''
+
+    def __init__(self, dbFile):
+        self._dbFile = dbFile
+        dbDir = os.path.dirname(dbFile)
+        if dbDir:
+            os.makedirs(dbDir, exist_ok=True)
+        self._db = sqlite3.connect(dbFile)
+        version = self._db.execute('PRAGMA user_version').fetchone()[0]
+        if version not in (0, self.STORE_VERSION):
+            self._db.close()
+            raise ValueError('The results store ' + dbFile + ' was made by a different ' +
+                             'version (' + str(version) + ') of this program.')
+        with self._db:
+            self._db.executescript(self._SCHEMA)
+            self._db.execute('PRAGMA user_version = ' + str(self.STORE_VERSION))
+
+    def __str__(self):
+        fileCount, testCount, stepCount = self.counts
+        outputMsg=  '{:20} {}\n'.format('Results Store: ', self._dbFile)
+        outputMsg+= '{:20} {}\n'.format('Data Files: ', fileCount)
+        outputMsg+= '{:20} {}\n'.format('Tests: ', testCount)
+        outputMsg+= '{:20} {}\n'.format('Steps: ', stepCount)
+        return(outputMsg)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+    def close(self):
+        self._db.close()
+
+    # Return the timestamp from the tester as yyyy-mm-dd hh:mm:ss, or None if
+    # it can't be read.
+    @classmethod
+    def _sortableTimestamp(cls, testTimestamp):
+        try:
+            return datetime.strptime(testTimestamp, cls.TIMESTAMP_FORMAT).isoformat(' ')
+        except (TypeError, ValueError):
+            return None
+
+    # Return the key (absolute path) and (mtime, size) stamp of a data file.
+    @staticmethod
+    def _stamp(filePath):
+        stat = os.stat(filePath)
+        return os.path.abspath(filePath), stat.st_mtime_ns, stat.st_size
+
+    # Return the (mtime, size) stamp of a data file, to take before the file is
+    # read and pass to ingestTests.
+    @classmethod
+    def fileStamp(cls, filePath):
+        return cls._stamp(filePath)[1:]
+
+    # Return the file settings that must match for the file to be skipped.
+    @staticmethod
+    def _fileSettings(fileEncoding, decimalSeparator, columnMap):
+        columnMap = json.dumps(dict(columnMap), sort_keys=True) if columnMap is not None else None
+        return fileEncoding, decimalSeparator, columnMap
+
+    # Return True if the data file is in the store and has not changed since,
+    # with the same settings.
+    def isCurrent(self, filePath, fileEncoding, decimalSeparator, columnMap=None):
+        key, mtime, size = self._stamp(filePath)
+        row = self._db.execute('SELECT mtimeNs, size, fileEncoding, decimalSeparator, '
+                               'columnMap FROM files WHERE path = ?', (key,)).fetchone()
+        return (row is not None and
+                row == (mtime, size) + self._fileSettings(fileEncoding, decimalSeparator,
+                                                          columnMap))
+
+    # Return a value of a step (a Glp2TestDataStep property), or None if the
+    # value in the data file can't be converted. The data row is stored as it
+    # is, so the step made from the store raises the same error when the value
+    # is used.
+    @staticmethod
+    def _stepValue(step, name):
+        try:
+            return getattr(step, name)
+        except ValueError:
+            return None
+
+    # Put the tests (a list of Glp2TestData from one data file, see
+    # LoadTestDataFile) in the store, replacing what was in it from the file.
+    # The tests must have their graph data (keepGraphData) for it to be stored.
+    # fileStamp is the stamp of the file (see fileStamp) taken before it was
+    # read, so if the tester adds to the file while it is read, the file is
+    # not current (see isCurrent) and is read again next time. If it is None,
+    # the stamp is taken now.
+    # Return the number of tests and steps stored.
+    def ingestTests(self, filePath, tests, fileEncoding, decimalSeparator, columnMap=None,
+                    fileStamp=None):
+        key, mtime, size = self._stamp(filePath)
+        if fileStamp is not None:
+            mtime, size = fileStamp
+        fileEncoding, decimalSeparator, columnMapStr = self._fileSettings(
+            fileEncoding, decimalSeparator, columnMap)
+        header = tests[0].header if tests else None
+        stepCount = 0
+        with self._db:
+            self._deleteFile(key)
+            fileId = self._db.execute(
+                'INSERT INTO files (path, fileName, mtimeNs, size, fileEncoding, '
+                'decimalSeparator, columnMap, header) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, os.path.basename(filePath), mtime, size, fileEncoding, decimalSeparator,
+                 columnMapStr, json.dumps(header) if header is not None else None)).lastrowid
+            for test in tests:
+                testGuid = test.getTestGuid
+                # a test from another file (or ingested before) is replaced
+                self._db.execute('DELETE FROM steps WHERE testGuid = ?', (testGuid,))
+                schema = test.schema
+                graphDataIdx = schema.graphDataIdx
+                stepRows = []
+                for rowNumber, step in enumerate(test.steps):
+                    row = step.data
+                    graphData = row[graphDataIdx] if len(row) > graphDataIdx else ''
+                    timestamp = self._sortableTimestamp(step.testTimestamp)
+                    stepValue = partial(self._stepValue, step)
+                    stepRows.append((
+                        step.testStepGuid, testGuid, rowNumber, stepValue('stepNumber'),
+                        stepValue('testMethodKey'), step.comments, step.operator,
+                        step.deviceNumber, stepValue('nominalVoltage'), step.nominalVoltageUnit,
+                        stepValue('measuredVoltage'), step.measuredVoltageUnit,
+                        stepValue('currentLimit'), step.currentLimitUnit,
+                        stepValue('measuredCurrent'), step.measuredCurrentUnit, step.testTimestamp,
+                        timestamp, json.dumps(schema.withoutGraphData(row)),
+                        zlib.compress(graphData.encode('UTF-8'), self.GRAPH_COMPRESS_LEVEL)
+                        if graphData else None))
+                timestamps = [stepRow[17] for stepRow in stepRows if stepRow[17] is not None]
+                self._db.execute(
+                    'INSERT OR REPLACE INTO tests (testGuid, fileId, testInstanceId, '
+                    'programName, programGuid, operator, deviceNumber, timestamp) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    (testGuid, fileId, test.testInstanceId, test.getTestProgramName,
+                     test.getTestProgramGuid, test.getOperator, test.getDeviceNumber,
+                     min(timestamps) if timestamps else None))
+                self._db.executemany(
+                    'INSERT OR REPLACE INTO steps VALUES '
+                    '(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', stepRows)
+                stepCount += len(stepRows)
+        return len(tests), stepCount
+
+    # Remove a data file (by path) and its tests and steps from the store.
+    def _deleteFile(self, key):
+        row = self._db.execute('SELECT fileId FROM files WHERE path = ?', (key,)).fetchone()
+        if row is None:
+            return
+        self._db.execute('DELETE FROM steps WHERE testGuid IN '
+                         '(SELECT testGuid FROM tests WHERE fileId = ?)', row)
+        self._db.execute('DELETE FROM tests WHERE fileId = ?', row)
+        self._db.execute('DELETE FROM files WHERE fileId = ?', row)
+
+    # Return the SQL where clause and parameters for the test filters (see
+    # findTests). The clause is empty if there are no filters.
+    @staticmethod
+    def _testFilter(deviceNumber, programGuid, since, until, testGuids):
+        conditions = []
+        params = []
+        for condition, value in (('tests.deviceNumber = ?', deviceNumber),
+                                 ('tests.programGuid = ?', programGuid),
+                                 ('tests.timestamp >= ?', since),
+                                 ('tests.timestamp <= ?', until)):
+            if value is not None:
+                conditions.append(condition)
+                params.append(value)
+        if testGuids is not None:
+            testGuids = list(testGuids)
+            conditions.append('tests.testGuid IN (' + ', '.join('?' * len(testGuids)) + ')')
+            params.extend(testGuids)
+        where = ' WHERE ' + ' AND '.join(conditions) if conditions else ''
+        return where, params
+
+    # Return the tests in the store, as a list of tuples:
+    #   (test GUID, data file name, test instance id, program name,
+    #    program GUID, device number, timestamp, number of steps)
+    # in data file name and test order (files with the same name, e.g. from
+    # different directories, one after the other). The tests can be limited to
+    # a device number, a program (test definition) GUID, timestamps since
+    # and/or until (yyyy-mm-dd hh:mm:ss, or the start of one, e.g. 2020-07), or
+    # a list of test GUIDs.
+    def findTests(self, deviceNumber=None, programGuid=None, since=None, until=None,
+                  testGuids=None):
+        where, params = self._testFilter(deviceNumber, programGuid, since, until, testGuids)
+        return self._db.execute(
+            'SELECT tests.testGuid, files.fileName, tests.testInstanceId, tests.programName, '
+            'tests.programGuid, tests.deviceNumber, tests.timestamp, '
+            '(SELECT COUNT(*) FROM steps WHERE steps.testGuid = tests.testGuid) '
+            'FROM tests JOIN files USING (fileId)' + where +
+            ' ORDER BY files.fileName, files.fileId, tests.testInstanceId, tests.testGuid',
+            params).fetchall()
+
+    # Return the tests in the store (see findTests for the filters) as a list
+    # of Glp2TestData objects, the same as loading them from the data files.
+    # If keepGraphData is False, the graph data is not read.
+    def loadTests(self, deviceNumber=None, programGuid=None, since=None, until=None,
+                  testGuids=None, keepGraphData=True):
+        where, params = self._testFilter(deviceNumber, programGuid, since, until, testGuids)
+        graphColumn = 'steps.graphData' if keepGraphData else 'NULL'
+        rows = self._db.execute(
+            'SELECT tests.testGuid, tests.testInstanceId, files.fileId, files.fileName, '
+            'files.decimalSeparator, files.columnMap, files.header, steps.dataRow, ' +
+            graphColumn + ' FROM tests JOIN files USING (fileId) '
+            'JOIN steps ON steps.testGuid = tests.testGuid' + where +
+            ' ORDER BY files.fileName, files.fileId, tests.testInstanceId, tests.testGuid, '
+            'steps.rowNumber', params)
+        tests = []
+        schemas = {} # fileId: schema, shared by the tests of a file
+        testRows = []
+        testKey = None
+        for (testGuid, testInstanceId, fileId, fileName, decimalSeparator, columnMap,
+             header, dataRow, graphData) in rows:
+            if testGuid != testKey:
+                if testRows:
+                    tests.append(Glp2TestData(fileName=testFile, data=testRows,
+                                              testInstanceId=testInstance, schema=schema))
+                testKey, testFile, testInstance, testRows = testGuid, fileName, testInstanceId, []
+                schema = schemas.get(fileId)
+                if schema is None:
+                    schema = Glp2DataSchema(json.loads(header) if header is not None else None,
+                                            decimalSeparator,
+                                            json.loads(columnMap) if columnMap is not None else None)
+                    schemas[fileId] = schema
+            row = tuple(json.loads(dataRow))
+            if graphData is not None:
+                graphDataIdx = schema.graphDataIdx
+                row = (row[:graphDataIdx] + (zlib.decompress(graphData).decode('UTF-8'),) +
+                       row[graphDataIdx + 1:])
+            testRows.append(row)
+        if testRows:
+            tests.append(Glp2TestData(fileName=testFile, data=testRows,
+                                      testInstanceId=testInstance, schema=schema))
+        return tests
+
+    # properties
+    @property
+    def dbFile(self):
+        return self._dbFile
+
+    # return the number of (files, tests, steps) in the store
+    @property
+    def counts(self):
+        return tuple(self._db.execute('SELECT COUNT(*) FROM ' + table).fetchone()[0]
+                     for table in ('files', 'tests', 'steps'))
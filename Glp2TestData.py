@@ -18,134 +18,77 @@
 # assumes the data passed to the constructor does not have header info, and the
 # header info is instead passed as the data paramater.
 #
-# This object uses a tuple to store the header, and tuple to store the test data.
+# This object uses a tuple to store the test data. The header is held by the
+# column schema (Glp2DataSchema), which is shared with the steps.
 #
 # The testInstance value that is passed to the constructor is intended to store
 # which this object is associated with given a source data file that contains a
 # number of tests.  It is up to the object creating this test data object to pass
 # something meaningful.
 #
-# The indexes passed to the constructor are defaulted to the correct zero based column
-# numbers. Paramters are used so the values can be changed if needed.
+# The schema passed to the constructor tells which column holds which value. It
+# is normally resolved once per file (see MakeTestList) and shared by all the
+# tests and steps from the file. If no schema is passed, one is made from the
+# header and decimal separator using the default column numbers.
 #
 # Since many of the values in the data are systemic, they are repeated for all the
 # rows. For example, if a particular test is run on a particular machine, and the
 # test had 5 steps, each step will have the same value for device number, program
-# name, program guid, and the test guid.  For this reason, the properties that
-# retreive values based on column use a step parameter that is defaulted to 1 to
-# get the value from the first row. Note that steps are 1 based, and rows/list
+# name, program guid, and the test guid.  For this reason, these values are
+# taken from the first row (step 1). Note that steps are 1 based, and rows/list
 # elements are 0 based.
 
 # imports
+from Glp2DataSchema import Glp2DataSchema
 from Glp2TestDataStep import Glp2TestDataStep
 
 class Glp2TestData(object):
     def __init__(self, fileName=None, data=None, header=None, testInstanceId=None,
-                 decimalSeparator=',',
-                 testGuidIdx=0, testProgramNameIdx=25, testProgramGuidIdx=49,
-                 testStepGuidIdx=1, commentsIdx=20, operatorIdx=27,
-                 deviceNumberIdx=31, stepNumberIdx=2,
-                 nomVoltIdx=6, nomVoltUnitIdx=7, actVoltIdx=8, actVoltUnitIdx=9,
-                 currentLimIdx=10, currentLimUnitIdx=11, actCurrIdx=12,
-                 actCurrUnitIdx=13, timestampIdx=30, graphDataIdx=76):
+                 decimalSeparator=',', schema=None):
         # The data expected is a tuple, list, or something convertable to a
-        # tuple that has an entire row of data from a test data file.The
-        # indexes are the normal column counts, starting at zero.
-        #
-        # These parameters are just passed through to the Glp2TestDataStep ctor:
-        #   testStepGuidIdx
-        #   commentsIdx
-        #   operatorIdx (used by both Glp2TestData and Glp2TestDataStep)
-        #   deviceNumberIdx (used by both Glp2TestData and Glp2TestDataStep)
-        #   stepNumberIdx
-        #   nomVoltIdx
-        #   nomVoltUnitIdx
-        #   actVoltIdx
-        #   actVoltUnitIdx
-        #   currentLimIdx
-        #   currentLimUnitIdx
-        #   actCurrIdx
-        #   actCurrUnitIdx
-        #   timestampIdx
-        #   graphDataIdx
+        # tuple that has the rows of data from a test data file, one row for
+        # each step.
 
         # Capture the file name
         self._fileName = str(fileName)
 
-        # Set the header. Do this first so it is available to make
-        # steps later.
-        if header is None: # no header specified
-            self._dataHeader = None
-        else: # header specified
-            try:
-                # header is specified, but it must be convertable to a tuple.
-                self._dataHeader = tuple(header)
-            except ValueError as ve:
-                print('Value Error: The header parameter must be a tuple, \
-or something convertable to a tuple. This generally means it must be something \
-iteratable. Setting the header to None.')
-                print(ve)
-                self._dataHeader = None
+        # Set the schema (and with it the header). Do this first so it is
+        # available to make steps later.
+        if schema is None:
+            schema = Glp2DataSchema(header, decimalSeparator)
+        self._schema = schema
 
         # capture the passed in testInstanceId
         self._testInstanceId = testInstanceId
 
-        # set up the data
-        if data is not None: # data provided
-            # make sure the data is convertable to a tuple. If not, report an
-            # error -- a tuple is immutable, so an empty one isn't very useful.
-            try:
-                self._rawData=tuple(data)
-                # if we get here, we should have a tuple with something in it
-                # Assume it is a multi element tuple, with each element containing
-                # details of a test step.
-
-            except ValueError as ve:
-                print('Value Error: data parameter must be a tuple or something \
-convertalbe to a tuple. This generally means it must be something iteratable. \
-No Data Captured.')
-                print(ve)
-                self._rawData = None
-                self._steps = None
-                quit()
+        # content digest of the rows as read (see IterTestList skipTests), or
+        # None if it was not worked out
+        self._contentDigest = None
 
+        # set up the data
+        self._rawData = None
+        self._steps = None
+        self.data = data
+
+    # Decode the test values from the first row, and make the step objects.
+    # Called whenever the data is set.
+    def _decode(self):
+        if self._rawData:
+            (self._testGuid, self._testProgramName, self._testProgramGuid,
+             self._operator, self._deviceNumber) = self._schema.getTestValues(self._rawData[0])
             # Set up test step objects to contain the step details.
-            if len(self._rawData) > 0:
-                # If there is someting in the data (at least 1 step)...
-                # Assume it is an list of step details (list of lists)
-                steps=[]
-                for idx, row in enumerate(self._rawData):
-                    if len(row) >= 1: # skip blank rows
-                        # Add a step object to the list of step objects,
-                        # passing the parameters through that the step ctor needs.
-                        steps.append(Glp2TestDataStep(row, self._dataHeader,
-                                     decimalSeparator,
-                                     testStepGuidIdx=testStepGuidIdx,
-                                     commentsIdx=commentsIdx,
-                                     operatorIdx=operatorIdx,
-                                     deviceNumberIdx=deviceNumberIdx,
-                                     stepNumberIdx=stepNumberIdx,
-                                     nomVoltIdx=nomVoltIdx,
-                                     nomVoltUnitIdx=nomVoltUnitIdx,
-                                     actVoltIdx=actVoltIdx,
-                                     actVoltUnitIdx=actVoltUnitIdx,
-                                     currentLimIdx=currentLimIdx,
-                                     currentLimUnitIdx=currentLimUnitIdx,
-                                     actCurrIdx=actCurrIdx,
-                                     actCurrUnitIdx=actCurrUnitIdx,
-                                     timestampIdx=timestampIdx,
-                                     graphDataIdx=graphDataIdx))
-                # All the steps have been retreived.
-                # Put them into a memeber tuple
-                self._steps = tuple(steps)
-        else: # data not provided
-            self._steps = None
-
-        self._testGuidIdx = testGuidIdx
-        self._testProgramNameIdx = testProgramNameIdx
-        self._testProgramGuidIdx = testProgramGuidIdx
-        self._operatorIdx = operatorIdx
-        self._deviceNumberIdx = deviceNumberIdx
+            # Assume it is an list of step details (list of lists)
+            # skip blank rows. All the steps share the schema.
+            self._steps = tuple(Glp2TestDataStep(row, schema=self._schema)
+                                for row in self._rawData if len(row) >= 1)
+        else:
+            # no data, or no rows in the data
+            self._testGuid = None
+            self._testProgramName = None
+            self._testProgramGuid = None
+            self._operator = None
+            self._deviceNumber = None
+            self._steps = None if self._rawData is None else ()
 
     def __repr__(self):
         # TODO: Make output a dictionary or someting in line with the goal of __repr__
@@ -180,98 +123,59 @@ No Data Captured.')
 
 
     # properties and getters.
-    # Note that the default arguments make those functions getters instead of properties
 
     @property
     def fileName(self):
         return self._fileName
 
     @property
-    def getTestGuid(self, step=1):
-        # steps start at 1
-        if self._rawData is not None and step >= 1 and step <= len(self._rawData):
-            # there is raw data and the step is within range (within the width of a row)
-            if self._testGuidIdx + 1 <= len(self._rawData[step - 1]):
-                # the index is within range
-                return self._rawData[step - 1][self._testGuidIdx]
-            else: # index out of range
-                return None
-        else: # no data or step out of range
-            return None
+    def getTestGuid(self):
+        return self._testGuid
 
     @property
-    def getTestProgramName(self, step=1):
-        # steps start at 1
-        if self._rawData is not None and step >= 1 and step <= len(self._rawData):
-            # there is raw data and the step is within range (within the width of a row)
-            if self._testProgramNameIdx + 1 <= len(self._rawData[step - 1]):
-                # the index is within range
-                return self._rawData[step - 1][self._testProgramNameIdx]
-            else: # index out of range
-                return None
-        else: # no data or step out of range
-            return None
+    def getTestProgramName(self):
+        return self._testProgramName
 
     @property
-    def getTestProgramGuid(self, step=1):
-        # steps start at 1
-        if self._rawData is not None and step >= 1 and step <= len(self._rawData):
-            # there is raw data and the step is within range (within the width of a row)
-            if self._testProgramGuidIdx + 1 <= len(self._rawData[step - 1]):
-                # the index is within range
-                return self._rawData[step - 1][self._testProgramGuidIdx]
-            else: # index out of range
-                return None
-        else: # no data or step out of range
-            return None
+    def getTestProgramGuid(self):
+        return self._testProgramGuid
 
     @property
-    def getOperator(self, step=1):
-        # steps start at 1
-        if self._rawData is not None and step >= 1 and step <= len(self._rawData):
-            # there is raw data and the step is within range (within the width of a row)
-            if self._operatorIdx + 1 <= len(self._rawData[step - 1]):
-                # the index is within range
-                return self._rawData[step - 1][self._operatorIdx]
-            else: # index out of range
-                return None
-        else: # no data or step out of range
-            return None
+    def getOperator(self):
+        return self._operator
 
     @property
-    def getDeviceNumber(self, step=1):
-        # steps start at 1
-        if self._rawData is not None and step >= 1 and step <= len(self._rawData):
-            # there is raw data and the step is within range (within the width of a row)
-            if self._deviceNumberIdx + 1 <= len(self._rawData[step - 1]):
-                # the index is within range
-                return self._rawData[step - 1][self._deviceNumberIdx]
-            else: # index out of range
-                return None
-        else: # no data or step out of range
-            return None
+    def getDeviceNumber(self):
+        return self._deviceNumber
 
     @property
     def testInstanceId(self):
         return (self._testInstanceId)
 
+    @property
+    def contentDigest(self):
+        return self._contentDigest
+
+    @contentDigest.setter
+    def contentDigest(self, digest):
+        self._contentDigest = digest
+
     @property
     def header(self):
-        return (self._dataHeader)
+        return self._schema.header
 
     @header.setter
     def header(self, headerData):
-        if headerData is not None:
-            try:
-                # header is specified, but it must be convertable to a tuple.
-                self._dataHeader = tuple(headerData)
-            except ValueError as ve:
-                print('Value Error: The header parameter must be a tuple, or something \
-convertable to a tuple. This generally means it must be something iteratable. \
-Header not changed.')
-                print(ve)
-        else: # nothing specified for header
-            self._dataHeader = None
+        # A new header means a new schema for this test, with the same column
+        # map and decimal separator (the columns given by name are looked up
+        # in the new header).
+        self._schema = Glp2DataSchema(headerData, self._schema.decimalSeparator,
+                                      self._schema.columnMap)
+        self._decode()
+
+    @property
+    def schema(self):
+        return self._schema
 
     @property
     def data(self):
@@ -294,6 +198,20 @@ Data not changed.')
                 print(ve)
         else: # no data provided
             self._rawData = None
+        # decode the values and make the steps from the (new) data
+        self._decode()
+
+    # Release the graph data of all the steps. The graph data is by far the
+    # largest part of the test data, so call this when the graphs are no longer
+    # needed (e.g. after they are in the report). The rows are shared by the
+    # test and its steps, so they are replaced in both.
+    def releaseGraphData(self):
+        if self._rawData is None:
+            return
+        self._rawData = tuple(self._schema.withoutGraphData(row) for row in self._rawData)
+        # the steps were made from the non blank rows, in order
+        for step, row in zip(self._steps, [row for row in self._rawData if len(row) >= 1]):
+            step.releaseGraphData(row)
 
     @property
     def stepCount(self):
@@ -308,13 +226,9 @@ Data not changed.')
     # I.e. step = 1 is the 1st step is also self._steps[0]
     def getStep(self, stepNo):
         step = int(stepNo)
-        if step < 1 or step > self._numberOfSteps:
+        if self._steps is None or step < 1 or step > len(self._steps):
             # invalid step number
             return None
         else:
             #valid step number
             return self._steps[step - 1]
-
-
-
-
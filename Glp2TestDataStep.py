@@ -22,80 +22,129 @@
 # NOTE: The data file contains the header info in the first row.  This object
 # assumes the data passed to the constructor does not have header info, and the
 # header info is instead passed as the data paramater. When a batch of steps are
-# associated with a test and stored, the heaer info is repeated in each one.  This
-# is a bit redundant and wasteful, but I chose this so an individual step can
-# stand alone and contain enough information so that the step details can be
-# interpreted.
+# associated with a test and stored, the header info is available from each one.
+# It is held by the column schema (Glp2DataSchema), which is normally shared by
+# all the steps of a file, so it is not repeated for each step. This way an
+# individual step can stand alone and contain enough information so that the
+# step details can be interpreted.
 #
 # Tuples are used to store the header and step details, since tuples are
 # immutable.
 #
-# The index passed to the constructor are defaulted to the correct zero based column
-# numbers. Paramters are used so the values can be changed if needed.
+# The schema passed to the constructor tells which column holds which value.
+# If no schema is passed, one is made from the header and decimal separator
+# using the default column numbers.
+#
+# The values are decoded (converted to numbers where appropriate) once, when the
+# data is set, and kept in slots. The properties just return the decoded values,
+# so repeated access is cheap. __slots__ is used since there can be a very large
+# number of steps, and it keeps each step object small. Values that can not be
+# found (index out of range) are None. A value that can't be converted raises a
+# ValueError when it is used.
+#
+# The graph data (the sampled waveform) is kept as the raw string from the
+# file. It is only parsed when the graph property is used, and the parsed
+# object is not kept, so it is released when the caller is done with it. The
+# raw string can be released too, with releaseGraphData, once the graph is no
+# longer needed. A step made from a row without the graph data (see
+# IterTestList keepGraphData) has an empty string for the graph data.
 #
 # imports
+from Glp2DataSchema import Glp2DataSchema
+from Glp2GraphData import Glp2GraphData
 #
 # TODO: Add operator field
 #
+
+# A value from the data file that can't be converted (see _toFloat and
+# _toInt). The step is still made, and the property of the value raises the
+# ValueError from the conversion when it is used (see _checked), the same as
+# when the values were converted each time they were used.
+class _BadValue(object):
+    __slots__ = ('error',)
+
+    def __init__(self, error):
+        self.error = error
+
+# Return the converted value, or raise the ValueError of a value that could
+# not be converted (see _BadValue).
+def _checked(value):
+    if value.__class__ is _BadValue:
+        raise ValueError(value.error)
+    return value
+
+# Convert a string value from the data file to a float. If using a comma as a
+# decimal separator, also assume a period may be used as a thousands separator.
+# First replace all periods with an empty string (get rid of them), and then
+# replace all commas with periods. Return None if there is no value, or a
+# _BadValue if it can't be converted.
+def _toFloat(value, decimalSeparator):
+    if value is None:
+        return None
+    if decimalSeparator == ',':
+        value = value.replace('.','').replace(',', '.')
+    try:
+        return float(value)
+    except ValueError as ve:
+        return _BadValue(str(ve))
+
+# Convert a string value from the data file to an int. Return None if there is
+# no value, or a _BadValue if it can't be converted.
+def _toInt(value):
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError as ve:
+        return _BadValue(str(ve))
+
 class Glp2TestDataStep(object):
-    def __init__(self, data=None, header=None, decimalSeparator = ',',
-                 testStepGuidIdx=1, commentsIdx=20, operatorIdx=27,
-                 deviceNumberIdx=31, stepNumberIdx=2, testMethodKeyIdx=4,
-                 nomVoltIdx=6, nomVoltUnitIdx=7, actVoltIdx=8,
-                 actVoltUnitIdx=9, currentLimIdx=10, currentLimUnitIdx=11,
-                 actCurrIdx=12, actCurrUnitIdx=13, timestampIdx=30, graphDataIdx=76):
+    __slots__ = ('_schema', '_rawData',
+                 '_testStepGuid', '_comments', '_operator', '_deviceNumber',
+                 '_stepNumber', '_testMethodKey', '_nominalVoltage',
+                 '_nominalVoltageUnit', '_measuredVoltage', '_measuredVoltageUnit',
+                 '_currentLimit', '_currentLimitUnit', '_measuredCurrent',
+                 '_measuredCurrentUnit', '_testTimestamp', '_graphData')
+
+    def __init__(self, data=None, header=None, decimalSeparator = ',', schema=None):
         # The data expected is a tuple, list, or something convertable to a
-        # tuple shat has an entire row of data from a test data file.  The
-        # indexes are the normal column counts, starting at zero.
+        # tuple shat has an entire row of data from a test data file.
         #
-        # Set the header. Do this first so it is available later if needed.
-        if header is not None: # header specified
-            try:
-                # header is specified, but it must be convertable to a tuple.
-                self._dataHeader = tuple(header)
-            except ValueError as ve:
-                print('Value Error: The header parameter must be a tuple, or something \
-convertable to a tuple. This generally means it must be something iteratable. \
-Header not changed.')
-                print(ve)
-                self._dataHeader = None
-        else: # no header specified
-            self._dataHeader = None
+        # Set the schema (and with it the header). Do this first so it is
+        # available to decode the data.
+        if schema is None:
+            schema = Glp2DataSchema(header, decimalSeparator)
+        self._schema = schema
         # set up the data
-        if data is not None: # data provided
-            # make sure the data is convertable to a tuple. If not, report an
-            # error -- a tuple is immutable, so an empty one isn't very useful.
-            try:
-                self._rawData=tuple(data)
-                # if we get here, we should have a tuple with something in it
-                # Assume it is a multi element tuple, with each element containing
-                # the details of a test step.
-            except ValueError as ve:
-                print('Value Error: The data parameter must be a tuple or something \
-convertalbe to a tuple. This generally means it must be something iteratable. \
-No step information captured.')
-                print(ve)
-                self._rawData = None
-        else: # no data provided
-            self._rawData = None
+        self._rawData = None
+        self.data = data
 
-        self._decimalSeparator = decimalSeparator
-        self._testStepGuidIdx = testStepGuidIdx
-        self._commentsIdx = commentsIdx
-        self._operatorIdx = operatorIdx
-        self._deviceNumberIdx = deviceNumberIdx
-        self._stepNumberIdx = stepNumberIdx
-        self._testMethodKeyIdx = testMethodKeyIdx
-        self._nomVoltIdx = nomVoltIdx
-        self._nomVoltUnitIdx = nomVoltUnitIdx
-        self._actVoltIdx = actVoltIdx
-        self._actVoltUnitIdx = actVoltUnitIdx
-        self._currentLimIdx = currentLimIdx
-        self._currentLimUnitIdx = currentLimUnitIdx
-        self._actCurrIdx = actCurrIdx
-        self._actCurrUnitIdx = actCurrUnitIdx
-        self._timestampIdx = timestampIdx
-        self._graphDataIdx = graphDataIdx
+    # Decode the values from the raw data into the slots. Called whenever the
+    # data is set.
+    def _decode(self):
+        rawData = self._rawData if self._rawData is not None else ()
+        # get the values from the raw data using the schema
+        (testStepGuid, comments, operator, deviceNumber, stepNumber,
+         testMethodKey, nomVolt, nomVoltUnit, actVolt, actVoltUnit,
+         currentLim, currentLimUnit, actCurr, actCurrUnit, timestamp,
+         graphData) = self._schema.getStepValues(rawData)
+        decimalSeparator = self._schema.decimalSeparator
+        self._testStepGuid = testStepGuid
+        self._comments = comments
+        self._operator = operator
+        self._deviceNumber = deviceNumber
+        self._stepNumber = _toInt(stepNumber)
+        self._testMethodKey = _toInt(testMethodKey)
+        self._nominalVoltage = _toFloat(nomVolt, decimalSeparator)
+        self._nominalVoltageUnit = nomVoltUnit
+        self._measuredVoltage = _toFloat(actVolt, decimalSeparator)
+        self._measuredVoltageUnit = actVoltUnit
+        self._currentLimit = _toFloat(currentLim, decimalSeparator)
+        self._currentLimitUnit = currentLimUnit
+        self._measuredCurrent = _toFloat(actCurr, decimalSeparator)
+        self._measuredCurrentUnit = actCurrUnit
+        self._testTimestamp = timestamp
+        self._graphData = graphData
 
     def __repr__(self):
         outputMsg=  '{:21}{:<23}{:18}{}\n'.format('Test Step Number: ',
@@ -148,53 +197,28 @@ No step information captured.')
     # properties
     @property
     def testStepGuid(self):
-        # get the value from the raw data if the data is present
-        if self._rawData is not None and self._testStepGuidIdx + 1 <= len(self._rawData):
-            return self._rawData[self._testStepGuidIdx]
-        else:
-            return None
+        return self._testStepGuid
 
     @property
     def comments(self):
-        # get the value from the raw data if the data is present
-        if self._rawData is not None and self._commentsIdx + 1 <= len(self._rawData):
-            return self._rawData[self._commentsIdx]
-        else:
-            return None
+        return self._comments
 
     @property
     def operator(self):
-        # get the value from the raw data if the data is present
-        if self._rawData is not None and self._operatorIdx + 1 <= len(self._rawData):
-            return self._rawData[self._operatorIdx]
-        else:
-            return None
+        return self._operator
 
     @property
     def deviceNumber(self):
-        # get the value from the raw data if the data is present
-        if self._rawData is not None and self._deviceNumberIdx + 1 <= len(self._rawData):
-            return self._rawData[self._deviceNumberIdx]
-        else:
-            return None
+        return self._deviceNumber
 
     @property
     def stepNumber(self):
-        # get the value from the raw data if the data is present
-        if self._rawData is not None and self._stepNumberIdx + 1 <= len(self._rawData):
-            return int(self._rawData[self._stepNumberIdx])
-        else:
-            return None
+        return _checked(self._stepNumber)
 
     @property
     def testMethod(self):
         # enumerate the stored method value into human friendly text
-        # get the value from the raw data if the data is present
-        if self._rawData is not None and self._testMethodKeyIdx + 1 <= len(self._rawData):
-            methodKey = int(self._rawData[self._testMethodKeyIdx])
-        else:
-            return None
-
+        methodKey = _checked(self._testMethodKey)
         if 24 == methodKey:
             return 'HV DC'
         else:
@@ -202,120 +226,81 @@ No step information captured.')
 
     @property
     def testMethodKey(self):
-        # get the value from the raw data if the data is present
-        if self._rawData is not None and self._testMethodKeyIdx + 1 <= len(self._rawData):
-            return int(self._rawData[self._testMethodKeyIdx])
-        else:
-            return None
+        return _checked(self._testMethodKey)
 
     @property
     def nominalVoltage(self):
-        # get the value from the raw data if the data is present
-        if self._rawData is not None and self._nomVoltIdx + 1 <= len(self._rawData):
-            if self._decimalSeparator == ',':
-                # if using a comma as a decimal separator, also assume a period
-                # may be used as a thousands separator.  First replace all periods
-                # with an empty string (get rid of them), and then replace all commas
-                # with periods.
-                return float(self._rawData[self._nomVoltIdx].replace('.','').replace(',', '.'))
-            else: # assume decimal separator is a period
-                return float(self._rawData[self._nomVoltIdx])
-        else:
-            return None
+        return _checked(self._nominalVoltage)
 
     @property
     def nominalVoltageUnit(self):
-        # get the value from the raw data if the data is present
-        if self._rawData is not None and self._nomVoltUnitIdx + 1 <= len(self._rawData):
-            return self._rawData[self._nomVoltUnitIdx]
-        else:
-            return None
+        return self._nominalVoltageUnit
 
     @property
     def measuredVoltage(self):
-        # get the value from the raw data if the data is present
-        if self._rawData is not None and self._actVoltIdx + 1 <= len(self._rawData):
-            if self._decimalSeparator == ',':
-                # if using a comma as a decimal separator, also assume a period
-                # may be used as a thousands separator.  First replace all periods
-                # with an empty string (get rid of them), and then replace all commas
-                # with periods.
-                return float(self._rawData[self._actVoltIdx].replace('.','').replace(',', '.'))
-            else: # assume decimal separator is a period
-                return float(self._rawData[self._actVoltIdx])
-        else:
-            return None
+        return _checked(self._measuredVoltage)
 
     @property
     def measuredVoltageUnit(self):
-        # get the value from the raw data if the data is present
-        if self._rawData is not None and self._actVoltUnitIdx + 1 <= len(self._rawData):
-            return self._rawData[self._actVoltUnitIdx]
-        else:
-            return None
+        return self._measuredVoltageUnit
 
     @property
     def currentLimit(self):
-        # get the value from the raw data if the data is present
-        if self._rawData is not None and self._currentLimIdx + 1 <= len(self._rawData):
-            if self._decimalSeparator == ',':
-                # if using a comma as a decimal separator, also assume a period
-                # may be used as a thousands separator.  First replace all periods
-                # with an empty string (get rid of them), and then replace all commas
-                # with periods.
-                return float(self._rawData[self._currentLimIdx].replace('.','').replace(',', '.'))
-            else: # assume decimal separator is a period
-                return float(self._rawData[self._currentLimIdx])
-        else:
-            return None
+        return _checked(self._currentLimit)
 
     @property
     def currentLimitUnit(self):
-        # get the value from the raw data if the data is present
-        if self._rawData is not None and self._currentLimUnitIdx + 1 <= len(self._rawData):
-            return self._rawData[self._currentLimUnitIdx]
-        else:
-            return None
+        return self._currentLimitUnit
 
     @property
     def measuredCurrent(self):
-        # get the value from the raw data if the data is present
-        if self._rawData is not None and self._actCurrIdx + 1 <= len(self._rawData):
-            if self._decimalSeparator == ',':
-                # if using a comma as a decimal separator, also assume a period
-                # may be used as a thousands separator.  First replace all periods
-                # with an empty string (get rid of them), and then replace all commas
-                # with periods.
-                return float(self._rawData[self._actCurrIdx].replace('.','').replace(',', '.'))
-            else: # assume decimal separator is a period
-                return float(self._rawData[self._actCurrIdx])
-        else:
-            return None
+        return _checked(self._measuredCurrent)
 
     @property
     def measuredCurrentUnit(self):
-        # get the value from the raw data if the data is present
-        if self._rawData is not None and self._actCurrUnitIdx + 1 <= len(self._rawData):
-            return self._rawData[self._actCurrUnitIdx]
-        else:
-            return None
+        return self._measuredCurrentUnit
 
     @property
     def testTimestamp(self):
-        # get the value from the raw data if the data is present
-        if self._rawData is not None and self._timestampIdx + 1 <= len(self._rawData):
-            return self._rawData[self._timestampIdx]
-        else:
-            return None
+        return self._testTimestamp
 
     @property
     def graphData(self):
-        # get the graph data from the raw data if it is present
-        if self._rawData is not None and self._graphDataIdx + 1 <= len(self._rawData):
-            return self._rawData[self._graphDataIdx]
-        else: # index out of range
+        if self._graphData is None: # index out of range
             print('graphData index OOR')
+        return self._graphData
+
+    # Return the graph data parsed into a Glp2GraphData object, or None if
+    # there is no graph data. The graph data is parsed each time this is used,
+    # so get it once and pass it on (e.g. to both the pdf and the csv of the
+    # step). Unless decodeSamples, the sample values are not decoded (e.g. the
+    # graph csv only needs the raw values, see Glp2GraphData). A graph value
+    # that is not a number raises a ValueError that names the step.
+    def getGraph(self, decodeSamples=True):
+        if not self._graphData:
             return None
+        try:
+            return Glp2GraphData(self._graphData, decodeSamples=decodeSamples)
+        except ValueError as ve:
+            raise ValueError('Unable to read the graph data of step ' + str(self.stepNumber) +
+                             ' (step GUID ' + str(self.testStepGuid) + '). ' + str(ve))
+
+    # The graph data parsed, with the sample values decoded (see getGraph).
+    @property
+    def graph(self):
+        return self.getGraph()
+
+    # Release the graph data string, keeping the rest of the step. The data
+    # row is replaced with a copy that has the graph data column emptied.
+    # newRow may be passed if the caller has already made that copy.
+    def releaseGraphData(self, newRow=None):
+        if self._rawData is None:
+            return
+        if newRow is None:
+            newRow = self._schema.withoutGraphData(self._rawData)
+        self._rawData = newRow
+        if self._graphData is not None:
+            self._graphData = ''
 
     @property
     def len(self): # column count, 1 based
@@ -323,21 +308,20 @@ No step information captured.')
 
     @property
     def header(self):
-        return (self._dataHeader)
+        return self._schema.header
 
     @header.setter
     def header(self, headerData):
-        if headerData is not None:
-            try:
-                # header is specified, but it must be convertable to a tuple.
-                self._dataHeader = tuple(headerData)
-            except ValueError as ve:
-                print('Value Error: The header parameter must be a tuple, or something \
-convertable to a tuple. This generally means it must be something iteratable. \
-Header not changed.')
-                print(ve)
-        else: # nothing specified for header
-            self._dataHeader = None
+        # A new header means a new schema for this step, with the same column
+        # map and decimal separator (the columns given by name are looked up
+        # in the new header).
+        self._schema = Glp2DataSchema(headerData, self._schema.decimalSeparator,
+                                      self._schema.columnMap)
+        self._decode()
+
+    @property
+    def schema(self):
+        return self._schema
 
     @property
     def data(self):
@@ -360,4 +344,6 @@ Data not changed.')
                 print(ve)
         else: # no data provided
             self._rawData = None
+        # decode the values from the (new) data
+        self._decode()
 
@@ -4,9 +4,18 @@
 #
 # Glp2TestDfn.py
 #
+# The test definition files (*.TPR) use a format that is like a *.INI config
+# file. They are read with Glp2TprParser, which gives the sections as a
+# dictionary of raw option values. The general values and the steps are made
+# from the sections when the file is read, with the values already converted.
+# For callers that want the options themselves, the config property gives a
+# configparser.ConfigParser with the same sections and options. It is only made
+# if it is used.
+#
 # imports
 import Glp2Constants as constants
 from Glp2TestDfnStep import Glp2TestDfnStep
+from Glp2TprParser import ReadTpr, TprValue, CountTprSteps
 #
 # config file parser
 import configparser
@@ -14,38 +23,115 @@ import configparser
 class Glp2TestDfn(object):
     # class constants
 
-    def __init__(self, name, fileName=None, fileEncoding='UTF-8'):
+    def __init__(self, name, fileName=None, fileEncoding='UTF-8', record=None,
+                 lazy=False):
         self._name = str(name) # use the string version
+        self._fileName = fileName
+        self._fileEncoding = fileEncoding
+        self._config = None # made from the sections when it is used
+
+        # A record (see toRecord) has everything needed to make the definition
+        # without reading and parsing the file again (e.g. from a cache).
+        if record is not None:
+            self._fromRecord(record)
+            return
 
-        # Get the config specified by the fileName
+        # Get the definition specified by the fileName
         if fileName is None:
-            self._config = configparser.ConfigParser()
+            self._sections = {}
             self._numberOfSteps = 0
             self._steps = () # empty tuple
+            generalSections = self._sections
+        elif lazy:
+            # Only read the general section for now. The whole file is read
+            # and the steps are made the first time they are needed.
+            self._sections = None
+            self._numberOfSteps = None
+            self._steps = None
+            generalSections = self._readSections(constants.DFN_GENERAL_SECTION)
         else:
-            # Make a config object, and read in the config file name.
-            # The fileName should be a test definition, and the definition
-            # files *.TPR use a format that is like a *.INI config file.
-            self._fileName = fileName
-            self._config = configparser.ConfigParser()
-            self._config.read(fileName, fileEncoding)
-            self._numberOfSteps = self._getNumOfSteps(constants.DFN_STEP_SECTION_PREFIX)
-            # If there are steps defined, process them and create populated
-            # test definition step objects.
-            # init list of steps to an empty list. It will say empty if there
-            # is not at least one step.
-            steps=[]
-            if self._numberOfSteps > 0: # there is at least one step
-                # there is at least one step. Loop thru, retreive the values
-                # from the config object and make dfn step objects
-                for step in range(1, self._numberOfSteps + 1):
-                    sectionName = constants.DFN_STEP_SECTION_PREFIX + str(step)
-                    steps.append(Glp2TestDfnStep(step, self._config.items(sectionName)))
-            else: # there are no steps
-                pass    # nothing to do!
-
-            # convert steps to a member tuple
-            self._steps = tuple(steps)
+            self._load()
+            generalSections = self._sections
+
+        # get the general values once, rather than from the sections every time
+        self._setGeneralValues(generalSections)
+
+    # Read the definition file and return the sections. If stopAfter is a
+    # section name, the file is only read to the end of that section. Like
+    # configparser.read, a file that can't be opened gives no sections.
+    def _readSections(self, stopAfter=None):
+        try:
+            return ReadTpr(self._fileName, self._fileEncoding, stopAfter)
+        except OSError:
+            return {}
+
+    # Read and parse the whole definition file, and make the steps.
+    def _load(self):
+        self._sections = self._readSections()
+        self._config = None
+        self._numberOfSteps = CountTprSteps(self._sections, constants.DFN_STEP_SECTION_PREFIX)
+        # If there are steps defined, make populated test definition step
+        # objects. The tuple will be empty if there is not at least one step.
+        self._steps = tuple(self._makeStep(step) for step in range(1, self._numberOfSteps + 1))
+
+    # Make a step object from the [TestStepN] section of the step number.
+    def _makeStep(self, stepNum):
+        section = self._sections[constants.DFN_STEP_SECTION_PREFIX + str(stepNum)]
+        return Glp2TestDfnStep(stepNum, {option: TprValue(value)
+                                         for option, value in section.items()})
+
+    # Make sure the whole definition is loaded. A lazy definition is loaded the
+    # first time the steps or the config are used.
+    def _ensureLoaded(self):
+        if self._steps is None:
+            self._load()
+
+    # Set the general values from sections that have the general section.
+    def _setGeneralValues(self, sections):
+        general = sections.get(constants.DFN_GENERAL_SECTION, {})
+        self._dfnGuid = self._getGeneralOption(constants.DFN_GENSEC_GUID_OPTNAME, general)
+        self._generalComments = self._getGeneralOption(constants.DFN_GENSEC_COMMENTS_OPTNAME, general)
+        self._nameOfProgrammer = self._getGeneralOption(constants.DFN_GENSEC_NAME_OF_PROG_OPTNAME, general)
+
+    # Set up the definition from a record made by toRecord. A record from a
+    # lazy definition that was never loaded has no steps or sections, so the
+    # definition is lazy too.
+    def _fromRecord(self, record):
+        self._sections = record['config']
+        self._dfnGuid = record['dfnGuid']
+        self._generalComments = record['generalComments']
+        self._nameOfProgrammer = record['nameOfProgrammer']
+        if record['steps'] is None:
+            self._steps = None
+            self._numberOfSteps = None
+        else:
+            self._steps = tuple(Glp2TestDfnStep(stepNum, stepData)
+                                for stepNum, stepData in record['steps'])
+            self._numberOfSteps = len(self._steps)
+
+    # Return a dictionary with everything needed to make this definition again
+    # without the file: the general values, the step data, and the raw option
+    # values of all the sections. It only holds strings, numbers, tuples and dictionaries, so it
+    # can be saved (e.g. pickled) and later passed to the ctor as the record.
+    # A lazy definition that has not been loaded is not loaded by this; its
+    # record only has the general values.
+    def toRecord(self):
+        if not self.isLoaded:
+            return {'dfnGuid': self._dfnGuid,
+                    'generalComments': self._generalComments,
+                    'nameOfProgrammer': self._nameOfProgrammer,
+                    'steps': None,
+                    'config': None}
+        return {'dfnGuid': self._dfnGuid,
+                'generalComments': self._generalComments,
+                'nameOfProgrammer': self._nameOfProgrammer,
+                'steps': tuple((step.stepNum, step.stepData) for step in self._steps),
+                'config': self._sections}
+
+    # Return the value of an option in the general section, or None if it is
+    # not there. Option names are all lower case.
+    def _getGeneralOption(self, optionName, general):
+        return TprValue(general.get(optionName.lower()))
 
     def __repr__(self):
         # TODO: Make output a dictionary or someting in line with the goal of __repr__
@@ -58,7 +144,7 @@ class Glp2TestDfn(object):
         outputMsg+= '{:6} {}\n'.format('General generalComments: ', self.generalComments)
         outputMsg+= '{:17} {}\n'.format('Number of Steps: ', str(self.stepCount))
         outputMsg+=  '{}\n'.format('Test Steps:')
-        for step in self._steps:
+        for step in self.steps:
             outputMsg += str(step)
         # :TODO: :DEBUG:  May not want lengthy header and data. Bypass for now.
         return(outputMsg)
@@ -78,30 +164,14 @@ class Glp2TestDfn(object):
         outputMsg+= '{:19} {}\n'.format('Name of Programmer: ', self.nameOfProgrammer)
         outputMsg+= '{:19} {}\n'.format('Number of Steps: ', str(self.stepCount))
         outputMsg+=  '\n{}\n'.format('Test Steps:')
-        if self.countSteps > 0:
-            for step in self._steps:
+        if self.stepCount > 0:
+            for step in self.steps:
                 outputMsg += str(step)
         else:
             outputMsg+= '  No Steps Defined!'
         return(outputMsg)
 
 
-    # this function will determine how many steps are contained in the
-    # test definition. Pass a defaulted setion prefix.
-    # It is intended to be used internally to set the _numberOfSteps member
-    def _getNumOfSteps(self, sectionPrefix=constants.DFN_STEP_SECTION_PREFIX):
-        numOfSteps = 0
-        stepNum = 1
-        # construct section names and look for them until one isn't found
-        # No do..while, so emulate with a while loop
-        while True:
-            sectionName = sectionPrefix + str(stepNum)
-            if self._config.has_section(sectionName):
-                numOfSteps += 1
-                stepNum += 1
-            else:
-                return numOfSteps
-
     # properties
     @property
     def fileName(self):
@@ -117,42 +187,53 @@ class Glp2TestDfn(object):
 
     @property
     def dfnGuid(self):
-        if self._config.has_option(constants.DFN_GENERAL_SECTION, constants.DFN_GENSEC_GUID_OPTNAME):
-            return(self._config[constants.DFN_GENERAL_SECTION][constants.DFN_GENSEC_GUID_OPTNAME])
-        else:
-            return None
+        return self._dfnGuid
 
     @property
     def generalComments(self):
-        if self._config.has_option(constants.DFN_GENERAL_SECTION,
-                constants.DFN_GENSEC_COMMENTS_OPTNAME):
-            return(self._config[constants.DFN_GENERAL_SECTION][constants.DFN_GENSEC_COMMENTS_OPTNAME])
-        else:
-            return None
+        return self._generalComments
 
     @property
     def nameOfProgrammer(self):
-        if self._config.has_option(constants.DFN_GENERAL_SECTION, constants.DFN_GENSEC_NAME_OF_PROG_OPTNAME):
-            return(self._config[constants.DFN_GENERAL_SECTION][constants.DFN_GENSEC_NAME_OF_PROG_OPTNAME])
-        else:
-            return None
+        return self._nameOfProgrammer
+
+    # The sections of the definition file, as a dictionary of dictionaries of
+    # raw option values (see Glp2TprParser).
+    @property
+    def sections(self):
+        self._ensureLoaded()
+        return self._sections
 
+    # A config parser with the sections and options of the definition file.
+    # It is made the first time it is used.
     @property
     def config(self):
+        if self._config is None:
+            self._config = configparser.ConfigParser()
+            self._config.read_dict(self.sections)
         return self._config
 
+    # Read a different definition file, using the same encoding.
     @config.setter
-    def config(self, newFile, fileEncoding='UTF-8'):
-        self._config = configParser.ConfigParser()
-        self._config.read(newFile, fileEncoding)
+    def config(self, newFile):
+        self._fileName = newFile
+        self._load()
+        self._setGeneralValues(self._sections)
+
+    # True if the steps have been made. Only a lazy definition can be False.
+    @property
+    def isLoaded(self):
+        return self._steps is not None
 
     @property
     def stepCount(self):
+        self._ensureLoaded()
         return self._numberOfSteps
 
     # return the step data set (a tuple)
     @property
     def steps(self):
+        self._ensureLoaded()
         return self._steps
 
     # Return a step given a step number. Step number is 1 based.
@@ -160,7 +241,7 @@ class Glp2TestDfn(object):
     # Not a property since it has an argument
     def getStep(self, stepNo):
         step = int(stepNo)
-        if step < 1 or step > self._numberOfSteps:
+        if step < 1 or step > self.stepCount:
             # invalid step number
             return None
         else:
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Glp2TestDfnCache.py
+#
+# A persistent (on disk) cache of test definitions.  Reading a test definition
+# file (*.TPR) means decoding a UTF-16 file and parsing it (see Glp2TprParser
+# ReadTpr), and a library can have hundreds of them, even though they rarely
+# change.
+# This cache keeps a record (see Glp2TestDfn.toRecord) of each definition that
+# has been loaded, keyed by the absolute path of the file, along with the file
+# modification time, size and the encoding used. When a definition is loaded
+# and the file has not changed, the definition is made from the record rather
+# than the file. Only new or changed files are read and parsed.
+#
+# Lazy definitions (see Glp2TestDfn) can be cached too. Until a lazy definition
+# is loaded, its record only has the general values. The cache keeps track of
+# the lazy definitions it hands out, and when one has been loaded by the time
+# the cache is saved, the full record is saved in place of the general values.
+#
+# The cache is a single pickle file. It is only read back by this program, from
+# a directory the user controls, so pickle is acceptable here. If the file can
+# not be read, or was written by a different version of the cache, it is
+# ignored and rebuilt.
+#
+# imports
+import os
+import pickle
+from Glp2TestDfn import Glp2TestDfn
+
+# Return the (modification time (ns), size) stamp of a test definition file,
+# used to tell if it changed, or None if the file is not there.
+def DfnFileStamp(fileName):
+    try:
+        stat = os.stat(fileName)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+class Glp2TestDfnCache(object):
+    # class constants
+    CACHE_VERSION = 1   # change when the record format changes
+    DEFAULT_FILE_NAME = 'testDfnCache.pickle'
+
+    def __init__(self, cacheDir, cacheFileName=DEFAULT_FILE_NAME):
+        self._cacheDir = cacheDir
+        self._cacheFile = os.path.join(cacheDir, cacheFileName)
+        self._entries = {}      # path: (mtime, size, encoding, record)
+        self._lazyDfns = {}     # path: lazy definition handed out
+        self._changed = False
+        self._hits = 0
+        self._misses = 0
+        try:
+            with open(self._cacheFile, 'rb') as cacheFile:
+                version, entries = pickle.load(cacheFile)
+            if version == self.CACHE_VERSION:
+                self._entries = entries
+        except FileNotFoundError:
+            pass # no cache yet
+        except Exception as e:
+            print('Warning: The test definition cache ' + self._cacheFile +
+                  ' could not be read and will be rebuilt.')
+            print(e)
+
+    def __str__(self):
+        outputMsg=  '{:20} {}\n'.format('Cache File: ', self._cacheFile)
+        outputMsg+= '{:20} {}\n'.format('Definitions: ', len(self._entries))
+        outputMsg+= '{:20} {}\n'.format('Hits: ', self._hits)
+        outputMsg+= '{:20} {}\n'.format('Misses: ', self._misses)
+        return(outputMsg)
+
+    # Return the key and the (mtime, size) stamp used to tell if a file changed.
+    def _stamp(self, fileName):
+        stat = os.stat(fileName)
+        return os.path.abspath(fileName), stat.st_mtime_ns, stat.st_size
+
+    # Return a test definition (Glp2TestDfn) for the file. It is made from the
+    # cache if the file has not changed since it was cached, otherwise the file
+    # is read, and the definition is added to the cache. If lazy is True, a
+    # record with only the general values will do, and the definition returned
+    # may be lazy.
+    # Exceptions from reading the file (e.g. UnicodeError) are passed on.
+    def loadDfn(self, name, fileName, fileEncoding='UTF-8', lazy=False):
+        key, mtime, size = self._stamp(fileName)
+        entry = self._entries.get(key)
+        if (entry is not None and entry[:3] == (mtime, size, fileEncoding) and
+                (lazy or entry[3]['steps'] is not None)):
+            self._hits += 1
+            dfn = Glp2TestDfn(name, fileName, fileEncoding, record=entry[3])
+        else:
+            self._misses += 1
+            dfn = Glp2TestDfn(name, fileName, fileEncoding, lazy=lazy)
+            self._entries[key] = (mtime, size, fileEncoding, dfn.toRecord())
+            self._changed = True
+        if not dfn.isLoaded:
+            self._lazyDfns[key] = dfn
+        return dfn
+
+    # Replace the general values only records of lazy definitions that have
+    # since been loaded with full records.
+    def _updateLazyEntries(self):
+        for key, dfn in list(self._lazyDfns.items()):
+            if dfn.isLoaded:
+                del self._lazyDfns[key]
+                entry = self._entries.get(key)
+                if entry is not None and entry[3]['steps'] is None:
+                    self._entries[key] = entry[:3] + (dfn.toRecord(),)
+                    self._changed = True
+
+    # Remove entries for files that no longer exist.
+    def prune(self):
+        for key in [key for key in self._entries if not os.path.exists(key)]:
+            del self._entries[key]
+            self._changed = True
+
+    # Write the cache to disk if anything changed. The file is written to a
+    # temporary name and then renamed, so a partly written cache is never read.
+    def save(self):
+        self._updateLazyEntries()
+        if not self._changed:
+            return
+        try:
+            os.makedirs(self._cacheDir, exist_ok=True)
+            tmpFile = self._cacheFile + '.tmp'
+            with open(tmpFile, 'wb') as cacheFile:
+                pickle.dump((self.CACHE_VERSION, self._entries), cacheFile,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmpFile, self._cacheFile)
+            self._changed = False
+        except OSError as ose:
+            print('Warning: The test definition cache ' + self._cacheFile +
+                  ' could not be written.')
+            print(ose)
+
+    # properties
+    @property
+    def cacheFile(self):
+        return self._cacheFile
+
+    @property
+    def hits(self):
+        return self._hits
+
+    @property
+    def misses(self):
+        return self._misses
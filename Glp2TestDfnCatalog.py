@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Glp2TestDfnCatalog.py
+#
+# This object holds a set of test definitions (Glp2TestDfn objects) and the
+# test data (Glp2TestData objects) to be associated with them, and indexes both
+# by GUID so the association is made with dictionary lookups:
+#   definition GUID -> definition index  (built once, when the catalog is made)
+#   program GUID -> test indexes         (built when the tests are set)
+# A test is associated with a definition when the test program GUID of the test
+# matches the GUID of the definition.
+#
+# The definitions and tests are kept in tuples, and the indexes returned are
+# positions in those tuples, so they line up with the tuples the caller passed.
+#
+# If more than one definition has the same GUID (e.g. a copied definition file)
+# the last one is the one associated with the tests, but all of them are
+# considered used.
+#
+# imports
+from collections import defaultdict
+
+class Glp2TestDfnCatalog(object):
+    def __init__(self, dfns=None, tests=None):
+        # definitions, and the definition GUID -> definition index
+        self._dfns = tuple(dfns) if dfns is not None else ()
+        self._dfnIdxByGuid = {}
+        for didx, dfn in enumerate(self._dfns):
+            dfnGuid = dfn.dfnGuid
+            if dfnGuid is not None:
+                self._dfnIdxByGuid[dfnGuid] = didx
+        # tests, and the program GUID -> test indexes
+        self.tests = tests
+
+    def __str__(self):
+        outputMsg=  '{:24} {}\n'.format('Test Definitions: ', len(self._dfns))
+        outputMsg+= '{:24} {}\n'.format('Tests: ', len(self._tests))
+        outputMsg+= '{:24} {}\n'.format('Tests Without Dfn: ', len(self.getTestsWithoutDfn()))
+        outputMsg+= '{:24} {}\n'.format('Dfns Without Tests: ', len(self.getDfnsWithoutTests()))
+        return(outputMsg)
+
+    # properties
+    @property
+    def dfns(self):
+        return self._dfns
+
+    @property
+    def tests(self):
+        return self._tests
+
+    @tests.setter
+    def tests(self, tests):
+        # (re)build the program GUID -> test indexes reverse index
+        self._tests = tuple(tests) if tests is not None else ()
+        self._testIdxsByProgramGuid = defaultdict(list)
+        for tidx, test in enumerate(self._tests):
+            self._testIdxsByProgramGuid[test.getTestProgramGuid].append(tidx)
+
+    # Return the definition with the specified GUID, or None if there isn't one.
+    def getDfn(self, dfnGuid):
+        didx = self._dfnIdxByGuid.get(dfnGuid)
+        return self._dfns[didx] if didx is not None else None
+
+    # Return the index of the definition with the specified GUID, or None if
+    # there isn't one.
+    def getDfnIndex(self, dfnGuid):
+        return self._dfnIdxByGuid.get(dfnGuid)
+
+    # Return the definition for a test, or None if there isn't one.
+    def getDfnForTest(self, test):
+        return self.getDfn(test.getTestProgramGuid)
+
+    # Return a tuple of the indexes of the tests run with the specified program
+    # (definition) GUID.
+    def getTestIndexes(self, programGuid):
+        return tuple(self._testIdxsByProgramGuid.get(programGuid, ()))
+
+    # Return a tuple of the tests run with the specified program (definition) GUID.
+    def getTests(self, programGuid):
+        return tuple(self._tests[tidx] for tidx in self._testIdxsByProgramGuid.get(programGuid, ()))
+
+    # Return a tuple with one element per test (by position) which is the index
+    # of the definition for the test, or None if there is no definition.
+    def getTestDfnIndexes(self):
+        dfnIdxs = [None] * len(self._tests)
+        for programGuid, testIdxs in self._testIdxsByProgramGuid.items():
+            didx = self._dfnIdxByGuid.get(programGuid)
+            if didx is not None:
+                for tidx in testIdxs:
+                    dfnIdxs[tidx] = didx
+        return tuple(dfnIdxs)
+
+    # Return a tuple of (test index, definition index) pairs for the tests that
+    # have a definition, in test order.
+    def getTestDfnPairs(self):
+        return tuple((tidx, didx) for tidx, didx in enumerate(self.getTestDfnIndexes())
+                     if didx is not None)
+
+    # Return a list of the indexes of the tests that have no definition.
+    def getTestsWithoutDfn(self):
+        return sorted(tidx for programGuid, testIdxs in self._testIdxsByProgramGuid.items()
+                      if programGuid not in self._dfnIdxByGuid for tidx in testIdxs)
+
+    # Return a list of the indexes of the definitions not used by any test.
+    def getDfnsWithoutTests(self):
+        return [didx for didx, dfn in enumerate(self._dfns)
+                if dfn.dfnGuid is None or dfn.dfnGuid not in self._testIdxsByProgramGuid]
+
+    # Return a dictionary, keyed by data file name, of the set of program
+    # (definition) names used by the tests in each file. The files are in
+    # the order of the tests.
+    def getProgramNamesByFile(self):
+        fnVsDfn = defaultdict(set)
+        for test in self._tests:
+            fnVsDfn[test.fileName].add(test.getTestProgramName)
+        return fnVsDfn
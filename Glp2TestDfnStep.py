@@ -8,8 +8,26 @@
 # TODO: Get values and definitions for step method, and mode. Probably use
 # a dictionary or some sort of enumeration to give values meaningful names.
 #
+# The values are converted (to numbers where appropriate) once, when the step
+# is made, rather than each time a property is used. Values that are missing or
+# can not be converted are None. The step data is a dictionary of the option
+# names (lower case, as configparser returns them) and values from the
+# definition file.
+#
 # imports
 import Glp2Constants as constants
+
+# Return the value of an option from the step data, converted with convert, or
+# None if it isn't there or can't be converted.
+def _getValue(stepData, optionName, convert):
+    # option names are all lower case
+    value = stepData.get(optionName.lower())
+    if value is None:
+        return None
+    try:
+        return convert(value)
+    except ValueError:
+        return None
 #
 class Glp2TestDfnStep(object):
     def __init__(self, stepNum, data=None):
@@ -35,6 +53,22 @@ must be a dictionary, or something convertable to an dictionary. Step data not s
         else: # no data specified
             self._stepData = None
 
+        self._decode()
+
+    # Convert the values from the step data. Called when the step is made.
+    def _decode(self):
+        stepData = self._stepData if self._stepData is not None else {}
+        self._stepGuid = str(stepData.get(constants.DFN_STEP_GUID_OPTNAME.lower()))
+        self._stepMethodKey = _getValue(stepData, constants.DFN_STEP_METHOD_OPTNAME, int)
+        self._stepModeKey = _getValue(stepData, constants.DFN_STEP_MODE_OPTNAME, int)
+        self._stepDescription = str(stepData.get(constants.DFN_STEP_DESC_OPTNAME.lower()))
+        self._currentRange = str(stepData.get(constants.DFN_STEP_CURR_RNG_OPTNAME.lower()))
+        self._currentLimit = _getValue(stepData, constants.DFN_STEP_CURR_LIM_OPTNAME, float)
+        self._testTime = _getValue(stepData, constants.DFN_STEP_TEST_TIME_OPTNAME, float)
+        self._rampTime = _getValue(stepData, constants.DFN_STEP_RAMP_TIME_OPTNAME, float)
+        self._delayTime = _getValue(stepData, constants.DFN_STEP_DLY_TIME_OPTNAME, float)
+        self._testVoltage = _getValue(stepData, constants.DFN_STEP_TEST_VOLT_OPTNAME, float)
+
     def __repr__(self):
         # TODO: Make output a dictionary or someting in line with the goal of __repr__
         # __repr__ should have an unambiguous output and create
@@ -94,40 +128,24 @@ must be an integer, or something convertable to an integer. Step number not set.
 
     @property
     def stepGuid(self):
-        # returned option names are all lower case
-        return str(self._stepData.get(constants.DFN_STEP_GUID_OPTNAME.lower()))
+        return self._stepGuid
 
     @property
     def stepMethod(self):
         # enumerate the stored method value into human friendly text
-        # returned option names are all lower case
-        try:
-            methodKey = int(self._stepData.get(constants.DFN_STEP_METHOD_OPTNAME.lower()))
-        except ValueError as ve:
-            return None
-
-        if 24 == methodKey:
+        if 24 == self._stepMethodKey:
             return 'HV DC'
         else:
-            return methodKey
+            return self._stepMethodKey
 
     @property
     def stepMethodKey(self):
-        # returned option names are all lower case
-        try:
-            return int(self._stepData.get(constants.DFN_STEP_METHOD_OPTNAME.lower()))
-        except ValueError as ve:
-            return None
+        return self._stepMethodKey
 
     @property
     def stepMode(self):
         # enumerate the stored mode value into human friendly text
-        try:
-            # returned option names are all lower case
-            modeKey = int(self._stepData.get(constants.DFN_STEP_MODE_OPTNAME.lower()))
-        except ValueError as ve:
-            return None
-
+        modeKey = self._stepModeKey
         if 0 == modeKey:
             return 'Current'
         elif 1 == modeKey:
@@ -141,59 +159,32 @@ must be an integer, or something convertable to an integer. Step number not set.
 
     @property
     def stepModeKey(self):
-        try:
-            # returned option names are all lower case
-            return int(self._stepData.get(constants.DFN_STEP_MODE_OPTNAME.lower()))
-        except ValueError as ve:
-            return None
+        return self._stepModeKey
 
     @property
     def stepDescription(self):
-        # returned option names are all lower case
-        return str(self._stepData.get(constants.DFN_STEP_DESC_OPTNAME.lower()))
+        return self._stepDescription
 
     @property
     def currentRange(self):
-        # returned option names are all lower case
-        return str(self._stepData.get(constants.DFN_STEP_CURR_RNG_OPTNAME.lower()))
+        return self._currentRange
 
     @property
     def currentLimit(self):
-        try:
-            # returned option names are all lower case
-            return float(self._stepData.get(constants.DFN_STEP_CURR_LIM_OPTNAME.lower()))
-        except ValueError as ve:
-            return None
+        return self._currentLimit
 
     @property
     def testTime(self):
-        try:
-            # returned option names are all lower case
-            return float(self._stepData.get(constants.DFN_STEP_TEST_TIME_OPTNAME.lower()))
-        except ValueError as ve:
-            return None
+        return self._testTime
 
     @property
     def rampTime(self):
-        try:
-            # returned option names are all lower case
-            return float(self._stepData.get(constants.DFN_STEP_RAMP_TIME_OPTNAME.lower()))
-        except ValueError as ve:
-            return None
+        return self._rampTime
 
     @property
     def delayTime(self):
-        try:
-            # returned option names are all lower case
-           return float(self._stepData.get(constants.DFN_STEP_DLY_TIME_OPTNAME.lower()))
-        except ValueError as ve:
-            return None
+        return self._delayTime
 
     @property
     def testVoltage(self):
-        try:
-            # returned option names are all lower case
-            return float(self._stepData.get(constants.DFN_STEP_TEST_VOLT_OPTNAME.lower()))
-        except ValueError as ve:
-            return None
-
+        return self._testVoltage
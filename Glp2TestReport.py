@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Glp2TestReport.py
+#
+# Make the report files for the tests: for each test, a pdf of
+#   The test definition (when available)
+#   The test results (tabular)
+#   The test results (graph)
+# and a csv file of the graph data for each step.
+#
+# MakeTestReport makes the files for one test, and MakeTestPdf just the pdf, as
+# bytes (e.g. for the report service). MakeTestReports makes the files for
+# a list of tests, one after the other, or in parallel using a pool of worker
+# processes. Each test is independent, and the files for a test are only
+# written by the process making them, so the workers share nothing but the
+# tests. Each worker has its own pdf and graph figure (see Glp2GraphFigure).
+#
+# The messages about the files being written are collected for each test and
+# printed by the calling process, in test order, along with the progress and
+# any error. A test that fails is reported, and the rest of the tests are
+# still made.
+#
+# The pdf of a test is put together in memory: the definition and data pages
+# made with fpdf, and a page for each graph made with matplotlib, are kept as
+# bytes and the pdf file is written once, when the test is done. No temporary
+# files are used.
+#
+# imports
+import traceback
+from io import BytesIO
+from os import cpu_count
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_all_start_methods, get_context
+# user libraries
+# Note: May need PYTHONPATH (set in ~/.profile?) to be set depending
+# on the location of the imported files
+from bpsCPdf import cPdf # pdf creation
+from Glp2Functions import MakePdfDfnStepRow, MakePdfDataStepRow
+from Glp2Functions import WriteGraphDataCsv
+from Glp2Functions import PlotTvsVandI as plotVI
+from Glp2Functions import MakeTvsVandIFigure, FigureToRgb
+from Glp2Functions import PdfBytes, MergePdf, WritePdf
+from Glp2GraphPdf import AddGraphImage, DrawTvsVandI
+from Glp2Profile import Phase, Count, RunProfiled, ProfiledResult
+
+# Graph modes: how the graph of each step is put in the pdf
+GRAPH_MODE_PDF = 'pdf'      # matplotlib pdf, appended to the report pdf
+GRAPH_MODE_IMAGE = 'image'  # matplotlib figure rendered to an image on a page
+GRAPH_MODE_FAST = 'fast'    # drawn on a page from the data, without matplotlib
+GRAPH_MODES = (GRAPH_MODE_PDF, GRAPH_MODE_IMAGE, GRAPH_MODE_FAST)
+
+# Make the report pdf for one test, and return it as bytes. Nothing is written.
+# The arguments are the same as for MakeTestReport, less the file name. The
+# graph data of the test is kept, so the pdf can be made again. graphs is the
+# graph (Glp2GraphData) of each step of the test, if the caller already has
+# them, or None to parse them here.
+def MakeTestPdf(test, testDfn, plotTitle, options, log=print, graphs=None):
+    # The definition and data pages (text).
+    with Phase('pdfText'):
+        # *** Setup pdf object and file name
+        # Instantiate the extended pdf class and get on with making the pdf
+        # Units are in points (pt)
+        headerText = '{}    {} {}'.format('Test Data','File Name:', test.fileName)
+        # Page number total ends up wrong because of appending of graph data, so suppress
+        # the default footer by specifying and empty one.
+        pdf = cPdf(orientation = 'P', unit = 'pt', format='Letter', headerText=headerText,
+                footerText='')
+        # define the nb alias for total page numbers used in footer
+        pdf.alias_nb_pages() # Enable {nb} magic: total number of pages used in the footer
+        pdf.set_margins(54, 68, 54) # left, top, right margins (in points)
+        # add a page to be able to add content
+        pdf.add_page() # use ctor params
+        textHeight = pdf.font_size
+        # calc the effective page width, epw, and the 'unit' cell width.
+        # colwidth is somewhat arbitrary, but picked to be a convenient size
+        epw = pdf.w - (pdf.l_margin + pdf.r_margin)
+        colWidth = epw/6.0
+
+        # *** Definition information
+        # Create a definition section unless it is supressed
+        # Include test definition data or a messages saying there isn't any
+        if not options.supressDfnPdf:
+            # Insert a bold section heading for the definition
+            # Do this even if supressed so there is at least a place to
+            # state there is no definition available.
+            if pdf.fontNames[3] != pdf.defaultFontNames[3]:
+                # non-default
+                pdf.set_font("boldProp", 'B')
+            else:
+                # default
+                pdf.set_font(pdf.defaultFontNames[3], 'B')
+            pdf.cell(epw, textHeight * 1.2, 'Test Definition', border = 0)
+            # Reset back to regular weight, mono spaced
+            if pdf.fontNames[0] != pdf.defaultFontNames[0]:
+                # non-default
+                pdf.set_font("regularMono", '')
+            else:
+                # default
+                pdf.set_font(pdf.defaultFontNames[0], '')
+            pdf.ln(textHeight)
+
+            if testDfn is None:
+                # There is no definition information available for this test.
+                # State that, and then done with dfn section.
+                testDfnMsg  = '\nThere is no definition information available for this test.\n'
+                log(testDfnMsg)
+                # Add the test dfn data to the pdf
+                pdf.multi_cell(w=0, h=13, txt=testDfnMsg, border=0, align='L', fill=False )
+            else:
+                # Include test data file name in the beginning
+                # to help make it clear where/why this definition is being used
+                testDfnMsg  = '\n{} {}'.format('Program Name:', testDfn.name)
+                testDfnMsg += '\n{} {}'.format('File Name:', testDfn.fileName)
+                testDfnMsg += '\n{} {}'.format('Programmer:', testDfn.nameOfProgrammer)
+                testDfnMsg += '\n{} {}\n\n'.format('Comments:', testDfn.generalComments)
+                # Add the test dfn data to the pdf
+                pdf.multi_cell(w=0, h=13, txt=testDfnMsg, border=0, align='L', fill=False )
+                # add the definition steps to the pdf
+                for step in testDfn.steps:
+                    MakePdfDfnStepRow(pdf, step)
+
+            # if there is another section, add a new page
+            if not (options.supressDataPdf and options.supressGraphPdf):
+                pdf.add_page() # use ctor params
+
+
+        # *** Test data information
+        # Create a data section unless it is supressed
+        if not options.supressDataPdf:
+            # Insert a bold section heading for the test data
+            if pdf.fontNames[3] != pdf.defaultFontNames[3]:
+                # non-default
+                pdf.set_font("boldProp", 'B')
+            else:
+                # default
+                pdf.set_font(pdf.defaultFontNames[3], 'B')
+            pdf.cell(epw, textHeight * 1.2, 'Test Data', border = 0)
+            # Reset back to regular weight, mono spaced
+            if pdf.fontNames[0] != pdf.defaultFontNames[0]:
+                # non-default
+                pdf.set_font("regularMono", '')
+            else:
+                # default
+                pdf.set_font(pdf.defaultFontNames[0], '')
+            pdf.ln(textHeight)
+            testDataMsg  = '\n{} {}'.format('Program Name:', test.getTestProgramName)
+            testDataMsg += '\n{} {}'.format('Device S/N:', test.getDeviceNumber)
+            testDataMsg += '\n{} {}\n'.format('Operator:', test.getOperator)
+            # add the test data to thd pdf
+            pdf.multi_cell(w=0, h=13, txt=testDataMsg, border=0, align='L', fill=False )
+            # add the data steps to the pdf
+            for step in test.steps:
+                MakePdfDataStepRow(pdf, step)
+
+            # if there is another section, add a new page
+            # Not needed because graphs get appended to this file
+            # if not options.supressGraphPdf:
+                # pdf.add_page() # use ctor params
+
+    # If not supressed, a page for each graph is added after the definition
+    # and test data pages. Depending on the graph mode, the graph pages are
+    # drawn on the pdf (image and fast), or are separate matplotlib pdfs
+    # appended to it (pdf).
+    graphMode = options.graphMode
+    graphPdfs = []
+
+    # *** Graph data.
+    # We use the graph data of each step to make a plot.
+    if not options.supressGraphPdf:
+        if graphs is None:
+            graphs = [_ParseStepGraph(step) for step in test.steps]
+        for step, grphObject in zip(test.steps, graphs):
+            # graph data for each step
+            graphArgs = dict(tData=grphObject.getAxisData(0),
+                             vData=grphObject.getAxisData(2),
+                             # plot currents in uA
+                             iData=grphObject.getAxisData(1) * 1000.0,
+                             iThreshold=step.currentLimit * 1000.0,
+                             iMax=step.measuredCurrent * 1000.0,
+                             title=plotTitle + ' Step ' + str(step.stepNumber))
+            if graphMode == GRAPH_MODE_FAST:
+                # drawn on the page, no matplotlib
+                with Phase('drawTvsVandI'):
+                    DrawTvsVandI(pdf, **graphArgs)
+            elif graphMode == GRAPH_MODE_IMAGE:
+                # matplotlib figure rendered to an image at the dpi
+                with Phase('graphImage'):
+                    fig = MakeTvsVandIFigure(dpi=options.graphDpi, **graphArgs)
+                    AddGraphImage(pdf, 'graph' + str(step.stepNumber),
+                                  FigureToRgb(fig, options.graphDpi))
+            else:
+                # matplotlib pdf, made in memory
+                with Phase('plotTvsVandI'):
+                    graphPdf = BytesIO()
+                    plotVI(showPlot=False, fileName=graphPdf, **graphArgs)
+                    graphPdfs.append(graphPdf.getvalue())
+
+    # The pdf, with the graphs (if any) after the data pages.
+    with Phase('pdfOutput'):
+        pdfData = PdfBytes(pdf)
+    return MergePdf([pdfData] + graphPdfs)
+
+# Return the graph of a step, parsed (see Glp2TestDataStep getGraph) as the
+# graphParse phase of the run profile.
+def _ParseStepGraph(step, decodeSamples=True):
+    with Phase('graphParse'):
+        graph = step.getGraph(decodeSamples)
+    if graph is not None:
+        Count('graphsParsed')
+        if decodeSamples:
+            Count('graphSamplesParsed', graph.sampleCount)
+    return graph
+
+# Write the csv file of the graph data of a step of a test (Glp2TestData) to
+# outFile (a text file): the step information, then the graph data streamed in
+# csv format straight from the graph, so the whole csv is never made as a
+# string. The csvWriter isn't needed. graph is the graph of the step, if the
+# caller already has it. If not, it is parsed without decoding the samples,
+# which the csv doesn't need.
+def WriteStepCsv(outFile, test, step, graph=None):
+    # Make the csv header
+    testDataMsg = '\n{} {}'.format('Program Name:', test.getTestProgramName)
+    testDataMsg += '\n{} {}'.format('Device S/N:', test.getDeviceNumber)
+    testDataMsg += '\n{} {}'.format('Operator:', test.getOperator)
+    testDataMsg += '\n{} {}'.format('Step:', step.stepNumber)
+    testDataMsg += '\n{} {}'.format('Time Stamp:', step.testTimestamp)
+    testDataMsg += '\n{}{}{},{}'.format('Current Limit (', step.currentLimitUnit, '):', step.currentLimit)
+    testDataMsg += '\n{}{}{},{}\n\n'.format('Current Max Meas (', step.measuredCurrentUnit, '):', step.measuredCurrent)
+    outFile.write(testDataMsg)
+    if graph is None:
+        graph = _ParseStepGraph(step, decodeSamples=False)
+    WriteGraphDataCsv(outFile, graph)
+
+# Make the report files for one test.
+# test is the test data (Glp2TestData), and testDfn the matching definition
+# (Glp2TestDfn) or None. The files are named from fname (no extension), and
+# plotTitle is used in the graph titles.
+# options has the supressDfnPdf, supressDataPdf, supressGraphPdf,
+# supressGraphCsv, outputFileEncoding, graphMode (one of GRAPH_MODES) and
+# graphDpi (used by the image mode) attributes (e.g. the parsed command line
+# arguments).
+# Messages about the files being written are passed to log.
+def MakeTestReport(test, testDfn, fname, plotTitle, options, log=print):
+    # Parse the graph of each step once, for both the pdf and the csv files.
+    # The samples are only decoded if the graph goes in the pdf.
+    graphs = None
+    if not (options.supressGraphPdf and options.supressGraphCsv):
+        graphs = [_ParseStepGraph(step, decodeSamples=not options.supressGraphPdf)
+                  for step in test.steps]
+    pdfData = MakeTestPdf(test, testDfn, plotTitle, options, log, graphs)
+
+    # Also export the graph data of each step to a csv file, to make it
+    # available for other uses, unless it is suppressed.
+    if not options.supressGraphCsv:
+        for step, graph in zip(test.steps, graphs):
+            cfname = fname + '_Step_' + str(step.stepNumber) + '.csv' # csv file name
+            log('Writing the graph data to a csv file: ' + cfname)
+            # create a new file for writing, deleting any existing version.
+            # The file is closed even if writing fails.
+            try:
+                with Phase('graphCsvWrite'), \
+                     open(cfname, 'w', encoding=options.outputFileEncoding) as outFile:
+                    WriteStepCsv(outFile, test, step, graph)
+            except ValueError as ve:
+                log('ERROR writing the graph data to a csv file.')
+                log(ve)
+
+    # At this point each step has been processed. The graph data
+    # is no longer needed, so let it go.
+    if not (options.supressGraphPdf and options.supressGraphCsv):
+        test.releaseGraphData()
+
+    # Write the pdf file.
+    log('Writing the pdf file: ' + fname + '.pdf')
+    WritePdf(fname + '.pdf', [pdfData])
+    Count('reports')
+
+# The jobs and options of the report being made, for the worker processes.
+# They are set before the workers are started, and the workers are forked, so
+# each worker has them without them being pickled.
+_workerJobs = None
+_workerOptions = None
+
+# Make the report files for a job (see MakeTestReports) and return the messages
+# and the error message (None if successful). Exceptions are caught here so the
+# messages written before the error are not lost.
+def _MakeJobReport(job, options):
+    messages = []
+    try:
+        MakeTestReport(*job, options, log=messages.append)
+        return messages, None
+    except Exception:
+        return messages, traceback.format_exc()
+
+# Make the report files for the job with the index, in a worker process.
+def _MakeWorkerJobReport(jobIdx):
+    return _MakeJobReport(_workerJobs[jobIdx], _workerOptions)
+
+# Make the report files for a number of tests.
+# jobs is a list of (test, testDfn, fname, plotTitle) tuples, and options the
+# options (see MakeTestReport).
+# The tests are made in parallel by a pool of worker processes when workers is
+# more than one (None means one per cpu). Like LoadTestDataFiles, the workers
+# are started with fork, and if fork is not available the tests are made one
+# after the other.
+# The messages and progress are passed to log in test order. Return a list of
+# the indexes of the jobs that failed. The phases and counts of the workers are
+# added to the run profile, if there is one (see Glp2Profile).
+def MakeTestReports(jobs, options, workers=1, log=print):
+    global _workerJobs, _workerOptions
+    jobs = list(jobs)
+    if workers is None:
+        workers = cpu_count() or 1
+    workers = min(workers, len(jobs))
+    failed = []
+
+    # Log the messages, progress and error of a job
+    def logJob(jobIdx, messages, error):
+        for message in messages:
+            log(message)
+        fname = jobs[jobIdx][2]
+        if error is not None:
+            failed.append(jobIdx)
+            log('ERROR: Unable to make the report for ' + fname + '. Continuing with the next test.')
+            log(error)
+        else:
+            log('Report {} of {} done: {}'.format(jobIdx + 1, len(jobs), fname))
+
+    try:
+        if workers <= 1 or 'fork' not in get_all_start_methods():
+            for jobIdx, job in enumerate(jobs):
+                logJob(jobIdx, *_MakeJobReport(job, options))
+        else:
+            _workerJobs, _workerOptions = jobs, options
+            with ProcessPoolExecutor(max_workers=workers,
+                                     mp_context=get_context('fork')) as executor:
+                futures = [executor.submit(RunProfiled, _MakeWorkerJobReport, jobIdx)
+                           for jobIdx in range(len(jobs))]
+                for jobIdx, future in enumerate(futures):
+                    try:
+                        logJob(jobIdx, *ProfiledResult(future))
+                    except Exception:
+                        # e.g. a worker process ended unexpectedly
+                        logJob(jobIdx, [], traceback.format_exc())
+                    # The worker is done with the graph data, so this process
+                    # can let it go too.
+                    jobs[jobIdx][0].releaseGraphData()
+    finally:
+        _workerJobs, _workerOptions = None, None
+    return failed
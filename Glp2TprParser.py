@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Glp2TprParser.py
+#
+# A reader for the test definition files (*.TPR) made by the Schleich tester.
+# These files use a format that is like a *.INI config file:
+#   [General Data]
+#   Name of programmer=
+#   GUID=3c9cd213-0433-4459-93dc-61cab3c6793d
+#
+#   [TestStep1]
+#   StepMethod=24
+#   CurrentRange=%%136
+#   ...
+# They used to be read with configparser, which is much more general than is
+# needed, and slow for a large library of definitions. This reads the file in
+# a single pass, and returns the sections as a dictionary:
+#   {section name: {option name: raw value, ...}, ...}
+# in file order. The results match what configparser gives for these files:
+#   - option names are lower case, and whitespace around names and values is
+#     removed
+#   - '=' or ':' separates the name and value (whichever comes first)
+#   - lines starting with '#' or ';' are comments, and blank lines are skipped
+#   - an indented line continues the value of the option above it
+# The values are raw, like configparser.items(section, raw=True). The tester
+# writes a '%' as '%%' (configparser interpolation), so use TprValue to get the
+# value the way configparser would return it.
+#
+# Unlike configparser, a repeated section or option is not an error. The
+# options are merged into the first section, and the last value of an option
+# is the one kept.
+#
+# imports
+import Glp2Constants as constants
+
+# Return a value the way configparser (BasicInterpolation) does: '%%' is a '%'.
+def TprValue(rawValue):
+    if rawValue is None or '%' not in rawValue:
+        return rawValue
+    return rawValue.replace('%%', '%')
+
+# Parse the lines (any iterable of strings) of a definition, and return the
+# sections (see above). If stopAfter is a section name, parsing stops at the
+# first section header after that section, so the rest of the lines are not
+# read (e.g. to get just the general section from the top of a file).
+def ParseTpr(lines, stopAfter=None):
+    sections = {}
+    options = None      # options of the current section
+    optionName = None   # last option, for continuation lines
+    sectionName = None
+    for line in lines:
+        stripped = line.strip()
+        if not stripped or stripped[0] in '#;':
+            continue # blank or comment
+        if stripped[0] == '[' and stripped[-1] == ']':
+            if stopAfter is not None and sectionName == stopAfter:
+                break
+            sectionName = stripped[1:-1]
+            options = sections.setdefault(sectionName, {})
+            optionName = None
+            continue
+        if options is None:
+            continue # before the first section; configparser would fail here
+        if optionName is not None and line[:1].isspace():
+            # an indented line continues the value of the option above
+            options[optionName] += '\n' + stripped
+            continue
+        # split at the first '=' or ':'
+        eqPos = stripped.find('=')
+        colonPos = stripped.find(':')
+        if eqPos < 0 or (0 <= colonPos < eqPos):
+            eqPos = colonPos
+        if eqPos < 0:
+            optionName = None
+            continue # not an option line
+        optionName = stripped[:eqPos].rstrip().lower()
+        options[optionName] = stripped[eqPos + 1:].lstrip()
+    return sections
+
+# Read a definition file and return the sections (see ParseTpr). The file is
+# only read as far as needed when stopAfter is used. Exceptions from opening or
+# decoding the file (e.g. OSError, UnicodeError) are passed on.
+def ReadTpr(fileName, fileEncoding='UTF-16', stopAfter=None):
+    with open(fileName, encoding=fileEncoding) as tprFile:
+        return ParseTpr(tprFile, stopAfter)
+
+# Return the number of steps in the sections: TestStep1, TestStep2, ... are
+# counted until one isn't found.
+def CountTprSteps(sections, sectionPrefix=constants.DFN_STEP_SECTION_PREFIX):
+    numOfSteps = 0
+    while sectionPrefix + str(numOfSteps + 1) in sections:
+        numOfSteps += 1
+    return numOfSteps
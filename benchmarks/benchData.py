@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# benchData.py
+#
+# Synthetic test data used by the benchmark scripts in this directory.
+# The rows mimic the layout of a Schleich GLP2-ce archive file (*.csv): a
+# header row followed by one row per test step, with the columns at the
+# zero based positions the Glp2TestData and Glp2TestDataStep objects expect.
+# Values are deterministic (seeded) so runs are comparable.
+#
+# imports
+import csv
+import random
+import uuid
+
+COLUMN_COUNT = 80
+PROGRAM_GUID = '3c9cd213-0433-4459-93dc-61cab3c6793d'
+GRAPH_AXES = ('t\\s\\0\\0\\3.999999\\0.00|'
+              '%%968\\mA\\-65536\\0\\0.525\\0.000|'
+              '%%740\\V\\-16776961\\0\\525\\0')
+
+# Return a graph data string (column 76) with the specified number of samples.
+def MakeGraphStr(samples, rnd=None):
+    rnd = rnd if rnd is not None else random.Random(0)
+    sampleStr = ''.join('{:.2f}|{:.3f}|{}\\'.format(i * 0.1, rnd.random() / 1000.0,
+                                                   500 + i % 7)
+                        for i in range(samples))
+    return '|#GR#|{<' + GRAPH_AXES + '>' + sampleStr + '}'
+
+# Return the header row.
+def MakeHeader():
+    return ['Col{}'.format(col) for col in range(COLUMN_COUNT)]
+
+# Return a list of rows (header first) for tests * steps rows of data.
+# Rows of a test are contiguous, as the tester writes them.
+def MakeRows(tests, steps, samples=30, seed=1):
+    rnd = random.Random(seed)
+    graphStr = MakeGraphStr(samples, rnd)
+    rows = [MakeHeader()]
+    for test in range(tests):
+        testGuid = str(uuid.UUID(int=rnd.getrandbits(128)))
+        for step in range(1, steps + 1):
+            row = [''] * COLUMN_COUNT
+            row[0] = testGuid
+            row[1] = str(uuid.UUID(int=rnd.getrandbits(128)))
+            row[2] = str(step)
+            row[4] = '24'
+            row[6] = '1.000,0'
+            row[7] = 'V'
+            row[8] = '998,5'
+            row[9] = 'V'
+            row[10] = '0,500'
+            row[11] = 'mA'
+            row[12] = '0,0{}'.format(rnd.randint(10, 99))
+            row[13] = 'mA'
+            row[20] = 'Step {} comment'.format(step)
+            row[25] = 'sampleTestDfn1'
+            row[27] = 'operator'
+            row[30] = '17.01.2019 10:{:02d}:00'.format(step % 60)
+            row[31] = 'DEV{:05d}'.format(test)
+            row[49] = PROGRAM_GUID
+            row[76] = graphStr
+            rows.append(row)
+    return rows
+
+# Write rows to a file the same way the tester does: UTF-16, ';' delimited.
+def WriteCsv(fileName, rows, encoding='UTF-16'):
+    with open(fileName, 'w', encoding=encoding, newline='') as outFile:
+        csv.writer(outFile, delimiter=';', lineterminator='\r\n').writerows(rows)
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# benchGraphCsv.py
+#
+# Time writing the graph data of a step to a csv file, and the peak memory used
+# (tracemalloc) on top of the graph itself. The graph is streamed to the file
+# (WriteGraphDataCsv). The previous approach (the whole csv made as one string
+# by concatenating value by value, then written) is timed alongside for
+# comparison. The files are checked to be the same.
+#
+# Usage: python benchmarks/benchGraphCsv.py [samples]   (default 100000)
+#
+# imports
+import filecmp
+import os
+import sys
+import tempfile
+import tracemalloc
+from time import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from Glp2GraphData import Glp2GraphData
+from Glp2Functions import MakeGraphDataCsvHeader, WriteGraphDataCsv
+from benchData import MakeGraphStr
+
+# The previous approach: concatenate the values into one string.
+def Previous(graph, fileName):
+    rStr = ''
+    for row in graph.axesData:
+        for value in row:
+            rStr += value + ','
+        rStr = rStr[:-1] + '\n'
+    outFile = open(fileName, 'w', encoding='UTF-8')
+    outFile.write(MakeGraphDataCsvHeader(graph.axisDefinitions) + rStr)
+    outFile.close()
+
+def Current(graph, fileName):
+    with open(fileName, 'w', encoding='UTF-8') as outFile:
+        WriteGraphDataCsv(outFile, graph)
+
+# Return the time, and the peak memory from a second run (tracing memory slows
+# the run down, so it is not timed).
+def Measure(func, graphStr, fileName):
+    graph = Glp2GraphData(graphStr)
+    start = perf_counter()
+    func(graph, fileName)
+    elapsed = perf_counter() - start
+    graph = Glp2GraphData(graphStr)
+    tracemalloc.start()
+    func(graph, fileName)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+def main():
+    samples = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    graphStr = MakeGraphStr(samples)
+    print('{} samples, {:.1f} MB graph string'.format(samples, len(graphStr) / 1e6))
+    with tempfile.TemporaryDirectory() as tmpDir:
+        previousFile = os.path.join(tmpDir, 'previous.csv')
+        currentFile = os.path.join(tmpDir, 'current.csv')
+        previous, previousPeak = Measure(Previous, graphStr, previousFile)
+        print('{:20} {:8.3f} s  {:8.1f} MB peak'.format('concatenated string', previous,
+                                                       previousPeak / 1e6))
+        current, currentPeak = Measure(Current, graphStr, currentFile)
+        print('{:20} {:8.3f} s  {:8.1f} MB peak  ({:.1f}x)'.format('streamed', current,
+                                                                  currentPeak / 1e6,
+                                                                  previous / current))
+        if not filecmp.cmp(previousFile, currentFile, shallow=False):
+            print('ERROR: The csv files are different.')
+
+if __name__ == '__main__':
+    main()
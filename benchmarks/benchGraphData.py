@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# benchGraphData.py
+#
+# Time Glp2GraphData on long (soak test) graphs. The work timed is what the
+# report does for each step: parse the graph, get the time, current and voltage
+# axes, scale the current to uA, and get the axis min and max. The previous
+# approach (tuples of strings, float() over every sample on every call) is
+# timed alongside for comparison.
+#
+# Usage: python benchmarks/benchGraphData.py [samples]   (default 100000)
+#
+# imports
+import os
+import sys
+from time import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import numpy as np
+from Glp2GraphData import Glp2GraphData
+from benchData import MakeGraphStr
+
+# The previous approach: split into tuples of strings, then convert on every call.
+def Previous(graphStr):
+    posEoax = graphStr.find('>')
+    posEod = graphStr.find('}')
+    axisData = tuple(tuple(sample.split('|'))
+                     for sample in graphStr[posEoax + 1:posEod].split('\\')[:-1])
+    getAxisData = lambda axis: tuple([float(samples[axis]) for samples in axisData])
+    tData = getAxisData(0)
+    vData = getAxisData(2)
+    iData = tuple(i * 1000.0 for i in getAxisData(1))
+    min([float(samples[1]) for samples in axisData])
+    max([float(samples[1]) for samples in axisData])
+    return tData, vData, iData
+
+def Current(graphStr, dtype):
+    graph = Glp2GraphData(graphStr, dtype)
+    tData = graph.getAxisData(0)
+    vData = graph.getAxisData(2)
+    iData = graph.getAxisData(1) * 1000.0
+    graph.getAxisDataMin(1)
+    graph.getAxisDataMax(1)
+    return tData, vData, iData
+
+def TimeIt(func, *args, repeat=3):
+    best = None
+    for run in range(repeat):
+        start = perf_counter()
+        func(*args)
+        elapsed = perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main():
+    samples = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    graphStr = MakeGraphStr(samples)
+    print('{} samples, {:.1f} MB graph string'.format(samples, len(graphStr) / 1e6))
+    previous = TimeIt(Previous, graphStr)
+    print('{:22} {:8.3f} s'.format('previous', previous))
+    for label, dtype in (('Glp2GraphData float64', np.float64),
+                         ('Glp2GraphData float32', np.float32)):
+        current = TimeIt(Current, graphStr, dtype)
+        print('{:22} {:8.3f} s  ({:.1f}x)'.format(label, current, previous / current))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# benchGraphExport.py
+#
+# Compare getting the graph samples of a batch of tests to an analysis job:
+#   csv     a graph csv file per step (as the report writes them), read back
+#           one file at a time
+#   export  one columnar file of all the samples (ExportGraphData), loaded in
+#           one go. npz always, and parquet and feather if pyarrow is installed.
+# The time to write the files and to load all the samples back is shown, and
+# the total size of the files.
+#
+# Usage: python benchmarks/benchGraphExport.py [tests] [samples]   (default 200 5000)
+#
+# imports
+import glob
+import os
+import sys
+import tempfile
+from time import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import numpy as np
+from Glp2Functions import LoadTestDataFile, WriteGraphDataCsv
+from Glp2GraphExport import ExportGraphData
+from benchData import MakeRows, WriteCsv
+
+STEPS_PER_TEST = 5
+
+def WriteCsvs(tests, outDir):
+    for testNum, test in enumerate(tests):
+        for step in test.steps:
+            fileName = os.path.join(outDir, 'T{}_Step_{}.csv'.format(testNum, step.stepNumber))
+            with open(fileName, 'w', encoding='UTF-8') as outFile:
+                WriteGraphDataCsv(outFile, step.getGraph(decodeSamples=False))
+
+def ReadCsvs(outDir):
+    return [np.loadtxt(fileName, delimiter=',', skiprows=1, ndmin=2)
+            for fileName in sorted(glob.glob(os.path.join(outDir, '*.csv')))]
+
+def ReadExport(fileName):
+    if fileName.endswith('.npz'):
+        with np.load(fileName) as data:
+            return data['t'], data['i'], data['v'], data['testGuid'][data['step']]
+    import pyarrow.parquet as pq
+    import pyarrow.feather as feather
+    if fileName.endswith('.parquet'):
+        return pq.read_table(fileName)
+    return feather.read_table(fileName, memory_map=True)
+
+def DirSize(path):
+    return sum(os.path.getsize(fileName) for fileName in glob.glob(os.path.join(path, '*')))
+
+def main():
+    testCount = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    samples = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    try:
+        import pyarrow
+        formats = ('.npz', '.parquet', '.feather')
+    except ImportError:
+        formats = ('.npz',)
+    with tempfile.TemporaryDirectory() as tmpDir:
+        dataFile = os.path.join(tmpDir, 'bench.csv')
+        WriteCsv(dataFile, MakeRows(testCount, STEPS_PER_TEST, samples=samples))
+        tests = LoadTestDataFile('bench.csv', dataFile, 'UTF-16', ',')
+        print('{} tests, {} steps, {} samples per step'.format(testCount,
+                                                              testCount * STEPS_PER_TEST, samples))
+        print('{:>10} {:>10} {:>10} {:>10}'.format('format', 'write s', 'load s', 'MB'))
+
+        csvDir = os.path.join(tmpDir, 'csv')
+        os.mkdir(csvDir)
+        start = perf_counter()
+        WriteCsvs(tests, csvDir)
+        written = perf_counter() - start
+        start = perf_counter()
+        ReadCsvs(csvDir)
+        loaded = perf_counter() - start
+        print('{:>10} {:10.3f} {:10.3f} {:10.1f}'.format('csv', written, loaded,
+                                                        DirSize(csvDir) / 1e6))
+
+        for fileExt in formats:
+            fileName = os.path.join(tmpDir, 'export' + fileExt)
+            start = perf_counter()
+            ExportGraphData(fileName, tests)
+            written = perf_counter() - start
+            start = perf_counter()
+            ReadExport(fileName)
+            loaded = perf_counter() - start
+            print('{:>10} {:10.3f} {:10.3f} {:10.1f}'.format(fileExt[1:], written, loaded,
+                                                            os.path.getsize(fileName) / 1e6))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# benchGraphFigure.py
+#
+# Time making the graph pdf of a batch of steps. The figure is made once and
+# reused for each step, and the lines are decimated to the width of the plot
+# (Glp2GraphFigure, through PlotTvsVandI). The previous approach (pyplot
+# figure, twin axes and styling made and closed for every step, and every
+# sample plotted) is timed alongside for comparison. Each graph is saved to
+# memory, and the average size of a graph pdf is shown.
+#
+# Usage: python benchmarks/benchGraphFigure.py [graphs] [samples]   (default 50 2000)
+#
+# imports
+import os
+import sys
+from io import BytesIO
+from time import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import matplotlib.ticker as ticker
+from bpsMath import oom
+from Glp2GraphData import Glp2GraphData
+from Glp2Functions import PlotTvsVandI
+from benchData import MakeGraphStr
+
+SAVE_ARGS = dict(orientation='portrait', format='pdf', transparent=False,
+                 bbox_inches='tight', pad_inches=0.25)
+
+# The previous approach: a new pyplot figure for each step.
+def PreviousPlot(tData, vData, iData, iThreshold, iMax, title, fileName):
+    fig, vAxis = plt.subplots()
+    fig.suptitle('Current and Voltage versus Time', fontsize=14, fontweight='bold')
+    plt.title(title, fontsize=12, fontweight='bold')
+    vAxis.set_xlabel('time (s)', color='black')
+    vAxis.set_ylabel('voltage (V)', color='blue')
+    vAxis.plot(tData, vData, color='blue', linewidth=0.5, label='V Meas.')
+    iAxis = vAxis.twinx()
+    iAxis.plot(tData, [iMax] * len(tData), color='orange', linewidth=0.75,
+               label='I Meas. Max')
+    iAxis.set_ylabel('current (uA)', color='green')
+    iAxis.plot(tData, iData, color='green', linewidth=0.75, label='I Meas.')
+    if oom(iMax) >= oom(iThreshold):
+        iAxis.plot(tData, [iThreshold] * len(tData), color='red', linewidth=1.0,
+                   linestyle='dotted', label='I Thresh.')
+    vAxis.grid(True, which='both', linewidth=0.5, linestyle='-.')
+    linesVAxis, labelsVAxis = vAxis.get_legend_handles_labels()
+    linesIAxis, labelsIAxis = iAxis.get_legend_handles_labels()
+    iAxis.legend(linesVAxis + linesIAxis, labelsVAxis + labelsIAxis)
+    limsV = vAxis.get_ylim()
+    limsI = iAxis.get_ylim()
+    f = lambda x: limsI[0] + ((x - limsV[0])/(limsV[1] - limsV[0])) * (limsI[1] - limsI[0])
+    iAxis.yaxis.set_major_locator(ticker.FixedLocator(f(vAxis.get_yticks())))
+    fig.savefig(fileName, **SAVE_ARGS)
+    plt.close(fig)
+
+def Previous(graphs, args):
+    size = 0
+    for graph in range(graphs):
+        plotBytes = BytesIO()
+        PreviousPlot(*args, 'Step ' + str(graph), plotBytes)
+        size += len(plotBytes.getvalue())
+    return size
+
+def Current(graphs, args):
+    size = 0
+    for graph in range(graphs):
+        plotBytes = BytesIO()
+        PlotTvsVandI(*args, 'Step ' + str(graph), fileName=plotBytes)
+        size += len(plotBytes.getvalue())
+    return size
+
+def main():
+    graphs = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    samples = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    graph = Glp2GraphData(MakeGraphStr(samples))
+    args = (graph.getAxisData(0), graph.getAxisData(2), graph.getAxisData(1) * 1000.0,
+            0.5, graph.getAxisDataMax(1) * 1000.0)
+    print('{} graphs, {} samples each'.format(graphs, samples))
+    start = perf_counter()
+    size = Previous(graphs, args)
+    previous = perf_counter() - start
+    print('{:22} {:8.3f} s  {:6.1f} ms/graph  {:6.0f} KB/graph'.format(
+        'figure per graph', previous, previous / graphs * 1000.0, size / graphs / 1024.0))
+    start = perf_counter()
+    size = Current(graphs, args)
+    current = perf_counter() - start
+    print('{:22} {:8.3f} s  {:6.1f} ms/graph  {:6.0f} KB/graph  ({:.1f}x)'.format(
+        'reused figure', current, current / graphs * 1000.0, size / graphs / 1024.0,
+        previous / current))
+
+if __name__ == '__main__':
+    main()
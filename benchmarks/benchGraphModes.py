@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# benchGraphModes.py
+#
+# Time the cost of a graph in each report graph mode (see --graphMode):
+#   pdf   - matplotlib figure, saved as a pdf page (merged in later)
+#   image - matplotlib figure, rendered to pixels and embedded in the fpdf page
+#   fast  - drawn on the fpdf page with pdf path operators (no matplotlib)
+# The time includes writing the fpdf document out, so the image mode pays for
+# compressing the pixels.
+#
+# Usage: python benchmarks/benchGraphModes.py [graphs] [samples]   (default 20 2000)
+#
+# imports
+import os
+import sys
+from io import BytesIO
+from time import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import fpdf
+from Glp2GraphData import Glp2GraphData
+from Glp2Functions import PlotTvsVandI, MakeTvsVandIFigure, FigureToRgb, PdfBytes
+from Glp2GraphPdf import AddGraphImage, DrawTvsVandI
+from benchData import MakeGraphStr
+
+DPI = 150
+
+def NewPdf():
+    pdf = fpdf.FPDF()
+    pdf.set_font('Arial', '', 10)
+    return pdf
+
+def PdfMode(graphs, args):
+    graphPdfs = []
+    for graph in range(graphs):
+        plotBytes = BytesIO()
+        PlotTvsVandI(*args, fileName=plotBytes)
+        graphPdfs.append(plotBytes.getvalue())
+    return sum(len(data) for data in graphPdfs)
+
+def ImageMode(graphs, args):
+    pdf = NewPdf()
+    for graph in range(graphs):
+        fig = MakeTvsVandIFigure(*args, dpi=DPI)
+        AddGraphImage(pdf, 'graph' + str(graph), FigureToRgb(fig, DPI))
+    return len(PdfBytes(pdf))
+
+def FastMode(graphs, args):
+    pdf = NewPdf()
+    for graph in range(graphs):
+        pdf.add_page()
+        DrawTvsVandI(pdf, *args)
+    return len(PdfBytes(pdf))
+
+def main():
+    graphs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    samples = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    graph = Glp2GraphData(MakeGraphStr(samples))
+    args = (graph.getAxisData(0), graph.getAxisData(2), graph.getAxisData(1) * 1000.0,
+            0.5, graph.getAxisDataMax(1) * 1000.0, 'Bench')
+    print('{} graphs, {} samples each'.format(graphs, samples))
+    print('{:>6} {:>10} {:>12} {:>10}'.format('mode', 'seconds', 'ms/graph', 'KB'))
+    for mode, func in (('pdf', PdfMode), ('image', ImageMode), ('fast', FastMode)):
+        start = perf_counter()
+        size = func(graphs, args)
+        elapsed = perf_counter() - start
+        print('{:>6} {:10.3f} {:12.1f} {:10.0f}'.format(mode, elapsed,
+                                                       elapsed / graphs * 1000.0,
+                                                       size / 1024.0))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# benchImportTime.py
+#
+# Time how long the report modules take to import (the start up time of the
+# programs), with python -X importtime, and check it has not grown: each
+# module must import within its budget (the best of a few runs), and without
+# the slow libraries that are only imported by the stages that use them
+# (matplotlib, PyPDF2) or not used at all (pandas). The slowest imports are
+# shown, to find what to defer if a budget is exceeded.
+#
+# Exits with 1 if a budget is exceeded or a slow library is imported, so it
+# can be run as a check.
+#
+# Usage: python benchmarks/benchImportTime.py [budget scale] [runs]
+#        (default 1.0 5, e.g. 2.0 doubles the budgets for a slow machine)
+#
+# imports
+import os
+import subprocess
+import sys
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+# module: import time budget (ms). The programs run from main(), so importing
+# them only loads what they need to start.
+BUDGETS = {'glpCreateReport': 400,
+           'glpIngest': 400,
+           'glpWatch': 400,
+           'Glp2ReportPipeline': 400,
+           'Glp2Functions': 200,
+           'Glp2ResultsStore': 200}
+SLOW_LIBRARIES = ('matplotlib', 'PyPDF2', 'pandas')
+SHOW_SLOWEST = 8
+
+# Return the import times of a module and everything it imports, from
+# python -X importtime, as a dictionary of module: cumulative microseconds.
+def ImportTimes(module):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, (REPO_DIR, env.get('PYTHONPATH'))))
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+                            env=env, stderr=subprocess.PIPE, universal_newlines=True)
+    if result.returncode != 0:
+        raise RuntimeError('Unable to import ' + module + ':\n' + result.stderr)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        selfTime, cumulative, name = line[len('import time:'):].split('|')
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+def main():
+    scale = float(sys.argv[1]) if len(sys.argv) > 1 else 1.0
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    failed = False
+    for module, budget in BUDGETS.items():
+        # the best run, so a busy machine does not fail the check
+        times = min((ImportTimes(module) for run in range(runs)),
+                    key=lambda runTimes: runTimes[module])
+        importMs = times[module] / 1000
+        slow = sorted(name for name in times if name.split('.')[0] in SLOW_LIBRARIES)
+        status = 'ok'
+        if importMs > budget * scale:
+            status = 'OVER BUDGET'
+            failed = True
+        if slow:
+            status = 'SLOW IMPORTS'
+            failed = True
+        print('{:24} {:8.1f} ms  (budget {:.0f} ms)  {}'.format(module, importMs,
+                                                             budget * scale, status))
+        if status != 'ok':
+            for name in slow:
+                print('    imports ' + name)
+            for name, cumulative in sorted(times.items(), key=lambda item: -item[1])[1:SHOW_SLOWEST]:
+                print('    {:40} {:8.1f} ms'.format(name, cumulative / 1000))
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# benchIncremental.py
+#
+# Time a run over a growing archive of data files, full and incremental (see
+# Glp2ReportManifest): reading the files, and making the reports (fast graph
+# mode, no csv files). For the incremental run, all the tests are in the
+# manifest but the ones added since the last run, so only those are made into
+# test objects and reports. Every file still has to be read, so the reading
+# costs about the same; the reports are what is saved.
+#
+# Usage: python benchmarks/benchIncremental.py [files] [tests per file] [new tests] [samples]
+#        (default 10 20 5 2000)
+#
+# imports
+import os
+import sys
+import tempfile
+from argparse import Namespace
+from time import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from Glp2Functions import LoadTestDataFile
+from Glp2TestReport import MakeTestReports, GRAPH_MODE_FAST
+from benchData import MakeRows, WriteCsv
+
+STEPS_PER_TEST = 3
+OPTIONS = Namespace(supressDfnPdf=False, supressDataPdf=False, supressGraphPdf=False,
+                    supressGraphCsv=True, outputFileEncoding='UTF-8',
+                    graphMode=GRAPH_MODE_FAST, graphDpi=150)
+
+# Return the time to read the files, the time to make the reports, and the
+# tests reported.
+def Run(dataFiles, skipTests, outDir):
+    start = perf_counter()
+    tests = [test for fileName, filePath in dataFiles
+             for test in LoadTestDataFile(fileName, filePath, 'UTF-16', ',', None, True,
+                                          skipTests)]
+    read = perf_counter() - start
+    jobs = [(test, None, os.path.join(outDir, '{}_Test_{}'.format(
+                 os.path.splitext(test.fileName)[0], test.testInstanceId + 1)), 'Test')
+            for test in tests]
+    start = perf_counter()
+    MakeTestReports(jobs, OPTIONS, log=lambda message: None)
+    return read, perf_counter() - start, tests
+
+def main():
+    fileCount = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    testCount = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    newCount = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+    samples = int(sys.argv[4]) if len(sys.argv) > 4 else 2000
+    with tempfile.TemporaryDirectory() as tmpDir:
+        dataFiles = []
+        for fileNum in range(fileCount):
+            fileName = 'P{}.csv'.format(fileNum)
+            filePath = os.path.join(tmpDir, fileName)
+            WriteCsv(filePath, MakeRows(testCount, STEPS_PER_TEST, samples=samples,
+                                        seed=fileNum))
+            dataFiles.append((fileName, filePath))
+        print('{} files, {} tests, {} new'.format(fileCount, fileCount * testCount, newCount))
+        print('{:16} {:>8} {:>10} {:>8}'.format('', 'read s', 'reports s', 'tests'))
+
+        read, reported, tests = Run(dataFiles, {}, tmpDir)
+        full = read + reported
+        print('{:16} {:8.3f} {:10.3f} {:8}'.format('full run', read, reported, len(tests)))
+        # The manifest after the last run: every test but the last newCount
+        # tests, which were added since.
+        skipTests = {(test.fileName, test.getTestGuid): test.contentDigest
+                     for test in tests[:len(tests) - newCount]}
+        read, reported, newTests = Run(dataFiles, skipTests, tmpDir)
+        print('{:16} {:8.3f} {:10.3f} {:8}  ({:.1f}x)'.format('incremental run', read, reported,
+                                                             len(newTests),
+                                                             full / (read + reported)))
+        if ([test.getTestGuid for test in newTests] !=
+                [test.getTestGuid for test in tests[len(tests) - newCount:]]):
+            print('ERROR: The incremental run did not find the new tests.')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# benchLoadTestDataFiles.py
+#
+# Time LoadTestDataFiles loading a directory of synthetic archive files with
+# an increasing number of worker processes, to show how loading scales with
+# the number of cpus. The tests are checked to come back in the same order
+# with every worker count.
+#
+# Usage: python benchmarks/benchLoadTestDataFiles.py [files] [testsPerFile] [maxWorkers]
+#        (default 16 files, 400 tests per file, up to one worker per cpu)
+#
+# imports
+import os
+import sys
+import tempfile
+from time import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from Glp2Functions import LoadTestDataFiles
+from benchData import MakeRows, WriteCsv
+
+STEPS_PER_TEST = 5
+
+def LoadAll(files, workers):
+    tests = []
+    for fileName, getTests in LoadTestDataFiles(files, 'UTF-16', ',', workers=workers):
+        tests.extend(getTests())
+    return tests
+
+def main():
+    fileCount = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    testsPerFile = int(sys.argv[2]) if len(sys.argv) > 2 else 400
+    cpus = os.cpu_count() or 1
+    maxWorkers = int(sys.argv[3]) if len(sys.argv) > 3 else cpus
+    with tempfile.TemporaryDirectory() as tmpDir:
+        files = []
+        for fileNum in range(fileCount):
+            fileName = 'bench_{}.csv'.format(fileNum)
+            WriteCsv(os.path.join(tmpDir, fileName),
+                     MakeRows(testsPerFile, STEPS_PER_TEST, samples=200, seed=fileNum))
+            files.append((fileName, os.path.join(tmpDir, fileName)))
+        print('{} files, {} tests per file, {} cpus'.format(fileCount, testsPerFile, cpus))
+        print('{:>8} {:>10} {:>8}'.format('workers', 'seconds', 'speedup'))
+        baseline = None
+        order = None
+        workers = 1
+        while workers <= maxWorkers:
+            start = perf_counter()
+            tests = LoadAll(files, workers)
+            elapsed = perf_counter() - start
+            testOrder = [(test.fileName, test.testInstanceId, test.getTestGuid) for test in tests]
+            if order is None:
+                baseline, order = elapsed, testOrder
+            elif testOrder != order:
+                print('ERROR: The tests are in a different order with {} workers.'.format(workers))
+            print('{:8d} {:10.3f} {:7.1f}x'.format(workers, elapsed, baseline / elapsed))
+            workers *= 2
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# benchMakeTestList.py
+#
+# Time MakeTestList on synthetic archive files of increasing size to show the
+# single pass grouping scales linearly with the number of rows. The previous
+# approach (rescan every row once per test GUID) is timed alongside for the
+# smaller sizes for comparison.
+#
+# Usage: python benchmarks/benchMakeTestList.py [rows]   (default 50000)
+#
+# imports
+import csv
+import os
+import sys
+import tempfile
+from time import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from Glp2Functions import MakeTestList, GroupRowsByTestGuid
+from benchData import MakeRows, WriteCsv
+
+STEPS_PER_TEST = 5
+
+# The grouping as it was done before: collect the unique ids, then rescan
+# all the rows once for every id. O(tests x rows).
+def RescanGroup(rows):
+    testIds = list(dict.fromkeys(row[0] for row in rows if len(row) >= 1))
+    return [[row for row in rows if len(row) >= 1 and row[0] == id] for id in testIds]
+
+def TimeIt(func, *args):
+    start = perf_counter()
+    func(*args)
+    return perf_counter() - start
+
+def main():
+    maxRows = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    print('{:>8} {:>7} {:>14} {:>12} {:>12} {:>14}'.format('rows', 'tests',
+          'MakeTestList s', 'us / row', 'group s', 'rescan s'))
+    with tempfile.TemporaryDirectory() as tmpDir:
+        for rows in (maxRows // 8, maxRows // 4, maxRows // 2, maxRows):
+            tests = max(rows // STEPS_PER_TEST, 1)
+            fileName = os.path.join(tmpDir, 'bench_{}.csv'.format(rows))
+            WriteCsv(fileName, MakeRows(tests, STEPS_PER_TEST))
+            with open(fileName, mode='r', encoding='UTF-16') as dataCsvFile:
+                fileRows = list(csv.reader(dataCsvFile, delimiter=';'))
+            makeTime = TimeIt(MakeTestList, fileName, fileRows, ',')
+            groupTime = TimeIt(GroupRowsByTestGuid, fileRows[1:])
+            # The rescan grows with tests x rows, so only time it where it
+            # finishes in a reasonable amount of time.
+            if rows <= maxRows // 4:
+                rescan = '{:14.3f}'.format(TimeIt(RescanGroup, fileRows[1:]))
+            else:
+                rescan = '{:>14}'.format('(skipped)')
+            print('{:8d} {:7d} {:14.3f} {:12.2f} {:12.4f} {}'.format(rows, tests,
+                  makeTime, makeTime / rows * 1e6, groupTime, rescan))
+
+if __name__ == '__main__':
+    main()
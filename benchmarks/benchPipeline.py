@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# benchPipeline.py
+#
+# Time each stage of the report pipeline (see Glp2ReportPipeline) over a set
+# of data files, for a first run and then a second run by the same pipeline
+# (what a program making the reports over and over, e.g. a service, does): the
+# modules, the test definition cache and matplotlib are already loaded, so only
+# the work of the run is left. The reports use the fast graph mode, with no
+# csv files. The test definitions are the data/*.TPR samples.
+#
+# Usage: python benchmarks/benchPipeline.py [files] [tests per file] [samples]
+#        (default 5 20 2000)
+#
+# imports
+import glob
+import os
+import shutil
+import sys
+import tempfile
+from time import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from Glp2ReportPipeline import Glp2ReportPipeline, ReportOptions, Glp2ReportInputs
+from Glp2TestReport import GRAPH_MODE_FAST
+from benchData import MakeRows, WriteCsv
+
+STEPS_PER_TEST = 3
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
+CONFIG = """[Paths]
+common_dir: {}
+data_dir: Archiv/
+test_dfn_dir: DBLib/
+cache_dir: {}
+"""
+
+# Do the stages, and return the time of each one as a list of (stage, seconds).
+def Run(pipeline, configFile):
+    times = []
+    def timed(stage, func, *args):
+        start = perf_counter()
+        result = func(*args)
+        times.append((stage, perf_counter() - start))
+        return result
+    reportConfig = timed('loadConfig', pipeline.loadConfig, configFile)
+    sources = timed('discover', pipeline.discover, reportConfig)
+    testDfns = timed('loadDfns', pipeline.loadDfns, reportConfig, sources)
+    tests = timed('loadTests', pipeline.loadTests, reportConfig, sources, True)
+    catalog = timed('associate', pipeline.associate, Glp2ReportInputs(testDfns, tests))
+    jobs = timed('makeReportJobs', pipeline.makeReportJobs, catalog)
+    timed('render', pipeline.render, jobs)
+    return times
+
+def main():
+    fileCount = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    testCount = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    samples = int(sys.argv[3]) if len(sys.argv) > 3 else 2000
+    with tempfile.TemporaryDirectory() as tmpDir:
+        for subDir in ('Archiv', 'DBLib', 'out'):
+            os.makedirs(os.path.join(tmpDir, subDir))
+        for fileNum in range(fileCount):
+            WriteCsv(os.path.join(tmpDir, 'Archiv', 'P{}.csv'.format(fileNum)),
+                     MakeRows(testCount, STEPS_PER_TEST, samples=samples, seed=fileNum))
+        for tprFile in glob.glob(os.path.join(DATA_DIR, '*.TPR')):
+            shutil.copy(tprFile, os.path.join(tmpDir, 'DBLib'))
+        configFile = os.path.join(tmpDir, 'config.ini')
+        with open(configFile, 'w') as cfgFile:
+            cfgFile.write(CONFIG.format(tmpDir, os.path.join(tmpDir, 'cache')))
+        print('{} files, {} tests per file, {} samples per step'.format(
+            fileCount, testCount, samples))
+
+        # the reports are written to the current directory
+        cwd = os.getcwd()
+        os.chdir(os.path.join(tmpDir, 'out'))
+        try:
+            pipeline = Glp2ReportPipeline(ReportOptions(graphMode=GRAPH_MODE_FAST,
+                                                        supressGraphCsv=True),
+                                          log=lambda message: None)
+            first = Run(pipeline, configFile)
+            second = Run(pipeline, configFile)
+        finally:
+            os.chdir(cwd)
+        print('{:16} {:>10} {:>10}'.format('stage', 'first s', 'second s'))
+        for (stage, firstTime), (secondStage, secondTime) in zip(first, second):
+            print('{:16} {:10.4f} {:10.4f}'.format(stage, firstTime, secondTime))
+        print('{:16} {:10.4f} {:10.4f}'.format('total', sum(t for s, t in first),
+                                               sum(t for s, t in second)))
+
+if __name__ == '__main__':
+    main()
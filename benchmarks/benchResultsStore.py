@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# benchResultsStore.py
+#
+# Compare finding the tests of one device in a set of data files:
+#   csv     read and parse all the data files, and keep the tests of the device
+#   store   look the tests up in the results store (Glp2ResultsStore), and
+#           load them, with and without the graph data
+# The one time cost of putting the files in the store (ingest), and of checking
+# that they have not changed since (what glpIngest.py does on every run), is
+# shown too. Each data file has the same device numbers, so a device has a test
+# in every file.
+#
+# Usage: python benchmarks/benchResultsStore.py [files] [tests per file] [samples]
+#        (default 20 50 2000)
+#
+# imports
+import os
+import sys
+import tempfile
+from time import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from Glp2Functions import LoadTestDataFile
+from Glp2ResultsStore import Glp2ResultsStore
+from benchData import MakeRows, WriteCsv
+
+STEPS_PER_TEST = 3
+DEVICE_NUMBER = 'DEV00007'
+
+def Timed(func, *args, **kwargs):
+    start = perf_counter()
+    result = func(*args, **kwargs)
+    return perf_counter() - start, result
+
+def ParseAll(dataFiles, keepGraphData):
+    return [test for fileName, filePath in dataFiles
+            for test in LoadTestDataFile(fileName, filePath, 'UTF-16', ',', None, keepGraphData)
+            if test.getDeviceNumber == DEVICE_NUMBER]
+
+def Ingest(store, dataFiles):
+    for fileName, filePath in dataFiles:
+        fileStamp = store.fileStamp(filePath)
+        store.ingestTests(filePath, LoadTestDataFile(fileName, filePath, 'UTF-16', ',', None, True),
+                          'UTF-16', ',', fileStamp=fileStamp)
+
+def main():
+    fileCount = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    testCount = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    samples = int(sys.argv[3]) if len(sys.argv) > 3 else 2000
+    with tempfile.TemporaryDirectory() as tmpDir:
+        dataFiles = []
+        for fileNum in range(fileCount):
+            fileName = 'P{}.csv'.format(fileNum)
+            filePath = os.path.join(tmpDir, fileName)
+            WriteCsv(filePath, MakeRows(testCount, STEPS_PER_TEST, samples=samples, seed=fileNum))
+            dataFiles.append((fileName, filePath))
+        print('{} files, {} tests per file, {} steps per test, {} samples per step'.format(
+            fileCount, testCount, STEPS_PER_TEST, samples))
+
+        with Glp2ResultsStore(os.path.join(tmpDir, 'results.sqlite')) as store:
+            ingested, result = Timed(Ingest, store, dataFiles)
+            checked, current = Timed(lambda: all(store.isCurrent(filePath, 'UTF-16', ',')
+                                                  for fileName, filePath in dataFiles))
+            print('{:32} {:8.3f} s'.format('ingest (once)', ingested))
+            print('{:32} {:8.3f} s  (all current: {})'.format('check unchanged', checked, current))
+            print('{:32} {:.1f} MB'.format('store size',
+                                          os.path.getsize(store.dbFile) / 1e6))
+            print()
+            for keepGraphData in (False, True):
+                label = 'with graphs' if keepGraphData else 'no graphs'
+                parsed, parsedTests = Timed(ParseAll, dataFiles, keepGraphData)
+                print('{:32} {:8.3f} s  {} tests'.format('csv parse all, ' + label, parsed,
+                                                         len(parsedTests)))
+                loaded, loadedTests = Timed(store.loadTests, deviceNumber=DEVICE_NUMBER,
+                                            keepGraphData=keepGraphData)
+                print('{:32} {:8.3f} s  {} tests  ({:.0f}x)'.format(
+                    'store load, ' + label, loaded, len(loadedTests), parsed / loaded))
+                if (sorted((test.getTestGuid, [tuple(row) for row in test.data])
+                           for test in parsedTests) !=
+                        sorted((test.getTestGuid, [tuple(row) for row in test.data])
+                               for test in loadedTests)):
+                    print('ERROR: The tests from the store are different.')
+            found, foundTests = Timed(store.findTests, deviceNumber=DEVICE_NUMBER)
+            print('{:32} {:8.3f} s  {} tests'.format('store find (no load)', found,
+                                                     len(foundTests)))
+
+if __name__ == '__main__':
+    main()
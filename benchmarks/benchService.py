@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# benchService.py
+#
+# Load test of the report service (glpServe.py, see Glp2ReportService): start
+# the service on a set of data files, and time requests for the report pdfs
+# (and step graph csvs) of random tests from a number of clients at the same
+# time. Each client keeps its connection open. The latency (p50, p99 and max)
+# and the requests per second are shown for each number of clients. The time
+# to start the service (load the files and start the renderers) is shown too,
+# which is about what each request would cost as a program of its own.
+#
+# Usage: python benchmarks/benchService.py [files] [tests per file] [requests]
+#                                          [renderers] [graph mode]
+#        (default 4 10 200 2 fast)
+#
+# imports
+import glob
+import http.client
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from urllib.parse import urlsplit, quote
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from benchData import MakeRows, WriteCsv
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+DATA_DIR = os.path.join(REPO_DIR, 'data')
+STEPS_PER_TEST = 3
+SAMPLES = 2000
+CLIENTS = (1, 4, 8)
+CONFIG = """[Paths]
+common_dir: {}
+data_dir: Archiv/
+test_dfn_dir: DBLib/
+cache_dir: {}
+"""
+
+# Return the value at the percent (0 to 100) of the sorted values.
+def Percentile(values, percent):
+    return values[min(len(values) - 1, int(len(values) * percent / 100.0))]
+
+# Make the requests (paths) from the number of clients, and return the
+# latency of each one (s) and the total time.
+def LoadTest(host, port, paths, clients):
+    local = threading.local()
+    def get(path):
+        if not hasattr(local, 'connection'):
+            local.connection = http.client.HTTPConnection(host, port)
+        start = perf_counter()
+        local.connection.request('GET', path)
+        response = local.connection.getresponse()
+        data = response.read()
+        latency = perf_counter() - start
+        if response.status != 200:
+            raise RuntimeError('{} {}: {}'.format(path, response.status, data[:200]))
+        return latency
+    start = perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        latencies = list(executor.map(get, paths))
+    return latencies, perf_counter() - start
+
+def main():
+    fileCount = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    testCount = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    requestCount = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+    renderers = int(sys.argv[4]) if len(sys.argv) > 4 else 2
+    graphMode = sys.argv[5] if len(sys.argv) > 5 else 'fast'
+    with tempfile.TemporaryDirectory() as tmpDir:
+        for subDir in ('Archiv', 'DBLib'):
+            os.makedirs(os.path.join(tmpDir, subDir))
+        for fileNum in range(fileCount):
+            WriteCsv(os.path.join(tmpDir, 'Archiv', 'P{}.csv'.format(fileNum)),
+                     MakeRows(testCount, STEPS_PER_TEST, samples=SAMPLES, seed=fileNum))
+        for tprFile in glob.glob(os.path.join(DATA_DIR, '*.TPR')):
+            shutil.copy(tprFile, os.path.join(tmpDir, 'DBLib'))
+        configFile = os.path.join(tmpDir, 'config.ini')
+        with open(configFile, 'w') as cfgFile:
+            cfgFile.write(CONFIG.format(tmpDir, os.path.join(tmpDir, 'cache')))
+        print('{} files, {} tests per file, {} samples per step, {} renderers, {} graph mode'.format(
+            fileCount, testCount, SAMPLES, renderers, graphMode))
+
+        start = perf_counter()
+        service = subprocess.Popen([sys.executable, '-u', os.path.join(REPO_DIR, 'glpServe.py'),
+                                    '-c', configFile, '-p', '0', '-w', str(renderers),
+                                    '-gm', graphMode, '-pi', '0'],
+                                   stdout=subprocess.PIPE, universal_newlines=True)
+        try:
+            url = None
+            for line in service.stdout:
+                if line.startswith('Serving on: '):
+                    url = urlsplit(line[len('Serving on: '):].strip())
+                    break
+            if url is None:
+                print('ERROR: The service did not start.')
+                return
+            print('{:24} {:8.3f} s'.format('service start', perf_counter() - start))
+
+            connection = http.client.HTTPConnection(url.hostname, url.port)
+            connection.request('GET', '/tests')
+            tests = json.loads(connection.getresponse().read())
+            connection.close()
+            rnd = random.Random(1)
+            picks = [rnd.choice(tests) for request in range(requestCount)]
+            pdfPaths = ['/tests/{}.pdf?file={}'.format(test['guid'], quote(test['file']))
+                        for test in picks]
+            csvPaths = ['/tests/{}/steps/{}.csv?file={}'.format(test['guid'],
+                                                                rnd.choice(test['steps']),
+                                                                quote(test['file']))
+                        for test in picks]
+
+            print('{:24} {:>8} {:>8} {:>8} {:>8}'.format('', 'p50 ms', 'p99 ms', 'max ms',
+                                                         'req/s'))
+            for name, paths in (('pdf', pdfPaths), ('csv', csvPaths)):
+                for clients in CLIENTS:
+                    latencies, total = LoadTest(url.hostname, url.port, paths, clients)
+                    latencies.sort()
+                    print('{:24} {:8.1f} {:8.1f} {:8.1f} {:8.1f}'.format(
+                        '{}, {} clients'.format(name, clients),
+                        Percentile(latencies, 50) * 1000, Percentile(latencies, 99) * 1000,
+                        latencies[-1] * 1000, len(paths) / total))
+        finally:
+            service.terminate()
+            service.wait()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# benchTestDataStep.py
+#
+# Compare the eagerly decoded, __slots__ based Glp2TestDataStep with the
+# previous implementation, which kept 17 index attributes in a __dict__ and
+# parsed the string value on every property access. The new steps share one
+# column schema (Glp2DataSchema), as they do when made by MakeTestList.
+# Reported are the time to build the steps, the time to read the properties the
+# report uses for each step, and the memory used per step object (not counting
+# the row data, which both share).
+#
+# Usage: python benchmarks/benchTestDataStep.py [steps]   (default 20000)
+#
+# imports
+import os
+import sys
+import tracemalloc
+from time import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from Glp2DataSchema import Glp2DataSchema
+from Glp2TestDataStep import Glp2TestDataStep
+from benchData import MakeRows
+
+# The step object as it was before: indexes stored per object and the values
+# parsed on every access. Only the members used for the comparison are here.
+class LegacyTestDataStep(object):
+    def __init__(self, data=None, header=None, decimalSeparator = ',',
+                 testStepGuidIdx=1, commentsIdx=20, operatorIdx=27,
+                 deviceNumberIdx=31, stepNumberIdx=2, testMethodKeyIdx=4,
+                 nomVoltIdx=6, nomVoltUnitIdx=7, actVoltIdx=8,
+                 actVoltUnitIdx=9, currentLimIdx=10, currentLimUnitIdx=11,
+                 actCurrIdx=12, actCurrUnitIdx=13, timestampIdx=30, graphDataIdx=76):
+        self._dataHeader = tuple(header)
+        self._rawData = tuple(data)
+        self._decimalSeparator = decimalSeparator
+        self._testStepGuidIdx = testStepGuidIdx
+        self._commentsIdx = commentsIdx
+        self._operatorIdx = operatorIdx
+        self._deviceNumberIdx = deviceNumberIdx
+        self._stepNumberIdx = stepNumberIdx
+        self._testMethodKeyIdx = testMethodKeyIdx
+        self._nomVoltIdx = nomVoltIdx
+        self._nomVoltUnitIdx = nomVoltUnitIdx
+        self._actVoltIdx = actVoltIdx
+        self._actVoltUnitIdx = actVoltUnitIdx
+        self._currentLimIdx = currentLimIdx
+        self._currentLimUnitIdx = currentLimUnitIdx
+        self._actCurrIdx = actCurrIdx
+        self._actCurrUnitIdx = actCurrUnitIdx
+        self._timestampIdx = timestampIdx
+        self._graphDataIdx = graphDataIdx
+
+    def _float(self, idx):
+        if self._rawData is not None and idx + 1 <= len(self._rawData):
+            if self._decimalSeparator == ',':
+                return float(self._rawData[idx].replace('.','').replace(',', '.'))
+            else:
+                return float(self._rawData[idx])
+        else:
+            return None
+
+    @property
+    def stepNumber(self):
+        if self._rawData is not None and self._stepNumberIdx + 1 <= len(self._rawData):
+            return int(self._rawData[self._stepNumberIdx])
+        else:
+            return None
+
+    @property
+    def testMethod(self):
+        if self._rawData is not None and self._testMethodKeyIdx + 1 <= len(self._rawData):
+            methodKey = int(self._rawData[self._testMethodKeyIdx])
+        else:
+            return None
+        if 24 == methodKey:
+            return 'HV DC'
+        else:
+            return methodKey
+
+    @property
+    def testTimestamp(self):
+        if self._rawData is not None and self._timestampIdx + 1 <= len(self._rawData):
+            return self._rawData[self._timestampIdx]
+        else:
+            return None
+
+    @property
+    def comments(self):
+        if self._rawData is not None and self._commentsIdx + 1 <= len(self._rawData):
+            return self._rawData[self._commentsIdx]
+        else:
+            return None
+
+    @property
+    def nominalVoltage(self):
+        return self._float(self._nomVoltIdx)
+
+    @property
+    def measuredVoltage(self):
+        return self._float(self._actVoltIdx)
+
+    @property
+    def currentLimit(self):
+        return self._float(self._currentLimIdx)
+
+    @property
+    def measuredCurrent(self):
+        return self._float(self._actCurrIdx)
+
+# Read the properties the way the report does for one step: the pdf data row
+# (MakePdfDataStepRow) and the graph section of the report loop.
+def ReadStep(step):
+    step.stepNumber; step.testMethod; step.testTimestamp; step.comments
+    step.measuredCurrent >= step.currentLimit
+    step.nominalVoltage; step.measuredVoltage
+    step.currentLimit * 1000.0
+    step.measuredCurrent >= step.currentLimit
+    step.measuredCurrent * 1000.0
+    step.stepNumber; step.currentLimit; step.measuredCurrent
+    step.currentLimit * 1000.0; step.measuredCurrent * 1000.0
+    step.stepNumber
+
+# makeStep is called with a row and returns a step object.
+def Measure(makeStep, rows):
+    start = perf_counter()
+    steps = [makeStep(row) for row in rows]
+    buildTime = perf_counter() - start
+    # measure the memory separately, tracemalloc slows things down
+    del steps
+    tracemalloc.start()
+    steps = [makeStep(row) for row in rows]
+    memPerStep = tracemalloc.get_traced_memory()[0] / len(steps)
+    tracemalloc.stop()
+    start = perf_counter()
+    for step in steps:
+        ReadStep(step)
+    readTime = perf_counter() - start
+    return buildTime, readTime, memPerStep
+
+def main():
+    stepCount = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    fileRows = MakeRows(stepCount // 5, 5)
+    # use tuples, as IterTestList passes them, so neither class copies the row
+    header = tuple(fileRows[0])
+    rows = [tuple(row) for row in fileRows[1:]]
+    print('{} steps'.format(len(rows)))
+    print('{:20} {:>10} {:>10} {:>14} {:>12}'.format('', 'build s', 'read s',
+          'read us/step', 'bytes/step'))
+    # the schema is resolved once per file and shared by the steps
+    schema = Glp2DataSchema(header, ',')
+    for label, makeStep in (('previous', lambda row: LegacyTestDataStep(row, header, ',')),
+                            ('Glp2TestDataStep', lambda row: Glp2TestDataStep(row, schema=schema))):
+        buildTime, readTime, memPerStep = Measure(makeStep, rows)
+        print('{:20} {:10.3f} {:10.3f} {:14.2f} {:12.0f}'.format(label, buildTime,
+              readTime, readTime / len(rows) * 1e6, memPerStep))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# benchTestDfn.py
+#
+# Time loading a library of test definitions (*.TPR). The definitions are the
+# data/*.TPR samples scaled up: the step sections are repeated to make longer
+# programs, and the file is copied to make a larger library. The work timed is
+# what the report does with each definition: read it, make the steps, and get
+# the step values. The previous approach (configparser, then convert the option
+# values on every property access) is timed alongside for comparison.
+#
+# Usage: python benchmarks/benchTestDfn.py [files] [steps]   (default 200 40)
+#
+# imports
+import configparser
+import glob
+import os
+import sys
+import tempfile
+from time import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import Glp2Constants as constants
+from Glp2TestDfn import Glp2TestDfn
+from Glp2TprParser import ReadTpr
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
+ENCODING = 'UTF-16'
+
+# Return the text of a definition with the specified number of steps, made from
+# the general section and first step of a sample definition.
+def MakeTprText(sampleFile, steps):
+    sections = ReadTpr(sampleFile, ENCODING)
+    lines = ['[' + constants.DFN_GENERAL_SECTION + ']']
+    lines += [option + '=' + value
+              for option, value in sections[constants.DFN_GENERAL_SECTION].items()]
+    stepOptions = sections[constants.DFN_STEP_SECTION_PREFIX + '1']
+    for step in range(1, steps + 1):
+        lines += [' ', '[' + constants.DFN_STEP_SECTION_PREFIX + str(step) + ']']
+        lines += [option + '=' + value for option, value in stepOptions.items()]
+    return '\r\n'.join(lines) + '\r\n'
+
+# The previous approach: configparser, probing for TestStep1..N, and the step
+# values converted from the option strings on each access.
+def Previous(fileNames):
+    for fileName in fileNames:
+        config = configparser.ConfigParser()
+        config.read(fileName, ENCODING)
+        config[constants.DFN_GENERAL_SECTION][constants.DFN_GENSEC_GUID_OPTNAME]
+        stepNum = 1
+        while config.has_section(constants.DFN_STEP_SECTION_PREFIX + str(stepNum)):
+            stepData = dict(config.items(constants.DFN_STEP_SECTION_PREFIX + str(stepNum)))
+            for optionName in (constants.DFN_STEP_CURR_LIM_OPTNAME,
+                               constants.DFN_STEP_TEST_TIME_OPTNAME,
+                               constants.DFN_STEP_RAMP_TIME_OPTNAME,
+                               constants.DFN_STEP_DLY_TIME_OPTNAME,
+                               constants.DFN_STEP_TEST_VOLT_OPTNAME):
+                float(stepData.get(optionName.lower()))
+            int(stepData.get(constants.DFN_STEP_METHOD_OPTNAME.lower()))
+            int(stepData.get(constants.DFN_STEP_MODE_OPTNAME.lower()))
+            stepNum += 1
+
+def Current(fileNames):
+    for fileName in fileNames:
+        dfn = Glp2TestDfn('bench', fileName, ENCODING)
+        dfn.dfnGuid
+        for step in dfn.steps:
+            step.currentLimit
+            step.testTime
+            step.rampTime
+            step.delayTime
+            step.testVoltage
+            step.stepMethodKey
+            step.stepModeKey
+
+def CurrentLazy(fileNames):
+    for fileName in fileNames:
+        Glp2TestDfn('bench', fileName, ENCODING, lazy=True).dfnGuid
+
+def TimeIt(func, *args, repeat=3):
+    best = None
+    for run in range(repeat):
+        start = perf_counter()
+        func(*args)
+        elapsed = perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main():
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    steps = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    sampleFile = sorted(glob.glob(os.path.join(DATA_DIR, '*.TPR')))[0]
+    with tempfile.TemporaryDirectory() as tmpDir:
+        tprText = MakeTprText(sampleFile, steps)
+        fileNames = []
+        for fileNum in range(files):
+            fileName = os.path.join(tmpDir, 'bench_{}.TPR'.format(fileNum))
+            with open(fileName, 'w', encoding=ENCODING, newline='') as tprFile:
+                tprFile.write(tprText)
+            fileNames.append(fileName)
+        print('{} files, {} steps each'.format(files, steps))
+        previous = TimeIt(Previous, fileNames)
+        print('{:26} {:8.3f} s'.format('configparser', previous))
+        current = TimeIt(Current, fileNames)
+        print('{:26} {:8.3f} s  ({:.1f}x)'.format('Glp2TestDfn', current, previous / current))
+        lazy = TimeIt(CurrentLazy, fileNames)
+        print('{:26} {:8.3f} s  ({:.1f}x)'.format('Glp2TestDfn lazy (general)', lazy,
+                                                  previous / lazy))
+
+if __name__ == '__main__':
+    main()
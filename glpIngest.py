@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# glpIngest.py
+#
+# This program puts the test results from the data files exported by a
+# Schleich GLP2-ce Hi Pot Modular Tester ("tester") in a local results store (a
+# SQLite database, see Glp2ResultsStore). The results can then be looked up, and
+# reports made from them (see the glpCreateReport.py -rs/--resultsStore
+# argument), without reading and parsing all the data files again.
+#
+# **** Program operation
+#   1)  The program will read in a config file, the same as glpCreateReport.py
+#       (-c/--configFile, default config.ini), for the data file path and the
+#       data file column layout ([TestData]), with the report pipeline (see
+#       Glp2ReportPipeline loadConfig). The results store is the file
+#       given by -db/--resultsDb, or results_db in the [Paths] section of the
+#       config file, or results.sqlite in the cache directory (cache_dir).
+#
+#   2)  The data file given by -d/--dataFile, or all the data files (*.csv) in
+#       the data path, are put in the store. Files that have not changed since
+#       they were put in the store are skipped (unless -f/--force is used), so
+#       running this again only reads new or changed files.
+#
+#   3)  If -sn/--deviceNumber is given, the tests of that device in the store
+#       are listed.
+#
+# imports
+from datetime import datetime
+from os.path import join
+import argparse
+
+# user libraries
+# Note: May need PYTHONPATH (set in ~/.profile?) to be set depending
+# on the location of the imported files
+from bpsFile import listFiles
+
+# specialized libraries unlikely to be used elsewhere. These should
+# travel with this file.
+from Glp2Functions import LoadTestDataFiles
+from Glp2ReportPipeline import Glp2ReportPipeline, ReportOptions
+from Glp2ResultsStore import Glp2ResultsStore, ResultsDbFile
+
+# **** argument parsing
+descrStr="""Python program to put the test results from the data export files of
+a Schleich GLP2-ce Hi Pot Modular Tester in a local results store (SQLite)."""
+
+parser = argparse.ArgumentParser(formatter_class=argparse.RawDescriptionHelpFormatter, \
+                                 description=descrStr)
+parser.add_argument('-c', '--configFile', default='config.ini', metavar='', \
+                   help='Config file. Default is config.ini.')
+parser.add_argument('-ce', '--configEncoding', default='UTF-8', metavar='', \
+                   help='Config file encoding. Default is UTF-8.')
+parser.add_argument('-d', '--dataFile', default='', metavar='', \
+                    help='Input data file (Schleich GLP2-ce file, *.csv). If \
+specified, only this data file is put in the store. If not specified, all *.csv files \
+present in the data_dir path specified in the config file are.')
+parser.add_argument('-de', '--dataFileEncoding', default='UTF-16', metavar='', \
+                    help='Data file encoding. Default is UTF-16.')
+parser.add_argument('-dirPrefix', default='', metavar='', \
+                    help='Directory prefix. If specified, this is prepended to \
+the paths specified in the configuration ini file.')
+parser.add_argument('-db', '--resultsDb', default='', metavar='', \
+                    help='Results store (SQLite database file). Default is results_db \
+in the [Paths] section of the config file, or results.sqlite in the cache_dir.')
+parser.add_argument('-f', '--force', action='store_true', default=False, \
+                    help='Put the data files in the store even if they have not changed.')
+parser.add_argument('-sn', '--deviceNumber', default=None, metavar='', \
+                    help='List the tests of this device (serial number) in the store.')
+parser.add_argument('-lw', '--loadWorkers', type=int, default=0, metavar='', \
+                    help='Number of processes used to load the test data files. \
+Default is 0, which is one per cpu.')
+parser.add_argument('-v', '--verbose', action='store_true', default=False, \
+                    help='Verbose output, usually used for troubleshooting.')
+
+def main():
+    args = parser.parse_args()
+
+    print('**** Begin Processing ****')
+    procStart = datetime.now()
+    print('    Process start time: ' + procStart.strftime('%m/%d/%Y %H:%M:%S'))
+
+    # **** Get config info from config file
+    pipeline = Glp2ReportPipeline(ReportOptions(configEncoding=args.configEncoding,
+                                                dataFileEncoding=args.dataFileEncoding))
+    try:
+        reportConfig = pipeline.loadConfig(args.configFile, args.dirPrefix)
+        store = Glp2ResultsStore(ResultsDbFile(reportConfig.config, args.resultsDb))
+    except ValueError as ve:
+        print('ERROR: ' + str(ve) + ' Exiting.')
+        quit()
+    testDataPath = reportConfig.testDataPath
+    # the decimal separator and column layout of the data files, as for the reports
+    decimalSeparator = reportConfig.decimalSeparator
+    columnMap = reportConfig.columnMap
+
+    # **** Figure out what test data files to put in the store
+    testDataNames = listFiles(testDataPath)
+    if args.dataFile:
+        if args.dataFile not in testDataNames:
+            print('\nERROR: The test data file \'' + args.dataFile + '\' was specified, \
+but was not found. Exiting.')
+            quit()
+        dataFileNames = [args.dataFile]
+    else:
+        # Exclude files starting with '.', or files that don't end with '*.csv'
+        dataFileNames = [fileName for fileName in testDataNames
+                         if not fileName.startswith('.') and fileName.lower().endswith('.csv')]
+    # Only new or changed files need to be read. The stamp of each file is taken
+    # before it is read (see Glp2ResultsStore ingestTests).
+    dataFiles = []
+    fileStamps = {}
+    for fileName in dataFileNames:
+        filePath = join(testDataPath, fileName)
+        fileStamps[fileName] = store.fileStamp(filePath)
+        if not args.force and store.isCurrent(filePath, args.dataFileEncoding,
+                                              decimalSeparator, columnMap):
+            if args.verbose:
+                print('Not changed, skipped: ' + fileName)
+            continue
+        dataFiles.append((fileName, filePath))
+    print('\n' + str(len(dataFiles)) + ' of ' + str(len(dataFileNames)) +
+          ' data files are new or changed.')
+
+    # **** Read the files and put the tests in the store, a file at a time
+    loadWorkers = args.loadWorkers if args.loadWorkers > 0 else None
+    filePaths = dict(dataFiles)
+    for fileName, getTests in LoadTestDataFiles(dataFiles, args.dataFileEncoding,
+                                                decimalSeparator, columnMap, True, loadWorkers):
+        try:
+            fileTests = getTests()
+        except UnicodeDecodeError as ude:
+            print('Unicode Error: Unable to load test data file: ' + fileName +
+                '. Check encoding. ' + args.dataFileEncoding + ' was expected. Skipped.')
+            print(ude)
+            continue
+        except ValueError as ve:
+            print('Error: Unable to load test data file: ' + fileName +
+                '. The file does not match the expected column layout. Skipped.')
+            print(ve)
+            continue
+        testCount, stepCount = store.ingestTests(filePaths[fileName], fileTests,
+                                                 args.dataFileEncoding, decimalSeparator,
+                                                 columnMap, fileStamps[fileName])
+        print('Stored ' + str(testCount) + ' tests (' + str(stepCount) + ' steps) from ' +
+              fileName)
+
+    print('\n' + str(store))
+
+    # **** List the tests of a device, if asked for
+    if args.deviceNumber is not None:
+        deviceTests = store.findTests(deviceNumber=args.deviceNumber)
+        print('Tests of device ' + args.deviceNumber + ': ' + str(len(deviceTests)))
+        for testGuid, fileName, testInstanceId, programName, programGuid, deviceNumber, \
+                timestamp, stepCount in deviceTests:
+            print('    {}  {}  {:12} test {:<4} {:20} {} steps'.format(
+                timestamp, testGuid, fileName, testInstanceId, str(programName), stepCount))
+    store.close()
+
+    procEnd = datetime.now()
+    print('\n**** End Processing ****')
+    print('    Process end time: ' + procEnd.strftime('%m/%d/%Y %H:%M:%S'))
+    print('    Duration: ' + str(procEnd - procStart) + '\n')
+
+if __name__ == '__main__':
+    main()
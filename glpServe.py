@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# glpServe.py
+#
+# This program is a local report service (see Glp2ReportService) for the files
+# exported by a Schleich GLP2-ce Hi Pot Modular Tester ("tester"): other
+# programs (e.g. MES scripts) ask it for the report pdf, or the graph csv of a
+# step, of one test, by test GUID, and get it back within a fraction of a
+# second, rather than running glpCreateReport.py for each one.
+#
+# **** Program operation
+#   1)  The program will read in a config file, the same as glpCreateReport.py
+#       (-c/--configFile, default config.ini), for the data and test definition
+#       paths, the data file column layout ([TestData]) and the cache directory.
+#
+#   2)  All the data files (*.csv) and test definition files (*.TPR) are loaded
+#       and kept in memory. The paths are polled every -pi/--pollInterval
+#       seconds, and the files that are new or changed are loaded again.
+#
+#   3)  -w/--workers renderer processes are started to make the pdfs.
+#
+#   4)  The requests are served until Ctrl-C, on http://host:port/ (-H/--host,
+#       default 127.0.0.1, -p/--port, default 8765), or on a Unix socket
+#       (-u/--unixSocket). For example:
+#           curl http://127.0.0.1:8765/tests
+#           curl -o report.pdf http://127.0.0.1:8765/tests/<test GUID>.pdf
+#           curl -o step1.csv http://127.0.0.1:8765/tests/<test GUID>/steps/1.csv
+#           curl --unix-socket /tmp/glp.sock http://local/status
+#       See Glp2ReportService for the requests.
+#
+# The report options (-sf, -sd, -sg, -gm, -gd and -oe) are the same as for
+# glpCreateReport.py.
+#
+# imports
+from datetime import datetime
+import argparse
+import os
+import signal
+
+# specialized libraries unlikely to be used elsewhere. These should
+# travel with this file.
+from Glp2TestReport import GRAPH_MODES, GRAPH_MODE_PDF
+from Glp2ReportPipeline import Glp2ReportPipeline, ReportOptions
+from Glp2ReportService import Glp2ReportService, MakeReportServer
+
+# **** argument parsing
+descrStr="""Python program to serve the PDF reports and graph csv files of the tests
+exported by a Schleich GLP2-ce Hi Pot Modular Tester, on request, from memory.
+Stop it with Ctrl-C."""
+
+parser = argparse.ArgumentParser(formatter_class=argparse.RawDescriptionHelpFormatter, \
+                                 description=descrStr)
+parser.add_argument('-c', '--configFile', default='config.ini', metavar='', \
+                   help='Config file. Default is config.ini.')
+parser.add_argument('-ce', '--configEncoding', default='UTF-8', metavar='', \
+                   help='Config file encoding. Default is UTF-8.')
+parser.add_argument('-de', '--dataFileEncoding', default='UTF-16', metavar='', \
+                    help='Data file encoding. Default is UTF-16.')
+parser.add_argument('-te', '--testDfnEncoding', default='UTF-16', metavar='', \
+                    help='Test definition file encoding. Default is UTF-16.')
+parser.add_argument('-dirPrefix', default='', metavar='', \
+                    help='Directory prefix. If specified, this is prepended to \
+the paths specified in the configuration ini file.')
+parser.add_argument('-oe', '--outputFileEncoding', default='UTF-8', metavar='', \
+                    help='Graph csv encoding. Default is UTF-8.')
+parser.add_argument('-sf', '--supressDfnPdf', action='store_true', default=False, \
+                    help='Supress the test definition section of the test pdfs.')
+parser.add_argument('-sd', '--supressDataPdf', action='store_true', default=False, \
+                    help='Supress the test data section of the test pdfs.')
+parser.add_argument('-sg', '--supressGraphPdf', action='store_true', default=False, \
+                    help='Supress the graph section of the test pdfs.')
+parser.add_argument('-gm', '--graphMode', default=GRAPH_MODE_PDF, choices=GRAPH_MODES, \
+                    help='How the graphs are put in the pdf (see glpCreateReport.py). \
+Default is pdf.')
+parser.add_argument('-gd', '--graphDpi', type=int, default=150, metavar='', \
+                    help='Resolution (dots per inch) of the graph images in the image \
+graph mode. Default is 150.')
+parser.add_argument('-H', '--host', default='127.0.0.1', metavar='', \
+                    help='Address to serve on. Default is 127.0.0.1 (this computer only).')
+parser.add_argument('-p', '--port', type=int, default=8765, metavar='', \
+                    help='Port to serve on. Default is 8765. Use 0 for any free port.')
+parser.add_argument('-u', '--unixSocket', default='', metavar='', \
+                    help='Optional. Serve on this Unix socket (file path) instead of \
+the host and port.')
+parser.add_argument('-w', '--workers', type=int, default=2, metavar='', \
+                    help='Number of renderer processes making the pdfs. Default is 2. \
+Use 0 to make them in this process, one at a time.')
+parser.add_argument('-pi', '--pollInterval', type=float, default=2.0, metavar='', \
+                    help='Seconds between looking for new or changed files. Default is \
+2. Use 0 to only load the files when the program starts.')
+parser.add_argument('-nc', '--noDfnCache', action='store_true', default=False, \
+                    help='Do not use the test definition cache.')
+parser.add_argument('-v', '--verbose', action='store_true', default=False, \
+                    help='Verbose output: log each request.')
+
+# Stop serving the requests, like Ctrl-C does.
+def StopServing(signum, frame):
+    raise KeyboardInterrupt
+
+def main():
+    args = parser.parse_args()
+    if args.workers < 0:
+        print('ERROR: The number of workers can not be less than 0. Exiting.')
+        quit()
+
+    # The graphs are only drawn to memory, so use the non-interactive Agg
+    # backend of matplotlib (unless one was chosen with MPLBACKEND).
+    os.environ.setdefault('MPLBACKEND', 'Agg')
+
+    print('**** Begin Processing ****')
+    procStart = datetime.now()
+    print('    Process start time: ' + procStart.strftime('%m/%d/%Y %H:%M:%S'))
+
+    pipeline = Glp2ReportPipeline(ReportOptions(configEncoding=args.configEncoding,
+                                                dataFileEncoding=args.dataFileEncoding,
+                                                testDfnEncoding=args.testDfnEncoding,
+                                                outputFileEncoding=args.outputFileEncoding,
+                                                supressDfnPdf=args.supressDfnPdf,
+                                                supressDataPdf=args.supressDataPdf,
+                                                supressGraphPdf=args.supressGraphPdf,
+                                                noDfnCache=args.noDfnCache,
+                                                graphMode=args.graphMode,
+                                                graphDpi=args.graphDpi))
+    try:
+        reportConfig = pipeline.loadConfig(args.configFile, args.dirPrefix)
+    except ValueError as ve:
+        print('ERROR: ' + str(ve) + ' Exiting.')
+        quit()
+
+    print('\nLoading the test data and test definition files.')
+    service = Glp2ReportService(pipeline, reportConfig, args.workers)
+    print(service)
+    try:
+        server = MakeReportServer(service, args.host, args.port, args.unixSocket,
+                                  args.verbose)
+    except (OSError, ValueError) as err:
+        print('ERROR: Unable to serve the requests. ' + str(err) + ' Exiting.')
+        service.close()
+        quit()
+    if args.pollInterval > 0:
+        service.startWatch(args.pollInterval)
+
+    if args.unixSocket:
+        print('Serving on the Unix socket: ' + args.unixSocket)
+    else:
+        host, port = server.server_address[:2]
+        print('Serving on: http://' + host + ':' + str(port) + '/')
+    print('Stop with Ctrl-C.', flush=True)
+    # Stop the same way when asked to by the system (e.g. a service manager).
+    signal.signal(signal.SIGTERM, StopServing)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print('\nStopped.')
+    finally:
+        server.server_close()
+        service.close()
+        if args.unixSocket and os.path.exists(args.unixSocket):
+            os.remove(args.unixSocket)
+
+    procEnd = datetime.now()
+    print('\n**** End Processing ****')
+    print('    Process end time: ' + procEnd.strftime('%m/%d/%Y %H:%M:%S'))
+    print('    Duration: ' + str(procEnd - procStart) + '\n')
+
+if __name__ == '__main__':
+    main()
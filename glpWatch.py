@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# glpWatch.py
+#
+# This program watches the data and test definition paths of the config file
+# for files exported by a Schleich GLP2-ce Hi Pot Modular Tester ("tester"),
+# and makes the reports (the same as glpCreateReport.py) for new tests as the
+# files land, e.g. as they are copied from the tester's USB stick to a share.
+# It keeps running (until Ctrl-C), so the test definitions, and matplotlib, are
+# loaded once and the reports of new tests are made within a few seconds.
+#
+# **** Program operation
+#   1)  The program will read in a config file, the same as glpCreateReport.py
+#       (-c/--configFile, default config.ini), for the data and test definition
+#       paths, the data file column layout ([TestData]) and the cache directory.
+#
+#   2)  The data path (*.csv) and the test definition path (*.TPR) are polled
+#       every -pi/--pollInterval seconds (see Glp2FolderWatch). A file is read
+#       once it has stopped changing, and again each time it changes.
+#
+#   3)  New or changed test definitions are loaded (using the test definition
+#       cache), and the tests run with them are reported again.
+#
+#   4)  New or changed data files are read, and the reports are made for the
+#       tests that are new or changed. The tests reported are kept in the report
+#       manifest (see Glp2ReportManifest), the same one glpCreateReport.py -i
+#       uses, so only new tests are made into objects and reports, and a
+#       report keeps its file name. When the program starts, the tests already
+#       in the data files and not reported yet are reported.
+#
+#   5)  The tester adds the tests to the end of a data file, so a data file
+#       that grows is only read from where it was read to (see
+#       LoadTestDataFileFrom in Glp2Functions): the byte offset of the last
+#       test read (its rows may not all have been there) and its test GUID are
+#       kept for each file. The file is read from the offset, and the last
+#       test and the tests after it are made. All the file is read again if it
+#       did not grow, if the last test is not at the offset (e.g. the file was
+#       replaced), if the rows of a test are not together, and when the test
+#       definitions change (the tests of a definition that changed are
+#       reported again).
+#
+# The loading and reporting are done by the report pipeline (see
+# Glp2ReportPipeline), the same as glpCreateReport.py.
+#
+# imports
+from datetime import datetime
+from os.path import join
+import os
+import time
+import argparse
+
+# user libraries
+# Note: May need PYTHONPATH (set in ~/.profile?) to be set depending
+# on the location of the imported files
+
+# specialized libraries unlikely to be used elsewhere. These should
+# travel with this file.
+from Glp2TestReport import GRAPH_MODES, GRAPH_MODE_PDF, GRAPH_MODE_FAST
+from Glp2ReportPipeline import Glp2ReportPipeline, Glp2ReportSources, Glp2ReportInputs
+from Glp2ReportPipeline import ReportOptions
+from Glp2FolderWatch import Glp2FolderWatch
+
+# **** argument parsing
+descrStr="""Python program to watch for the data export and test definition files of
+a Schleich GLP2-ce Hi Pot Modular Tester, and make the PDF reports of new tests as
+the files arrive. Stop it with Ctrl-C."""
+
+parser = argparse.ArgumentParser(formatter_class=argparse.RawDescriptionHelpFormatter, \
+                                 description=descrStr)
+parser.add_argument('-c', '--configFile', default='config.ini', metavar='', \
+                   help='Config file. Default is config.ini.')
+parser.add_argument('-ce', '--configEncoding', default='UTF-8', metavar='', \
+                   help='Config file encoding. Default is UTF-8.')
+parser.add_argument('-de', '--dataFileEncoding', default='UTF-16', metavar='', \
+                    help='Data file encoding. Default is UTF-16.')
+parser.add_argument('-te', '--testDfnEncoding', default='UTF-16', metavar='', \
+                    help='Test definition file encoding. Default is UTF-16.')
+parser.add_argument('-dirPrefix', default='', metavar='', \
+                    help='Directory prefix. If specified, this is prepended to \
+the paths specified in the configuration ini file.')
+parser.add_argument('-of', '--outputFilePrefix', default=None,
+                    help='Output file name prefix. Default is None (no prefix).')
+parser.add_argument('-oe', '--outputFileEncoding', default='UTF-8', metavar='', \
+                    help='Output file encoding. Default is UTF-8.')
+parser.add_argument('-sf', '--supressDfnPdf', action='store_true', default=False, \
+                    help='Supress the test definition section of the test pdf files.')
+parser.add_argument('-sd', '--supressDataPdf', action='store_true', default=False, \
+                    help='Supress the test data section of the test pdf files.')
+parser.add_argument('-sg', '--supressGraphPdf', action='store_true', default=False, \
+                    help='Supress the graph section of the test pdf files.')
+parser.add_argument('-sc', '--supressGraphCsv', action='store_true', default=False, \
+                    help='Supress the graph csv files.')
+parser.add_argument('-gm', '--graphMode', default=GRAPH_MODE_PDF, choices=GRAPH_MODES, \
+                    help='How the graphs are put in the pdf (see glpCreateReport.py). \
+Default is pdf.')
+parser.add_argument('-gd', '--graphDpi', type=int, default=150, metavar='', \
+                    help='Resolution (dots per inch) of the graph images in the image \
+graph mode. Default is 150.')
+parser.add_argument('-pi', '--pollInterval', type=float, default=2.0, metavar='', \
+                    help='Seconds between looking for new or changed files. A file is \
+read once it has not changed for this long. Default is 2.')
+parser.add_argument('-1', '--once', action='store_true', default=False, \
+                    help='Make the reports for the files there now, and exit, rather \
+than watching for more.')
+parser.add_argument('-lw', '--loadWorkers', type=int, default=1, metavar='', \
+                    help='Number of processes used to load the data files that \
+changed. Default is 1, which loads them in this process. Use 0 for one per cpu.')
+parser.add_argument('-j', '--jobs', type=int, default=1, metavar='', \
+                    help='Number of processes used to make the test reports. Default \
+is 1, which makes them in this process. Use 0 for one per cpu.')
+parser.add_argument('-v', '--verbose', action='store_true', default=False, \
+                    help='Verbose output, usually used for troubleshooting.')
+
+# Make the report sources (see Glp2ReportPipeline discover) of the data files
+# and test definition files (names) in the paths of the config.
+def MakeSources(reportConfig, dataNames=(), dfnNames=()):
+    return Glp2ReportSources((), (),
+                             tuple((dataName, join(reportConfig.testDataPath, dataName))
+                                   for dataName in dataNames),
+                             tuple((dfnName, join(reportConfig.testDfnPath, dfnName))
+                                   for dfnName in dfnNames), True)
+
+# Read the data files and make the reports of the tests that are new or changed
+# (not in the report manifest), with the test definitions. Each file is read
+# from its mark in dataMarks, if it has one, and dataMarks is updated (see
+# Glp2ReportPipeline loadTests). A file that can not be read (e.g. not all of
+# it was there yet) is logged, and tried again when it changes.
+def ReportDataFiles(pipeline, reportConfig, reportManifest, testDfns, dataNames, dataMarks,
+                    args):
+    tests = pipeline.loadTests(reportConfig, MakeSources(reportConfig, dataNames),
+                               pipeline.needsGraphData(), reportManifest.reportedTests(),
+                               args.loadWorkers if args.loadWorkers > 0 else None,
+                               skipBadFiles=True, marks=dataMarks)
+    print(datetime.now().strftime('%m/%d/%Y %H:%M:%S') + '  ' + str(len(dataNames)) +
+          ' data files read, ' + str(len(tests)) + ' new or changed tests to report.')
+    if not tests:
+        return
+    catalog = pipeline.associate(Glp2ReportInputs(testDfns, tests))
+    reportJobs = pipeline.makeReportJobs(catalog, reportManifest)
+    pipeline.render(reportJobs, args.jobs if args.jobs > 0 else None, reportManifest)
+    # the definitions loaded for the reports
+    pipeline.saveDfnCache()
+
+def main():
+    args = parser.parse_args()
+    if args.pollInterval <= 0:
+        print('ERROR: The poll interval must be more than 0 seconds. Exiting.')
+        quit()
+
+    print('**** Begin Processing ****')
+    procStart = datetime.now()
+    print('    Process start time: ' + procStart.strftime('%m/%d/%Y %H:%M:%S'))
+
+    pipeline = Glp2ReportPipeline(ReportOptions(configEncoding=args.configEncoding,
+                                                dataFileEncoding=args.dataFileEncoding,
+                                                testDfnEncoding=args.testDfnEncoding,
+                                                outputFilePrefix=args.outputFilePrefix,
+                                                outputFileEncoding=args.outputFileEncoding,
+                                                supressDfnPdf=args.supressDfnPdf,
+                                                supressDataPdf=args.supressDataPdf,
+                                                supressGraphPdf=args.supressGraphPdf,
+                                                supressGraphCsv=args.supressGraphCsv,
+                                                graphMode=args.graphMode,
+                                                graphDpi=args.graphDpi))
+    # **** Get config info from config file
+    try:
+        reportConfig = pipeline.loadConfig(args.configFile, args.dirPrefix)
+    except ValueError as ve:
+        print('ERROR: ' + str(ve) + ' Exiting.')
+        quit()
+
+    reportManifest = pipeline.openManifest(reportConfig)
+    if reportManifest.settingsChanged:
+        print('\nThe report settings changed since the last incremental run. All the tests \
+will be reported.')
+    dfnWatch = Glp2FolderWatch(reportConfig.testDfnPath, '.tpr')
+    dataWatch = Glp2FolderWatch(reportConfig.testDataPath, '.csv')
+
+    # The graphs are only drawn to files, so use the non-interactive Agg backend
+    # of matplotlib (unless one was chosen with MPLBACKEND).
+    os.environ.setdefault('MPLBACKEND', 'Agg')
+    # Make matplotlib and the graph figure ready now, rather than for the first
+    # report (the reports are made in this process unless -j is used).
+    if not args.supressGraphPdf and args.graphMode != GRAPH_MODE_FAST:
+        from Glp2GraphFigure import GetTvsVandIFigure
+        GetTvsVandIFigure()
+
+    print('\nWatching for test definition files in: ' + reportConfig.testDfnPath)
+    print('Watching for test data files in:       ' + reportConfig.testDataPath)
+    if not args.once:
+        print('Stop with Ctrl-C.')
+    try:
+        # The definitions there now are loaded right away. The tests whose
+        # definition was added, changed or removed since they were reported
+        # are reported again (see Glp2ReportManifest).
+        dfnNames = dfnWatch.poll(waitStable=False)
+        dfnFiles = tuple(dfnName for dfnName in dfnWatch.files if dfnName in dfnNames)
+        testDfns = pipeline.loadDfns(reportConfig, MakeSources(reportConfig, dfnNames=dfnFiles))
+        reportManifest.forgetChangedDfns(testDfns)
+        dataMarks = {} # data file name: where it was read to (TestDataFileMark)
+        while True:
+            dfnNames = dfnWatch.poll(waitStable=not args.once)
+            dataNames = dataWatch.poll(waitStable=not args.once)
+            # the definition files that have stopped changing
+            loadedDfnFiles = tuple(dfnName for dfnName in dfnWatch.files
+                                   if dfnName in dfnNames or dfnName in dfnFiles)
+            if dfnNames or len(loadedDfnFiles) != len(dfnFiles):
+                # All the definitions are loaded again, from the test
+                # definition cache but for the ones that changed. The reports
+                # of the tests run with a definition that changed are made
+                # again, so all the data files are read.
+                if args.verbose:
+                    print('Test definitions changed: ' +
+                          ', '.join(sorted(set(dfnFiles) ^ set(loadedDfnFiles) |
+                                           set(dfnNames))))
+                dfnFiles = loadedDfnFiles
+                testDfns = pipeline.loadDfns(reportConfig, MakeSources(reportConfig,
+                                                                       dfnNames=dfnFiles))
+                reportManifest.forgetChangedDfns(testDfns)
+                dataNames = dataWatch.files
+                dataMarks.clear()
+            # forget the files that are gone, so they are read from the start
+            # if they come back
+            for dataName in set(dataMarks).difference(dataWatch.files):
+                del dataMarks[dataName]
+            if dataNames:
+                ReportDataFiles(pipeline, reportConfig, reportManifest, testDfns, dataNames,
+                                dataMarks, args)
+            if args.once:
+                break
+            time.sleep(args.pollInterval)
+    except KeyboardInterrupt:
+        print('\nStopped.')
+    finally:
+        reportManifest.save()
+        pipeline.saveDfnCache()
+
+    procEnd = datetime.now()
+    print('\n**** End Processing ****')
+    print('    Process end time: ' + procEnd.strftime('%m/%d/%Y %H:%M:%S'))
+    print('    Duration: ' + str(procEnd - procStart) + '\n')
+
+if __name__ == '__main__':
+    main()